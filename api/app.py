@@ -5,18 +5,52 @@ This module defines the main FastAPI application for Money Manager.
 from contextlib import asynccontextmanager
 
 import uvicorn
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException
+from pymongo.errors import PyMongoError
 
-from api.routers import accounts, analytics, categories, expenses, exports, users
-from config.config import API_BIND_HOST, API_BIND_PORT
+from api.routers import (
+    accounts,
+    analytics,
+    batch,
+    categories,
+    expenses,
+    exports,
+    imports,
+    users,
+)
+from api.utils.db import mongo
+from api.utils.export_jobs import export_jobs
+from api.utils.indexes import ensure_indexes, verify_indexes
+from api.utils.render import render_pool
+from api.utils.revocations import revocations
+from config.config import (
+    API_BIND_HOST,
+    API_BIND_PORT,
+    AUTH_MODE,
+    MONGO_ENSURE_INDEXES,
+    MONGO_VERIFY_INDEXES,
+)
 
 
 @asynccontextmanager
 async def lifespan(_app: FastAPI):
     """Lifespan function that handles app startup and shutdown"""
+    # Verify the shared MongoDB connection pool before serving requests
+    await mongo.connect()
+    if MONGO_ENSURE_INDEXES:
+        await ensure_indexes()
+    if MONGO_VERIFY_INDEXES:
+        await verify_indexes()
+    if AUTH_MODE == "stateless":
+        await revocations.load()
+    # Start the chart workers now rather than on the first chart request
+    await render_pool.warm()
     yield
+    # Interrupted export jobs are marked as failed while MongoDB is reachable
+    await export_jobs.shutdown()
     # Handles the shutdown event to close the MongoDB client
-    await users.shutdown_db_client()
+    mongo.close()
+    render_pool.shutdown()
 
 
 app = FastAPI(lifespan=lifespan)
@@ -28,6 +62,19 @@ app.include_router(categories.router)
 app.include_router(expenses.router)
 app.include_router(analytics.router)
 app.include_router(exports.router)
+app.include_router(imports.router)
+app.include_router(batch.router)
+
+
+@app.get("/health/db", tags=["Health"])
+async def db_health():
+    """Report MongoDB reachability and connection pool statistics."""
+    try:
+        await mongo.connect()
+    except PyMongoError as e:
+        raise HTTPException(status_code=503, detail="Database unavailable") from e
+    return {"status": "ok", "pool": mongo.stats()}
+
 
 if __name__ == "__main__":
     uvicorn.run("app:app", host=API_BIND_HOST, port=API_BIND_PORT, reload=True)
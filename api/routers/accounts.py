@@ -6,19 +6,15 @@ from typing import Optional
 
 from bson import ObjectId
 from fastapi import APIRouter, Header, HTTPException
-from motor.motor_asyncio import AsyncIOMotorClient
 from pydantic import BaseModel
+from pymongo.errors import DuplicateKeyError
 
 from api.utils.auth import verify_token
-from config.config import MONGO_URI
+from api.utils.db import accounts_collection
+from api.utils.principal import run_data_write
 
 router = APIRouter(prefix="/accounts", tags=["Accounts"])
 
-# MongoDB setup
-client: AsyncIOMotorClient = AsyncIOMotorClient(MONGO_URI)
-db = client.mmdb
-accounts_collection = db.accounts
-
 
 class AccountCreate(BaseModel):
     """Schema for creating a new account."""
@@ -63,7 +59,15 @@ async def create_account(account: AccountCreate, token: str = Header(None)):
         "currency": account.currency.upper(),
     }
 
-    result = await accounts_collection.insert_one(account_data)
+    async def insert_account(session):
+        return await accounts_collection.insert_one(account_data, session=session)
+
+    try:
+        result = await run_data_write(user_id, insert_account)
+    except DuplicateKeyError as e:
+        raise HTTPException(
+            status_code=400, detail="Account type already exists"
+        ) from e
     if result.inserted_id:
         return {
             "message": "Account created successfully",
@@ -160,9 +164,17 @@ async def update_account(
     if not update_data:
         raise HTTPException(status_code=400, detail="No update data provided")
 
-    result = await accounts_collection.update_one(
-        {"_id": ObjectId(account_id)}, {"$set": update_data}
-    )
+    async def update_account_doc(session):
+        return await accounts_collection.update_one(
+            {"_id": ObjectId(account_id)}, {"$set": update_data}, session=session
+        )
+
+    try:
+        result = await run_data_write(user_id, update_account_doc)
+    except DuplicateKeyError as e:
+        raise HTTPException(
+            status_code=400, detail="Account type already exists"
+        ) from e
 
     if result.modified_count == 1:
         return {"message": "Account updated successfully"}
@@ -190,7 +202,12 @@ async def delete_account(account_id: str, token: str = Header(None)):
     if not account:
         raise HTTPException(status_code=404, detail="Account not found")
 
-    result = await accounts_collection.delete_one({"_id": ObjectId(account_id)})
+    async def remove_account(session):
+        return await accounts_collection.delete_one(
+            {"_id": ObjectId(account_id)}, session=session
+        )
+
+    result = await run_data_write(user_id, remove_account)
 
     if result.deleted_count == 1:
         return {"message": "Account deleted successfully"}
@@ -1,115 +1,390 @@
 """
 This module provides analytics endpoints for retrieving and visualizing expense data.
+
+Every chart is served as PNG or, with ``?format=svg``, as SVG. Clients that
+draw their own charts use the ``/data`` variants, which return the same
+series as compact JSON and skip rendering altogether.
 """
 
 import datetime
-from typing import Optional
-
-from fastapi import APIRouter, Header, HTTPException, Response
-
-from api.utils.auth import verify_token
-from api.utils.db import calculate_days_in_range, fetch_data
+import json
+from typing import Any, Awaitable, Callable, Literal, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
+
+from api.utils.aggregations import (
+    CategoryTotals,
+    category_totals,
+    downsample,
+    expense_totals,
+)
+from api.utils.chart_cache import chart_cache, chart_etag, etag_matches
+from api.utils.currency import get_report_currency
+from api.utils.db import calculate_days_in_range
 from api.utils.plots import (
+    IMAGE_MEDIA_TYPES,
+    budget_vs_actual_series,
     create_budget_vs_actual,
     create_category_bar,
     create_category_pie,
     create_expense_bar,
     create_monthly_line,
 )
+from api.utils.principal import Principal, data_version, get_principal
+from api.utils.render import render_chart
 
 router = APIRouter(prefix="/analytics", tags=["Analytics"])
 
+NO_EXPENSES_IN_PERIOD = "No expenses found for the specified period"
+
+ImageFormat = Literal["png", "svg"]
+Granularity = Literal["auto", "day", "week", "month"]
+
+
+async def chart_response(
+    principal: Principal,
+    chart: Tuple[Any, ...],
+    media_type: str,
+    if_none_match: Optional[str],
+    build: Callable[[], Awaitable[bytes]],
+) -> Response:
+    """
+    Serve a chart or its data from the chart cache, building it only on a miss.
+
+    The cache key ends with the user's data version, which every expense,
+    account and category write bumps. It is read from the database rather
+    than the user cache, so no process answers with an outdated chart. A
+    request whose ``If-None-Match`` holds the current ETag is answered with
+    304 before any expense is read.
+
+    Args:
+        principal (Principal): The authenticated caller.
+        chart (tuple): Everything the request asks for: the chart or series
+            name, date range, report currency and output format.
+        media_type (str): Content type of the built body.
+        if_none_match (str, optional): The request's If-None-Match header.
+        build (callable): Fetches the data and renders or encodes the body.
+
+    Returns:
+        Response: The body, or an empty 304 response.
+    """
+    # Read past the user cache, a write may have gone through another process
+    version = await data_version(principal.user_id) or 0
+    key = (principal.user_id, *chart, version)
+    # Clients must revalidate, a write makes the chart outdated at once
+    headers = {"ETag": chart_etag(key), "Cache-Control": "private, no-cache"}
+    if etag_matches(if_none_match, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+
+    body = chart_cache.get(key)
+    if body is None:
+        body = await build()
+        chart_cache.put(key, body)
+    return Response(content=body, media_type=media_type, headers=headers)
+
+
+async def fetch_totals(
+    user_id: str,
+    from_date: Optional[datetime.date],
+    to_date: Optional[datetime.date],
+    unit: str,
+    report_currency: str,
+) -> pd.Series:
+    """Return the totals per day or month, failing with 404 if there are none."""
+    totals = await expense_totals(user_id, from_date, to_date, unit, report_currency)
+    if totals.empty:
+        detail = "No expenses found" if unit == "day" else NO_EXPENSES_IN_PERIOD
+        raise HTTPException(status_code=404, detail=detail)
+    return totals
+
+
+async def fetch_category_totals(
+    user_id: str,
+    from_date: Optional[datetime.date],
+    to_date: Optional[datetime.date],
+    report_currency: str,
+) -> CategoryTotals:
+    """Return the totals per category, failing with 404 if there are none."""
+    totals = await category_totals(user_id, from_date, to_date, report_currency)
+    if totals.totals.empty:
+        raise HTTPException(status_code=404, detail=NO_EXPENSES_IN_PERIOD)
+    return totals
+
+
+async def fetch_budgets(principal: Principal) -> dict:
+    """
+    Return the caller's categories and their budgets, read past the user cache.
+
+    Budget charts are cached under the data version read from the database,
+    so the budgets drawn into them must be at least as new as that version.
+    """
+    user = await principal.user(fresh=True)
+    return user["categories"] if user else {}
+
+
+def rounded(values: Any) -> list:
+    """Round amounts to cents for a JSON payload."""
+    return np.round(np.asarray(values, dtype=np.float64), 2).tolist()
+
+
+def encode_json(payload: dict) -> bytes:
+    """Encode a data payload as compact JSON."""
+    return json.dumps(payload, separators=(",", ":")).encode()
+
+
+def series_payload(
+    totals: pd.Series, report_currency: str, granularity: Optional[str] = None
+) -> bytes:
+    """
+    Encode a series of totals as JSON.
+
+    The labels and values are parallel arrays, e.g.
+    ``{"currency": "USD", "labels": ["2024-01"], "values": [12.5], "total": 12.5}``.
+    Days are ISO dates and months are ``YYYY-MM``. A ``granularity`` is
+    included in the payload when given.
+    """
+    payload = {
+        "currency": report_currency,
+        "labels": [str(label) for label in totals.index],
+        "values": rounded(totals.to_numpy()),
+        "total": round(float(totals.sum()), 2),
+    }
+    if granularity:
+        payload["granularity"] = granularity
+    return encode_json(payload)
+
+
+async def fetch_bar_totals(
+    user_id: str,
+    from_date: Optional[datetime.date],
+    to_date: Optional[datetime.date],
+    granularity: Granularity,
+    report_currency: str,
+) -> Tuple[str, pd.Series]:
+    """
+    Return the totals drawn by the expense bar chart and their granularity.
+
+    The daily totals are bucketed by week or month when asked to, or with
+    "auto" when there would be more than ``MAX_AUTO_BUCKETS`` bars.
+    """
+    daily_expenses = await fetch_totals(
+        user_id, from_date, to_date, "day", report_currency
+    )
+    return downsample(daily_expenses, granularity)
+
 
 @router.get("/expense/bar")
-async def expense_bar(
+async def expense_bar(  # pylint: disable=too-many-arguments,too-many-positional-arguments
+    from_date: Optional[datetime.date] = None,
+    to_date: Optional[datetime.date] = None,
+    granularity: Granularity = "auto",
+    image_format: ImageFormat = Query("png", alias="format"),
+    principal: Principal = Depends(get_principal),
+    report_currency: str = Depends(get_report_currency),
+    if_none_match: Optional[str] = Header(None),
+):
+    """
+    Generate bar chart of expenses per day, week or month.
+
+    With the default ``granularity=auto`` a long range is drawn per week or
+    per month, so the chart stays readable and cheap to render.
+    """
+
+    async def draw() -> bytes:
+        unit, totals = await fetch_bar_totals(
+            principal.user_id, from_date, to_date, granularity, report_currency
+        )
+        return await render_chart(
+            create_expense_bar,
+            totals,
+            from_date,
+            to_date,
+            report_currency,
+            image_format=image_format,
+            granularity=unit,
+        )
+
+    chart = (
+        "expense-bar",
+        from_date,
+        to_date,
+        granularity,
+        report_currency,
+        image_format,
+    )
+    media_type = IMAGE_MEDIA_TYPES[image_format]
+    return await chart_response(principal, chart, media_type, if_none_match, draw)
+
+
+@router.get("/expense/bar/data")
+async def expense_bar_data(  # pylint: disable=too-many-arguments,too-many-positional-arguments
     from_date: Optional[datetime.date] = None,
     to_date: Optional[datetime.date] = None,
-    token: str = Header(None),
+    granularity: Granularity = "auto",
+    principal: Principal = Depends(get_principal),
+    report_currency: str = Depends(get_report_currency),
+    if_none_match: Optional[str] = Header(None),
 ):
-    """Generate bar chart of daily expenses."""
-    user_id = await verify_token(token)
-    expenses, _, _ = await fetch_data(user_id, from_date, to_date)
+    """
+    Return the totals drawn by /expense/bar as JSON.
 
-    if not expenses:
-        raise HTTPException(status_code=404, detail="No expenses found")
+    The payload's ``granularity`` is the bucket actually used: "day", "week"
+    (labelled with the Monday) or "month".
+    """
 
-    buf = create_expense_bar(expenses, from_date, to_date)
-    return Response(content=buf.getvalue(), media_type="image/png")
+    async def encode() -> bytes:
+        unit, totals = await fetch_bar_totals(
+            principal.user_id, from_date, to_date, granularity, report_currency
+        )
+        return series_payload(totals, report_currency, granularity=unit)
+
+    chart = ("daily", from_date, to_date, granularity, report_currency, "json")
+    return await chart_response(
+        principal, chart, "application/json", if_none_match, encode
+    )
 
 
 @router.get("/category/pie")
-async def category_pie(
+async def category_pie(  # pylint: disable=too-many-arguments,too-many-positional-arguments
     from_date: Optional[datetime.date] = None,
     to_date: Optional[datetime.date] = None,
-    token: str = Header(None),
+    image_format: ImageFormat = Query("png", alias="format"),
+    principal: Principal = Depends(get_principal),
+    report_currency: str = Depends(get_report_currency),
+    if_none_match: Optional[str] = Header(None),
 ):
     """
     Endpoint to generate a pie chart of categories categorized by type.
-    Returns a PNG image file directly.
+    Returns a PNG (or, with format=svg, SVG) image directly.
     """
-    user_id = await verify_token(token)
-    if not user_id:
-        raise HTTPException(status_code=401, detail="Invalid token")
 
-    expenses, _, _ = await fetch_data(user_id, from_date, to_date)
+    async def draw() -> bytes:
+        category_expenses = await fetch_category_totals(
+            principal.user_id, from_date, to_date, report_currency
+        )
+        return await render_chart(
+            create_category_pie,
+            category_expenses.totals,
+            from_date,
+            to_date,
+            report_currency,
+            image_format=image_format,
+        )
+
+    chart = ("category-pie", from_date, to_date, report_currency, image_format)
+    media_type = IMAGE_MEDIA_TYPES[image_format]
+    return await chart_response(principal, chart, media_type, if_none_match, draw)
+
+
+@router.get("/category/pie/data")
+@router.get("/category/bar/data")
+async def category_data(
+    from_date: Optional[datetime.date] = None,
+    to_date: Optional[datetime.date] = None,
+    principal: Principal = Depends(get_principal),
+    report_currency: str = Depends(get_report_currency),
+    if_none_match: Optional[str] = Header(None),
+):
+    """Return the category totals drawn by /category/pie and /category/bar as JSON."""
 
-    if not expenses:
-        raise HTTPException(
-            status_code=404, detail="No expenses found for the specified period"
+    async def encode() -> bytes:
+        category_expenses = await fetch_category_totals(
+            principal.user_id, from_date, to_date, report_currency
         )
+        return series_payload(category_expenses.totals, report_currency)
 
-    buf = create_category_pie(expenses, from_date, to_date)
-    return Response(content=buf.getvalue(), media_type="image/png")
+    chart = ("category", from_date, to_date, report_currency, "json")
+    return await chart_response(
+        principal, chart, "application/json", if_none_match, encode
+    )
 
 
 @router.get("/expense/line-monthly", response_class=Response)
-async def expense_line_monthly(
+async def expense_line_monthly(  # pylint: disable=too-many-arguments,too-many-positional-arguments
     from_date: Optional[datetime.date] = None,
     to_date: Optional[datetime.date] = None,
-    token: str = Header(None),
+    image_format: ImageFormat = Query("png", alias="format"),
+    principal: Principal = Depends(get_principal),
+    report_currency: str = Depends(get_report_currency),
+    if_none_match: Optional[str] = Header(None),
 ):
     """
     Endpoint to generate a line chart of monthly expenses within a date range.
-    Returns a PNG image file directly.
+    Returns a PNG (or, with format=svg, SVG) image directly.
     """
-    user_id = await verify_token(token)
-    if not user_id:
-        raise HTTPException(status_code=401, detail="Invalid token")
 
-    expenses, _, _ = await fetch_data(user_id, from_date, to_date)
+    async def draw() -> bytes:
+        monthly_expenses = await fetch_totals(
+            principal.user_id, from_date, to_date, "month", report_currency
+        )
+        return await render_chart(
+            create_monthly_line,
+            monthly_expenses,
+            from_date,
+            to_date,
+            report_currency,
+            image_format=image_format,
+        )
+
+    chart = ("expense-line-monthly", from_date, to_date, report_currency, image_format)
+    media_type = IMAGE_MEDIA_TYPES[image_format]
+    return await chart_response(principal, chart, media_type, if_none_match, draw)
+
 
-    if not expenses:
-        raise HTTPException(
-            status_code=404, detail="No expenses found for the specified period"
+@router.get("/expense/line-monthly/data")
+async def expense_line_monthly_data(
+    from_date: Optional[datetime.date] = None,
+    to_date: Optional[datetime.date] = None,
+    principal: Principal = Depends(get_principal),
+    report_currency: str = Depends(get_report_currency),
+    if_none_match: Optional[str] = Header(None),
+):
+    """Return the monthly totals drawn by /expense/line-monthly as JSON."""
+
+    async def encode() -> bytes:
+        monthly_expenses = await fetch_totals(
+            principal.user_id, from_date, to_date, "month", report_currency
         )
+        return series_payload(monthly_expenses, report_currency)
 
-    buf = create_monthly_line(expenses, from_date, to_date)
-    return Response(content=buf.getvalue(), media_type="image/png")
+    chart = ("monthly", from_date, to_date, report_currency, "json")
+    return await chart_response(
+        principal, chart, "application/json", if_none_match, encode
+    )
 
 
 @router.get("/category/bar", response_class=Response)
-async def category_bar(
+async def category_bar(  # pylint: disable=too-many-arguments,too-many-positional-arguments
     from_date: Optional[datetime.date] = None,
     to_date: Optional[datetime.date] = None,
-    token: str = Header(None),
+    image_format: ImageFormat = Query("png", alias="format"),
+    principal: Principal = Depends(get_principal),
+    report_currency: str = Depends(get_report_currency),
+    if_none_match: Optional[str] = Header(None),
 ):
     """
     Endpoint to generate a bar chart of expenses categorized by type within a date range.
-    Returns a PNG image file directly.
+    Returns a PNG (or, with format=svg, SVG) image directly.
     """
-    user_id = await verify_token(token)
-    if not user_id:
-        raise HTTPException(status_code=401, detail="Invalid token")
-
-    expenses, _, _ = await fetch_data(user_id, from_date, to_date)
 
-    if not expenses:
-        raise HTTPException(
-            status_code=404, detail="No expenses found for the specified period"
+    async def draw() -> bytes:
+        category_expenses = await fetch_category_totals(
+            principal.user_id, from_date, to_date, report_currency
+        )
+        return await render_chart(
+            create_category_bar,
+            category_expenses.totals,
+            from_date,
+            to_date,
+            report_currency,
+            image_format=image_format,
         )
 
-    buf = create_category_bar(expenses, from_date, to_date)
-    return Response(content=buf.getvalue(), media_type="image/png")
+    chart = ("category-bar", from_date, to_date, report_currency, image_format)
+    media_type = IMAGE_MEDIA_TYPES[image_format]
+    return await chart_response(principal, chart, media_type, if_none_match, draw)
 
 
 def prorate_budget(
@@ -128,28 +403,77 @@ def prorate_budget(
 
 
 @router.get("/budget/actual-vs-budget", response_class=Response)
-async def budget_vs_actual(
+async def budget_vs_actual(  # pylint: disable=too-many-arguments,too-many-positional-arguments
     from_date: Optional[datetime.date] = None,
     to_date: Optional[datetime.date] = None,
-    token: str = Header(None),
+    image_format: ImageFormat = Query("png", alias="format"),
+    principal: Principal = Depends(get_principal),
+    report_currency: str = Depends(get_report_currency),
+    if_none_match: Optional[str] = Header(None),
 ):
     """
     Endpoint to generate a bar chart comparing budgeted vs actual expenses within a date range.
-    Returns a PNG image file directly.
+    Returns a PNG (or, with format=svg, SVG) image directly.
     """
-    user_id = await verify_token(token)
-    if not user_id:
-        raise HTTPException(status_code=401, detail="Invalid token")
 
-    expenses, _, user = await fetch_data(user_id, from_date, to_date)
+    async def draw() -> bytes:
+        category_expenses, first_date, last_date = await fetch_category_totals(
+            principal.user_id, from_date, to_date, report_currency
+        )
+        return await render_chart(
+            create_budget_vs_actual,
+            category_expenses,
+            await fetch_budgets(principal),
+            from_date,
+            to_date,
+            first_date,
+            last_date,
+            report_currency,
+            image_format=image_format,
+        )
+
+    chart = ("budget-vs-actual", from_date, to_date, report_currency, image_format)
+    media_type = IMAGE_MEDIA_TYPES[image_format]
+    return await chart_response(principal, chart, media_type, if_none_match, draw)
+
 
-    if not expenses:
-        raise HTTPException(
-            status_code=404, detail="No expenses found for the specified period"
+@router.get("/budget/actual-vs-budget/data")
+async def budget_vs_actual_data(
+    from_date: Optional[datetime.date] = None,
+    to_date: Optional[datetime.date] = None,
+    principal: Principal = Depends(get_principal),
+    report_currency: str = Depends(get_report_currency),
+    if_none_match: Optional[str] = Header(None),
+):
+    """
+    Return the series drawn by /budget/actual-vs-budget as JSON.
+
+    ``labels`` are the category names, ``actual`` their spend and ``budget``
+    their monthly budgets prorated to the date range.
+    """
+
+    async def encode() -> bytes:
+        category_expenses, first_date, last_date = await fetch_category_totals(
+            principal.user_id, from_date, to_date, report_currency
+        )
+        labels, actuals, budgeted = budget_vs_actual_series(
+            category_expenses,
+            await fetch_budgets(principal),
+            from_date,
+            to_date,
+            first_date,
+            last_date,
+        )
+        return encode_json(
+            {
+                "currency": report_currency,
+                "labels": labels,
+                "actual": rounded(actuals),
+                "budget": rounded(budgeted),
+            }
         )
 
-    buf = create_budget_vs_actual(
-        expenses, user["categories"] if user else {}, from_date, to_date
+    chart = ("budget", from_date, to_date, report_currency, "json")
+    return await chart_response(
+        principal, chart, "application/json", if_none_match, encode
     )
-
-    return Response(content=buf.getvalue(), media_type="image/png")
@@ -0,0 +1,111 @@
+"""
+This module provides an endpoint that runs several API operations in one request.
+"""
+
+import asyncio
+import base64
+import re
+from typing import Any, List, Literal, Optional
+from urllib.parse import unquote
+
+import httpx
+from fastapi import APIRouter, Header, HTTPException, Request
+from pydantic import BaseModel, Field
+
+from api.utils.auth import verified_token, verify_token
+
+router = APIRouter(prefix="/batch", tags=["Batch"])
+
+MAX_BATCH_SIZE = 20
+
+
+class BatchOperation(BaseModel):
+    """One sub-request of a batch."""
+
+    method: Literal["GET", "POST", "PUT", "DELETE"]
+    path: str = Field(..., pattern=r"^/")
+    params: Optional[dict[str, Any]] = None
+    body: Optional[Any] = None
+
+
+class BatchRequest(BaseModel):
+    """Model for a batch of sub-requests, run in the given order."""
+
+    requests: List[BatchOperation] = Field(..., min_length=1, max_length=MAX_BATCH_SIZE)
+
+
+def is_batch_path(path: str) -> bool:
+    """Return whether a sub-request path points at the batch endpoint itself."""
+    # Drop the query and fragment before normalising slashes and escapes
+    path = re.split(r"[?#]", path, maxsplit=1)[0]
+    path = re.sub(r"/+", "/", unquote(path)).rstrip("/")
+    return path == router.prefix or path.startswith(f"{router.prefix}/")
+
+
+def format_response(response: httpx.Response) -> dict:
+    """Convert a sub-request response into a JSON serialisable result."""
+    content_type = response.headers.get("content-type", "")
+    result: dict = {"status": response.status_code, "content_type": content_type}
+    if content_type.startswith("application/json"):
+        result["body"] = response.json()
+    elif content_type.startswith("text/"):
+        result["body"] = response.text
+    else:
+        result["body"] = base64.b64encode(response.content).decode()
+        result["encoding"] = "base64"
+    return result
+
+
+async def run_operation(client: httpx.AsyncClient, operation: BatchOperation) -> dict:
+    """Run one sub-request against the application."""
+    response = await client.request(
+        operation.method,
+        operation.path,
+        params=operation.params,
+        json=operation.body,
+    )
+    return format_response(response)
+
+
+@router.post("/")
+async def run_batch(batch: BatchRequest, request: Request, token: str = Header(None)):
+    """
+    Run an ordered list of sub-requests and return all of their results together.
+
+    The token is verified once for the whole batch. Consecutive GET requests
+    run concurrently; every other method waits for the requests before it and
+    blocks the ones after it, so writes keep their order.
+
+    Args:
+        batch (BatchRequest): Sub-requests to run.
+        request (Request): The batch request, used to reach the application.
+        token (str): Authentication token, used for every sub-request.
+
+    Returns:
+        dict: One result per sub-request, in request order.
+    """
+    user_id = await verify_token(token)
+    if any(is_batch_path(operation.path) for operation in batch.requests):
+        raise HTTPException(status_code=400, detail="Batches cannot be nested")
+
+    verified_token.set((token, user_id))
+    results: List[dict] = []
+    async with httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=request.app),
+        base_url="http://batch",
+        headers={"token": token},
+    ) as client:
+        reads: List[BatchOperation] = []
+        for operation in batch.requests:
+            if operation.method == "GET":
+                reads.append(operation)
+                continue
+            results.extend(
+                await asyncio.gather(*(run_operation(client, op) for op in reads))
+            )
+            reads = []
+            results.append(await run_operation(client, operation))
+        results.extend(
+            await asyncio.gather(*(run_operation(client, op) for op in reads))
+        )
+    return {"results": results}
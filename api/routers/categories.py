@@ -2,21 +2,13 @@
 This module provides endpoints for managing categories of a particular user.
 """
 
-from bson import ObjectId
-from fastapi import APIRouter, Header, HTTPException
-from motor.motor_asyncio import AsyncIOMotorClient
+from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
 
-from api.utils.auth import verify_token
-from config.config import MONGO_URI
+from api.utils.principal import Principal, get_principal, update_user_doc
 
 router = APIRouter(prefix="/categories", tags=["Categories"])
 
-# MongoDB setup
-client: AsyncIOMotorClient = AsyncIOMotorClient(MONGO_URI)
-db = client.mmdb
-users_collection = db.users
-
 
 class CategoryCreate(BaseModel):
     """Schema for creating a new category."""
@@ -32,20 +24,20 @@ class CategoryUpdate(BaseModel):
 
 
 @router.post("/")
-async def create_category(category: CategoryCreate, token: str = Header(None)):
+async def create_category(
+    category: CategoryCreate, principal: Principal = Depends(get_principal)
+):
     """
     Create a new category for the authenticated user.
 
     Args:
         category (CategoryCreate): Category details.
-        token (str): Authentication token.
+        principal (Principal): The authenticated caller.
 
     Returns:
         dict: A message confirming category creation.
     """
-    user_id = await verify_token(token)
-
-    user = await users_collection.find_one({"_id": ObjectId(user_id)})
+    user = await principal.user(fresh=True)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
@@ -57,8 +49,8 @@ async def create_category(category: CategoryCreate, token: str = Header(None)):
 
     user["categories"][category.name] = {"monthly_budget": category.monthly_budget}
 
-    await users_collection.update_one(
-        {"_id": ObjectId(user_id)}, {"$set": {"categories": user["categories"]}}
+    await update_user_doc(
+        principal.user_id, {"$set": {"categories": user["categories"]}}
     )
 
     return {"message": "Category created successfully"}
@@ -66,7 +58,9 @@ async def create_category(category: CategoryCreate, token: str = Header(None)):
 
 @router.put("/{category_name}")
 async def update_category(
-    category_name: str, category_update: CategoryUpdate, token: str = Header(None)
+    category_name: str,
+    category_update: CategoryUpdate,
+    principal: Principal = Depends(get_principal),
 ):
     """
     Update an existing category's monthly budget.
@@ -74,14 +68,12 @@ async def update_category(
     Args:
         category_name (str): The name of the category to update.
         category_update (CategoryUpdate): New category details.
-        token (str): Authentication token.
+        principal (Principal): The authenticated caller.
 
     Returns:
         dict: A message confirming category update.
     """
-    user_id = await verify_token(token)
-
-    user = await users_collection.find_one({"_id": ObjectId(user_id)})
+    user = await principal.user(fresh=True)
     if not user or "categories" not in user or category_name not in user["categories"]:
         raise HTTPException(status_code=404, detail="Category not found")
 
@@ -90,27 +82,25 @@ async def update_category(
 
     user["categories"][category_name]["monthly_budget"] = category_update.monthly_budget
 
-    await users_collection.update_one(
-        {"_id": ObjectId(user_id)}, {"$set": {"categories": user["categories"]}}
+    await update_user_doc(
+        principal.user_id, {"$set": {"categories": user["categories"]}}
     )
 
     return {"message": "Category updated successfully"}
 
 
 @router.get("/")
-async def get_all_categories(token: str = Header(None)):
+async def get_all_categories(principal: Principal = Depends(get_principal)):
     """
     Get all categories for the authenticated user.
 
     Args:
-        token (str): Authentication token.
+        principal (Principal): The authenticated caller.
 
     Returns:
         dict: List of all categories.
     """
-    user_id = await verify_token(token)
-
-    user = await users_collection.find_one({"_id": ObjectId(user_id)})
+    user = await principal.user()
     if not user or "categories" not in user:
         return {"categories": []}
 
@@ -118,20 +108,20 @@ async def get_all_categories(token: str = Header(None)):
 
 
 @router.get("/{category_name}")
-async def get_category(category_name: str, token: str = Header(None)):
+async def get_category(
+    category_name: str, principal: Principal = Depends(get_principal)
+):
     """
     Get details of a specific category for the authenticated user.
 
     Args:
         category_name (str): The name of the category to fetch.
-        token (str): Authentication token.
+        principal (Principal): The authenticated caller.
 
     Returns:
         dict: The category details.
     """
-    user_id = await verify_token(token)
-
-    user = await users_collection.find_one({"_id": ObjectId(user_id)})
+    user = await principal.user()
     if not user or "categories" not in user or category_name not in user["categories"]:
         raise HTTPException(status_code=404, detail="Category not found")
 
@@ -139,27 +129,27 @@ async def get_category(category_name: str, token: str = Header(None)):
 
 
 @router.delete("/{category_name}")
-async def delete_category(category_name: str, token: str = Header(None)):
+async def delete_category(
+    category_name: str, principal: Principal = Depends(get_principal)
+):
     """
     Delete an existing category for the authenticated user.
 
     Args:
         category_name (str): The name of the category to delete.
-        token (str): Authentication token.
+        principal (Principal): The authenticated caller.
 
     Returns:
         dict: A message confirming category deletion.
     """
-    user_id = await verify_token(token)
-
-    user = await users_collection.find_one({"_id": ObjectId(user_id)})
+    user = await principal.user(fresh=True)
     if not user or "categories" not in user or category_name not in user["categories"]:
         raise HTTPException(status_code=404, detail="Category not found")
 
     del user["categories"][category_name]
 
-    await users_collection.update_one(
-        {"_id": ObjectId(user_id)}, {"$set": {"categories": user["categories"]}}
+    await update_user_doc(
+        principal.user_id, {"$set": {"categories": user["categories"]}}
     )
 
     return {"message": "Category deleted successfully"}
@@ -2,28 +2,36 @@
 This module provides endpoints for managing user expenses in the Money Manager application.
 """
 
+import base64
+import binascii
 import datetime
+import json
 from typing import Optional
 
 from bson import ObjectId
-from currency_converter import CurrencyConverter  # type: ignore
-from fastapi import APIRouter, Header, HTTPException
-from motor.motor_asyncio import AsyncIOMotorClient
-from pydantic import BaseModel
-
-from api.utils.auth import verify_token
-from config.config import MONGO_URI
-
-currency_converter = CurrencyConverter()
+from bson.errors import InvalidId
+from fastapi import APIRouter, Depends, HTTPException, Query
+from pydantic import BaseModel, Field
+from pymongo import ReturnDocument, UpdateOne
+
+from api.utils.currency import convert_column, currency_service
+from api.utils.db import (
+    accounts_collection,
+    expenses_collection,
+)
+from api.utils.principal import Principal, get_principal, run_data_write
+from api.utils.rollups import (
+    apply_expense,
+    apply_expenses,
+    clear_user,
+    move_expense,
+)
 
 router = APIRouter(prefix="/expenses", tags=["Expenses"])
 
-# MongoDB setup
-client: AsyncIOMotorClient = AsyncIOMotorClient(MONGO_URI)
-db = client.mmdb
-users_collection = db.users
-expenses_collection = db.expenses
-accounts_collection = db.accounts
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+MAX_BULK_SIZE = 10000
 
 
 def format_id(document):
@@ -32,12 +40,34 @@ def format_id(document):
     return document
 
 
-def convert_currency(amount, from_cur, to_cur):
-    """Convert currency using the CurrencyConverter library."""
+def encode_cursor(expense: dict) -> str:
+    """Encode the (date, _id) sort key of an expense as an opaque cursor."""
+    key = {"date": expense["date"].isoformat(), "_id": str(expense["_id"])}
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple[datetime.datetime, ObjectId]:
+    """Decode a cursor produced by encode_cursor back into its sort key."""
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.datetime.fromisoformat(key["date"]), ObjectId(key["_id"])
+    except (
+        binascii.Error,
+        InvalidId,
+        KeyError,
+        TypeError,
+        UnicodeDecodeError,
+        ValueError,
+    ) as e:
+        raise HTTPException(status_code=400, detail="Invalid cursor") from e
+
+
+def convert_currency(amount, from_cur, to_cur, date=None):
+    """Convert currency using the ECB reference rate of ``date`` (default latest)."""
     if from_cur == to_cur:
         return amount
     try:
-        return currency_converter.convert(amount, from_cur, to_cur)
+        return currency_service.convert_one(amount, from_cur, to_cur, date)
     except Exception as e:
         raise HTTPException(
             status_code=400, detail=f"Currency conversion failed: {str(e)}"
@@ -55,6 +85,12 @@ class ExpenseCreate(BaseModel):
     date: Optional[datetime.datetime] = None
 
 
+class ExpenseBulkCreate(BaseModel):
+    """Model for creating many expenses in one request."""
+
+    expenses: list[ExpenseCreate] = Field(..., min_length=1, max_length=MAX_BULK_SIZE)
+
+
 class ExpenseUpdate(BaseModel):
     """Model for updating an expense."""
 
@@ -66,29 +102,8 @@ class ExpenseUpdate(BaseModel):
     date: Optional[datetime.datetime] = None
 
 
-@router.post("/")
-async def add_expense(expense: ExpenseCreate, token: str = Header(None)):
-    """
-    Add a new expense for the user.
-
-    Args:
-        expense (ExpenseCreate): Expense details.
-        token (str): Authentication token.
-
-    Returns:
-        dict: Message with expense details and updated balance.
-    """
-    user_id = await verify_token(token)
-    account = await accounts_collection.find_one(
-        {"user_id": user_id, "name": expense.account_name}
-    )
-    if not account:
-        raise HTTPException(status_code=400, detail="Invalid account type")
-
-    user = await users_collection.find_one({"_id": ObjectId(user_id)})
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-
+def check_expense(expense: ExpenseCreate, user: dict):
+    """Normalise the currency of a new expense and check it against the user."""
     expense.currency = expense.currency.upper()
     if expense.currency not in user["currencies"]:
         raise HTTPException(
@@ -98,16 +113,6 @@ async def add_expense(expense: ExpenseCreate, token: str = Header(None)):
                 f"Available currencies are {user['currencies']}"
             ),
         )
-    converted_amount = convert_currency(
-        expense.amount, expense.currency, account["currency"]
-    )
-
-    if account["balance"] < converted_amount:
-        raise HTTPException(
-            status_code=400,
-            detail=f"Insufficient balance in {expense.account_name} account",
-        )
-
     if expense.category not in user["categories"]:
         raise HTTPException(
             status_code=400,
@@ -117,14 +122,38 @@ async def add_expense(expense: ExpenseCreate, token: str = Header(None)):
             ),
         )
 
-    # Deduct amount from user's account balance
-    new_balance = account["balance"] - converted_amount
-    await accounts_collection.update_one(
-        {"_id": account["_id"]}, {"$set": {"balance": new_balance}}
+
+@router.post("/")
+async def add_expense(
+    expense: ExpenseCreate, principal: Principal = Depends(get_principal)
+):
+    """
+    Add a new expense for the user.
+
+    Args:
+        expense (ExpenseCreate): Expense details.
+        principal (Principal): The authenticated caller.
+
+    Returns:
+        dict: Message with expense details and updated balance.
+    """
+    user_id = principal.user_id
+    account = await accounts_collection.find_one(
+        {"user_id": user_id, "name": expense.account_name}
     )
+    if not account:
+        raise HTTPException(status_code=400, detail="Invalid account type")
+
+    user = await principal.require_user()
+
+    check_expense(expense, user)
 
     # Convert date to datetime object or use current datetime if none is provided
     expense_date = expense.date or datetime.datetime.now(datetime.timezone.utc)
+    converted_amount = convert_currency(
+        expense.amount, expense.currency, account["currency"], expense_date
+    )
+
     # Record the expense
     expense_data = expense.dict()
     expense_data.update(
@@ -133,48 +162,261 @@ async def add_expense(expense: ExpenseCreate, token: str = Header(None)):
             "date": expense_date,
         }
     )
-    result = await expenses_collection.insert_one(expense_data)
-
-    if result.inserted_id:
-        expense_data["date"] = expense_date  # Ensure consistent formatting for response
-        return {
-            "message": "Expense added successfully",
-            "expense": format_id(expense_data),
-            "balance": new_balance,
-        }
-    raise HTTPException(status_code=500, detail="Failed to add expense")
+
+    async def record_expense(session) -> float:
+        # The balance check and the deduction are a single atomic update
+        updated_account = await accounts_collection.find_one_and_update(
+            {"_id": account["_id"], "balance": {"$gte": converted_amount}},
+            {"$inc": {"balance": -converted_amount}},
+            return_document=ReturnDocument.AFTER,
+            session=session,
+        )
+        if not updated_account:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Insufficient balance in {expense.account_name} account",
+            )
+        await expenses_collection.insert_one(expense_data, session=session)
+        await apply_expense(user_id, expense_data, session=session)
+        return updated_account["balance"]
+
+    new_balance = await run_data_write(user_id, record_expense)
+
+    expense_data["date"] = expense_date  # Ensure consistent formatting for response
+    return {
+        "message": "Expense added successfully",
+        "expense": format_id(expense_data),
+        "balance": new_balance,
+    }
+
+
+def check_bulk_row(expense: ExpenseCreate, user: dict, accounts: dict) -> str:
+    """Check one row of a bulk request and return the currency of its account."""
+    account = accounts.get(expense.account_name)
+    if not account:
+        raise HTTPException(status_code=400, detail="Invalid account type")
+    check_expense(expense, user)
+    if expense.currency != account["currency"]:
+        codes = currency_service.table.codes
+        for code in (expense.currency, account["currency"]):
+            if code not in codes:
+                raise HTTPException(
+                    status_code=400,
+                    detail=(
+                        f"Currency conversion failed: {code} is not a supported "
+                        f"currency"
+                    ),
+                )
+    return account["currency"]
+
+
+def convert_bulk_rows(expenses: list, targets: dict) -> dict:
+    """
+    Convert the amounts of checked bulk rows into their account currencies.
+
+    Rows are grouped by (expense currency, account currency) and every group
+    is converted with one vectorised call at the rates of the rows' dates.
+
+    Args:
+        expenses (list[ExpenseCreate]): All rows of the request.
+        targets (dict): Account currency by index of each checked row.
+
+    Returns:
+        dict: Converted amount by row index.
+    """
+    groups: dict[tuple[str, str], list[int]] = {}
+    for index, target in targets.items():
+        groups.setdefault((expenses[index].currency, target), []).append(index)
+
+    converted: dict[int, float] = {}
+    for (from_cur, to_cur), indexes in groups.items():
+        amounts = [expenses[index].amount for index in indexes]
+        if from_cur != to_cur:
+            amounts = convert_column(
+                amounts, from_cur, to_cur, [expenses[index].date for index in indexes]
+            ).tolist()
+        converted.update(zip(indexes, amounts))
+    return converted
+
+
+async def ingest_expenses(  # pylint: disable=too-many-locals
+    user_id: str, user: dict, expenses: list
+) -> dict:
+    """
+    Validate and record a batch of new expenses for one user.
+
+    Rows are checked against the user document, their amounts are converted
+    in one call per currency pair, and they are then charged in order against
+    a running balance per account; invalid or overdrawing rows are reported
+    and skipped. The
+    valid rows are inserted with one insert_many and every account is charged
+    once with the net total of its rows.
+
+    Args:
+        user_id (str): ID of the user.
+        user (dict): The user document.
+        expenses (list[ExpenseCreate]): Expenses to record.
+
+    Returns:
+        dict: Per-row results and the new balance of every charged account.
+    """
+    accounts = {
+        account["name"]: account
+        async for account in accounts_collection.find({"user_id": user_id})
+    }
+    balances = {name: account["balance"] for name, account in accounts.items()}
+    now = datetime.datetime.now(datetime.timezone.utc)
+
+    # Check every row first so the amounts are converted in a few batches
+    errors: dict[int, str] = {}
+    targets: dict[int, str] = {}
+    for index, expense in enumerate(expenses):
+        try:
+            targets[index] = check_bulk_row(expense, user, accounts)
+        except HTTPException as e:
+            errors[index] = e.detail
+    converted = convert_bulk_rows(expenses, targets)
+
+    results: list[dict] = []
+    documents: list[dict] = []
+    charges: dict[str, float] = {}
+    for index, expense in enumerate(expenses):
+        if index in errors:
+            results.append({"index": index, "status": "error", "detail": errors[index]})
+            continue
+        converted_amount = converted[index]
+        if balances[expense.account_name] < converted_amount:
+            results.append(
+                {
+                    "index": index,
+                    "status": "error",
+                    "detail": f"Insufficient balance in {expense.account_name} account",
+                }
+            )
+            continue
+
+        balances[expense.account_name] -= converted_amount
+        charges[expense.account_name] = (
+            charges.get(expense.account_name, 0.0) + converted_amount
+        )
+        document = expense.dict()
+        document.update(
+            {"_id": ObjectId(), "user_id": user_id, "date": expense.date or now}
+        )
+        documents.append(document)
+        results.append(
+            {"index": index, "status": "created", "_id": str(document["_id"])}
+        )
+
+    async def record_expenses(session) -> dict:
+        new_balances: dict[str, float] = {}
+        for name, charge in charges.items():
+            # Charge the net total only if the balance still covers it
+            updated_account = await accounts_collection.find_one_and_update(
+                {"_id": accounts[name]["_id"], "balance": {"$gte": charge}},
+                {"$inc": {"balance": -charge}},
+                return_document=ReturnDocument.AFTER,
+                session=session,
+            )
+            if not updated_account:
+                if session is None:
+                    # No transaction to abort, so undo the accounts charged so far
+                    for charged in new_balances:
+                        await accounts_collection.update_one(
+                            {"_id": accounts[charged]["_id"]},
+                            {"$inc": {"balance": charges[charged]}},
+                        )
+                raise HTTPException(
+                    status_code=409,
+                    detail=f"Balance of {name} account changed, please retry",
+                )
+            new_balances[name] = updated_account["balance"]
+        if documents:
+            await expenses_collection.insert_many(
+                documents, ordered=False, session=session
+            )
+            await apply_expenses(user_id, documents, session=session)
+        return new_balances
+
+    new_balances = await run_data_write(user_id, record_expenses) if documents else {}
+    return {"results": results, "balances": new_balances}
+
+
+@router.post("/bulk")
+async def add_expenses_bulk(
+    bulk: ExpenseBulkCreate, principal: Principal = Depends(get_principal)
+):
+    """
+    Add many expenses for the user in one request.
+
+    Args:
+        bulk (ExpenseBulkCreate): Expenses to add.
+        principal (Principal): The authenticated caller.
+
+    Returns:
+        dict: Message, per-row results and the updated account balances.
+    """
+    user_id = principal.user_id
+    user = await principal.require_user()
+
+    ingested = await ingest_expenses(user_id, user, bulk.expenses)
+    created = sum(result["status"] == "created" for result in ingested["results"])
+    return {"message": f"{created} expenses added successfully", **ingested}
 
 
 @router.get("/")
-async def get_expenses(token: str = Header(None)):
+async def get_expenses(
+    principal: Principal = Depends(get_principal),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = Query(None),
+):
     """
-    Get all expenses for a user.
+    Get one page of a user's expenses, newest first.
+
+    Pages are keyed on (date, _id), so every page costs the same index seek
+    no matter how deep into the history it is.
 
     Args:
-        token (str): Authentication token.
+        principal (Principal): The authenticated caller.
+        limit (int): Maximum number of expenses to return.
+        cursor (str, optional): The next_cursor of the previous page.
 
     Returns:
-        dict: List of expenses.
+        dict: List of expenses and the cursor of the next page (None on the last page).
     """
-    user_id = await verify_token(token)
-    expenses = await expenses_collection.find({"user_id": user_id}).to_list(1000)
-    formatted_expenses = [format_id(expense) for expense in expenses]
-    return {"expenses": formatted_expenses}
+    user_id = principal.user_id
+    query: dict = {"user_id": user_id}
+    if cursor:
+        cursor_date, cursor_id = decode_cursor(cursor)
+        query["$or"] = [
+            {"date": {"$lt": cursor_date}},
+            {"date": cursor_date, "_id": {"$lt": cursor_id}},
+        ]
+
+    expenses = (
+        await expenses_collection.find(query)
+        .sort([("date", -1), ("_id", -1)])
+        .limit(limit + 1)
+        .to_list(limit + 1)
+    )
+    next_cursor = encode_cursor(expenses[limit - 1]) if len(expenses) > limit else None
+    formatted_expenses = [format_id(expense) for expense in expenses[:limit]]
+    return {"expenses": formatted_expenses, "next_cursor": next_cursor}
 
 
 @router.get("/{expense_id}")
-async def get_expense(expense_id: str, token: str = Header(None)):
+async def get_expense(expense_id: str, principal: Principal = Depends(get_principal)):
     """
     Get a specific expense by ID.
 
     Args:
         expense_id (str): ID of the expense.
-        token (str): Authentication token.
+        principal (Principal): The authenticated caller.
 
     Returns:
         dict: Details of the specified expense.
     """
-    user_id = await verify_token(token)
+    user_id = principal.user_id
     expense = await expenses_collection.find_one(
         {"user_id": user_id, "_id": ObjectId(expense_id)}
     )
@@ -184,100 +426,146 @@ async def get_expense(expense_id: str, token: str = Header(None)):
 
 
 @router.delete("/all")
-async def delete_all_expenses(token: str = Header(None)):
+async def delete_all_expenses(principal: Principal = Depends(get_principal)):
     """
     Delete all expenses for the authenticated user and update account balances.
 
     Args:
-        token (str): Authentication token.
+        principal (Principal): The authenticated caller.
 
     Returns:
         dict: Message indicating the number of expenses deleted.
     """
-    user_id = await verify_token(token)
-
-    # Retrieve all expenses for the user before deletion
-    expenses = await expenses_collection.find({"user_id": user_id}).to_list(None)
-    if not expenses:
-        raise HTTPException(status_code=404, detail="No expenses found to delete")
-
-    # Organize expenses by account name to sum them for each account
-    account_adjustments: dict[str, float] = {}
-    for expense in expenses:
-        account_name = expense.get("account_name")
-        amount = expense.get("amount", 0)
-
-        # Find the account ID by name
-        account = await accounts_collection.find_one(
-            {"name": account_name, "user_id": user_id}
-        )
-        if account:
-            account_id = account["_id"]
-            if account_id in account_adjustments:
-                account_adjustments[account_id] += amount
-            else:
-                account_adjustments[account_id] = amount
-
-    # Update each account's balance
-    for account_id, total_expense_amount in account_adjustments.items():
-        await accounts_collection.update_one(
-            {"_id": account_id, "user_id": user_id},
-            {"$inc": {"balance": total_expense_amount}},
-        )
+    user_id = principal.user_id
+
+    async def remove_all(session):
+        # Total the expenses per account and currency on the server
+        totals = await expenses_collection.aggregate(
+            [
+                {"$match": {"user_id": user_id}},
+                {
+                    "$group": {
+                        "_id": {
+                            "account_name": "$account_name",
+                            "currency": "$currency",
+                            "day": {"$dateTrunc": {"date": "$date", "unit": "day"}},
+                        },
+                        "amount": {"$sum": "$amount"},
+                    }
+                },
+            ],
+            session=session,
+        ).to_list(None)
+        if not totals:
+            raise HTTPException(status_code=404, detail="No expenses found to delete")
+
+        account_names = list({total["_id"]["account_name"] for total in totals})
+        accounts = {
+            account["name"]: account
+            async for account in accounts_collection.find(
+                {"user_id": user_id, "name": {"$in": account_names}}, session=session
+            )
+        }
+
+        # Refund each account in its own currency, at the rates of the expense days
+        refunds: dict = {}
+        for currency in {account["currency"] for account in accounts.values()}:
+            group = [
+                total
+                for total in totals
+                if accounts.get(total["_id"]["account_name"], {}).get("currency")
+                == currency
+            ]
+            converted = convert_column(
+                [total["amount"] for total in group],
+                [total["_id"]["currency"] for total in group],
+                currency,
+                [total["_id"]["day"] for total in group],
+            )
+            for total, amount in zip(group, converted):
+                account_id = accounts[total["_id"]["account_name"]]["_id"]
+                refunds[account_id] = refunds.get(account_id, 0.0) + float(amount)
+        if refunds:
+            await accounts_collection.bulk_write(
+                [
+                    UpdateOne({"_id": account_id}, {"$inc": {"balance": refund}})
+                    for account_id, refund in refunds.items()
+                ],
+                ordered=False,
+                session=session,
+            )
 
-    # Delete all expenses
-    result = await expenses_collection.delete_many({"user_id": user_id})
+        result = await expenses_collection.delete_many(
+            {"user_id": user_id}, session=session
+        )
+        await clear_user(user_id, session=session)
+        return result.deleted_count
 
-    return {"message": f"{result.deleted_count} expenses deleted successfully"}
+    deleted_count = await run_data_write(user_id, remove_all)
+    return {"message": f"{deleted_count} expenses deleted successfully"}
 
 
 @router.delete("/{expense_id}")
-async def delete_expense(expense_id: str, token: str = Header(None)):
+async def delete_expense(
+    expense_id: str, principal: Principal = Depends(get_principal)
+):
     """
     Delete an expense by ID.
 
     Args:
         expense_id (str): ID of the expense to delete.
-        token (str): Authentication token.
+        principal (Principal): The authenticated caller.
 
     Returns:
         dict: Message with updated balance.
     """
-    user_id = await verify_token(token)
+    user_id = principal.user_id
     expense = await expenses_collection.find_one({"_id": ObjectId(expense_id)})
 
     if not expense or expense["user_id"] != user_id:
         raise HTTPException(status_code=404, detail="Expense not found")
 
-    account_name = expense["account_name"]
     account = await accounts_collection.find_one(
-        {"user_id": user_id, "name": account_name}
+        {"user_id": user_id, "name": expense["account_name"]}
     )
     if not account:
         raise HTTPException(status_code=404, detail="Account not found")
 
     amount = convert_currency(
-        expense["amount"], expense["currency"], account["currency"]
+        expense["amount"],
+        expense["currency"],
+        account["currency"],
+        expense.get("date"),
     )
 
-    # Refund the amount to user's account
-    new_balance = account["balance"] + amount
-    await accounts_collection.update_one(
-        {"_id": account["_id"]}, {"$set": {"balance": new_balance}}
-    )
-
-    # Delete the expense
-    result = await expenses_collection.delete_one({"_id": ObjectId(expense_id)})
+    async def remove_expense(session) -> float:
+        result = await expenses_collection.delete_one(
+            {"_id": ObjectId(expense_id)}, session=session
+        )
+        if result.deleted_count != 1:
+            raise HTTPException(status_code=500, detail="Failed to delete expense")
+        # Refund the amount to user's account
+        updated_account = await accounts_collection.find_one_and_update(
+            {"_id": account["_id"]},
+            {"$inc": {"balance": amount}},
+            return_document=ReturnDocument.AFTER,
+            session=session,
+        )
+        if not updated_account:
+            raise HTTPException(status_code=404, detail="Account not found")
+        await apply_expense(user_id, expense, -1, session=session)
+        return updated_account["balance"]
 
-    if result.deleted_count == 1:
-        return {"message": "Expense deleted successfully", "balance": new_balance}
-    raise HTTPException(status_code=500, detail="Failed to delete expense")
+    new_balance = await run_data_write(user_id, remove_expense)
+    return {"message": "Expense deleted successfully", "balance": new_balance}
 
 
 @router.put("/{expense_id}")
 # pylint: disable=too-many-locals
 async def update_expense(
-    expense_id: str, expense_update: ExpenseUpdate, token: str = Header(None)
+    expense_id: str,
+    expense_update: ExpenseUpdate,
+    principal: Principal = Depends(get_principal),
 ):
     """
     Update an expense by ID.
@@ -285,15 +573,13 @@ async def update_expense(
     Args:
         expense_id (str): ID of the expense to update.
         expense_update (ExpenseUpdate): Expense update details.
-        token (str): Authentication token.
+        principal (Principal): The authenticated caller.
 
     Returns:
         dict: Message with updated expense and balance.
     """
-    user_id = await verify_token(token)
-    user = await users_collection.find_one({"_id": ObjectId(user_id)})
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
+    user_id = principal.user_id
+    user = await principal.require_user()
 
     expense = await expenses_collection.find_one({"_id": ObjectId(expense_id)})
     if not expense or expense["user_id"] != user_id:
@@ -314,32 +600,27 @@ async def update_expense(
                 )
             update_fields["currency"] = expense_update.currency
 
-    async def validate_amount():
-        nonlocal new_balance
+    def validate_amount():
+        """Return how much more (in the account currency) the expense now costs."""
         if expense_update.amount is not None:
             update_fields["amount"] = expense_update.amount
-
-            # Adjust the user's balance
-            # Convert old and new amounts to the account currency to determine balance adjustment
-            original_amount_converted = convert_currency(
-                expense["amount"], expense["currency"], account["currency"]
-            )
-            new_amount_converted = convert_currency(
-                expense_update.amount,
-                expense_update.currency or expense["currency"],
-                account["currency"],
-            )
-
-            difference = new_amount_converted - original_amount_converted
-            new_balance = account["balance"] - difference
-
-            if new_balance < 0:
-                raise HTTPException(
-                    status_code=400, detail="Insufficient balance to update the expense"
-                )
-            await accounts_collection.update_one(
-                {"_id": account["_id"]}, {"$set": {"balance": new_balance}}
-            )
+        if not {"amount", "currency", "date"} & update_fields.keys():
+            return 0.0
+
+        # Convert old and new amounts to the account currency at their own dates
+        original_amount_converted = convert_currency(
+            expense["amount"],
+            expense["currency"],
+            account["currency"],
+            expense.get("date"),
+        )
+        new_amount_converted = convert_currency(
+            update_fields.get("amount", expense["amount"]),
+            update_fields.get("currency", expense["currency"]),
+            account["currency"],
+            update_fields.get("date", expense.get("date")),
+        )
+        return new_amount_converted - original_amount_converted
 
     def validate_category():
         if expense_update.category:
@@ -370,25 +651,45 @@ async def update_expense(
     if not account:
         raise HTTPException(status_code=404, detail="Account not found")
 
-    new_balance = account["balance"]
-    await validate_amount()
+    validate_date()
+    difference = validate_amount()
     validate_category()
     validate_description()
-    validate_date()
 
     if not update_fields:
         raise HTTPException(status_code=400, detail="No fields to update")
 
-    result = await expenses_collection.update_one(
-        {"_id": ObjectId(expense_id)}, {"$set": update_fields}
-    )
-    if result.modified_count == 1:
-        updated_expense = await expenses_collection.find_one(
-            {"_id": ObjectId(expense_id)}
+    # A larger expense may only be charged if the balance still covers it
+    balance_filter: dict = {"_id": account["_id"]}
+    if difference > 0:
+        balance_filter["balance"] = {"$gte": difference}
+
+    async def apply_update(session):
+        updated_account = await accounts_collection.find_one_and_update(
+            balance_filter,
+            {"$inc": {"balance": -difference}},
+            return_document=ReturnDocument.AFTER,
+            session=session,
         )
-        return {
-            "message": "Expense updated successfully",
-            "updated_expense": format_id(updated_expense),
-            "balance": new_balance,
-        }
-    raise HTTPException(status_code=500, detail="Failed to update expense")
+        if not updated_account:
+            raise HTTPException(
+                status_code=400, detail="Insufficient balance to update the expense"
+            )
+
+        updated_expense = await expenses_collection.find_one_and_update(
+            {"_id": ObjectId(expense_id)},
+            {"$set": update_fields},
+            return_document=ReturnDocument.AFTER,
+            session=session,
+        )
+        if not updated_expense:
+            raise HTTPException(status_code=500, detail="Failed to update expense")
+        await move_expense(user_id, expense, updated_expense, session=session)
+        return updated_expense, updated_account["balance"]
+
+    updated_expense, new_balance = await run_data_write(user_id, apply_update)
+    return {
+        "message": "Expense updated successfully",
+        "updated_expense": format_id(updated_expense),
+        "balance": new_balance,
+    }
@@ -2,34 +2,66 @@
 This module contains the API routes for exporting data in various formats.
 """
 
+import asyncio
 import csv
 import datetime
 import os
 from enum import Enum
+from functools import partial
 from io import BytesIO, StringIO
-from typing import Optional
+from itertools import repeat
+from tempfile import SpooledTemporaryFile
+from typing import (
+    IO,
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterator,
+    NamedTuple,
+    Optional,
+    Tuple,
+    Union,
+)
 
+import numpy as np
 from bson import ObjectId
-from fastapi import APIRouter, Header, HTTPException, Query, Response
-from motor.motor_asyncio import AsyncIOMotorClient
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
+from fastapi.responses import FileResponse, StreamingResponse
 from openpyxl import Workbook
+from openpyxl.worksheet._write_only import WriteOnlyWorksheet  # type: ignore
 from openpyxl.worksheet.worksheet import Worksheet
-from pytz import timezone  # type: ignore
-from reportlab.lib import colors  # type: ignore
-from reportlab.lib.pagesizes import letter  # type: ignore
-from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet  # type: ignore
+from pydantic import BaseModel
 from reportlab.lib.units import inch  # type: ignore
-from reportlab.platypus import (  # type: ignore
-    Image,
-    PageBreak,
-    Paragraph,
-    SimpleDocTemplate,
-    Spacer,
-    Table,
-    TableStyle,
-)
+from reportlab.platypus import Image, PageBreak, Spacer  # type: ignore
 
+from api.utils.aggregations import ExpenseFrame, RunningTotals, downsample
 from api.utils.auth import verify_token
+from api.utils.chart_cache import chart_digest
+from api.utils.columnar import (
+    EXPORT_FIELDS,
+    fetch_expense_columns,
+    iter_expense_columns,
+)
+from api.utils.currency import get_report_currency
+from api.utils.db import (
+    accounts_collection,
+    build_expense_query,
+    expenses_collection,
+    export_jobs_collection,
+    users_collection,
+    validate_date_range,
+)
+from api.utils.export_jobs import Progress, export_jobs
+from api.utils.pdf import (
+    create_paragraph,
+    create_table,
+    logo_image,
+    long_table,
+    pdf_styles,
+    write_pdf,
+)
 from api.utils.plots import (
     create_budget_vs_actual,
     create_category_bar,
@@ -37,16 +69,44 @@ from api.utils.plots import (
     create_expense_bar,
     create_monthly_line,
 )
-from config.config import MONGO_URI, TIME_ZONE
+from api.utils.principal import Principal, data_version, get_principal
+from api.utils.render import render_chart
 
 router = APIRouter(prefix="/exports", tags=["Exports"])
 
-# MongoDB setup
-client: AsyncIOMotorClient = AsyncIOMotorClient(MONGO_URI)
-db = client.mmdb
-expenses_collection = db.expenses
-accounts_collection = db.accounts
-users_collection = db.users
+EXPENSE_COLUMNS = [
+    "date",
+    "amount",
+    "currency",
+    "category",
+    "description",
+    "account_name",
+    "_id",
+    "report_amount",
+    "report_currency",
+]
+# Exports larger than this are spooled to a temporary file instead of memory
+SPOOL_MAX_SIZE = 8 * 1024 * 1024
+STREAM_CHUNK_SIZE = 64 * 1024
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+Sheet = Union[Worksheet, WriteOnlyWorksheet]
+
+
+class ExportRequest(NamedTuple):
+    """The user, date range and report currency of an export."""
+
+    user_id: str
+    from_date: Optional[datetime.date]
+    to_date: Optional[datetime.date]
+    report_currency: str
+
+
+ExportWriter = Callable[..., Awaitable[None]]
+
+
+async def no_progress(_fraction: float):
+    """Ignore the progress of an export built for a direct download."""
 
 
 class ExportType(str, Enum):
@@ -57,57 +117,87 @@ class ExportType(str, Enum):
     CATEGORIES = "categories"
 
 
+async def fetch_accounts_and_user(user_id: str) -> Tuple[list, Optional[dict]]:
+    """Fetch the accounts and the user document of a user."""
+    accounts = await accounts_collection.find({"user_id": user_id}).to_list(100)
+    user = await users_collection.find_one({"_id": ObjectId(user_id)})
+    return accounts, user
+
+
 # Utility function to fetch data
 async def fetch_user_data(
-    user_id: str, from_date: Optional[datetime.date], to_date: Optional[datetime.date]
-):
-    """Fetch data from the database based on user ID and date range."""
-    if from_date and to_date and from_date > to_date:
-        raise HTTPException(
-            status_code=422,
-            detail="Invalid date range: 'from_date' must be before 'to_date'",
-        )
+    user_id: str,
+    from_date: Optional[datetime.date],
+    to_date: Optional[datetime.date],
+    report_currency: str,
+) -> Tuple[ExpenseFrame, list, Optional[dict]]:
+    """
+    Fetch data from the database based on user ID and date range.
 
-    from_dt = (
-        datetime.datetime.combine(from_date, datetime.time.min) if from_date else None
+    Expenses are decoded straight into columns (see ``api.utils.columnar``)
+    and returned as an ExpenseFrame in ``report_currency``.
+    """
+    query = build_expense_query(user_id, from_date, to_date)
+    columns = await fetch_expense_columns(
+        expenses_collection, query, EXPORT_FIELDS, limit=1000
+    )
+    accounts, user = await fetch_accounts_and_user(user_id)
+
+    return ExpenseFrame(columns, report_currency), accounts, user
+
+
+def expense_rows(frame: ExpenseFrame) -> Iterator[tuple]:
+    """Yield the EXPENSE_COLUMNS values of every expense."""
+    columns = frame.columns
+    dates = frame.dates.strftime("%Y-%m-%d")
+    return zip(
+        (date if isinstance(date, str) else "" for date in dates),
+        frame.amounts.tolist(),
+        np.asarray(columns["currency"]).tolist(),
+        np.asarray(columns["category"]).tolist(),
+        (description or "" for description in columns["description"]),
+        np.asarray(columns["account_name"]).tolist(),
+        map(str, columns["_id"]),
+        frame.report_amounts.round(2).tolist(),
+        repeat(frame.report_currency),
     )
-    to_dt = datetime.datetime.combine(to_date, datetime.time.max) if to_date else None
 
-    query = {"user_id": user_id}
-    if from_dt and to_dt:
-        query["date"] = {"$gte": from_dt, "$lte": to_dt}  # type: ignore
-    elif from_dt:
-        query["date"] = {"$gte": from_dt}  # type: ignore
-    elif to_dt:
-        query["date"] = {"$lte": to_dt}  # type: ignore
 
-    expenses = await expenses_collection.find(query).to_list(1000)
-    accounts = await accounts_collection.find({"user_id": user_id}).to_list(100)
-    user = await users_collection.find_one({"_id": ObjectId(user_id)})
+def append_expense_rows(sheet: Sheet, frame: ExpenseFrame):
+    """Append the rows of a batch of expenses to the given worksheet."""
+    for row in expense_rows(frame):
+        sheet.append(list(row))
+
+
+def threaded_rows(
+    batches: AsyncIterator[Dict[str, Any]],
+    report_currency: str,
+    loop: asyncio.AbstractEventLoop,
+) -> Iterator[tuple]:
+    """
+    Yield the EXPENSE_COLUMNS values of streamed column batches in a worker thread.
+
+    Each batch is fetched on the event loop while the thread waits for it.
+    """
 
-    return expenses, accounts, user
+    async def next_batch() -> Dict[str, Any]:
+        return await anext(batches)
 
+    while True:
+        try:
+            columns = asyncio.run_coroutine_threadsafe(next_batch(), loop).result()
+        except StopAsyncIteration:
+            return
+        yield from expense_rows(ExpenseFrame(columns, report_currency))
 
-def write_expenses_to_sheet(sheet: Worksheet, expenses: list):
+
+def write_expenses_to_sheet(sheet: Sheet, frame: ExpenseFrame):
     """Write expenses data to the given worksheet."""
-    sheet.append(
-        ["date", "amount", "currency", "category", "description", "account_name", "_id"]
-    )
-    for expense in expenses:
-        sheet.append(
-            [
-                expense["date"].strftime("%Y-%m-%d") if expense.get("date") else "",
-                expense["amount"],
-                expense["currency"],
-                expense["category"],
-                expense.get("description", ""),
-                expense["account_name"],
-                str(expense["_id"]),
-            ]
-        )
+    sheet.append(EXPENSE_COLUMNS)
+    append_expense_rows(sheet, frame)
 
 
-def write_accounts_to_sheet(sheet: Worksheet, accounts: list):
+def write_accounts_to_sheet(sheet: Sheet, accounts: list):
     """Write accounts data to the given worksheet."""
     sheet.append(["name", "balance", "currency", "_id"])
     for account in accounts:
@@ -121,74 +211,131 @@ def write_accounts_to_sheet(sheet: Worksheet, accounts: list):
         )
 
 
-def write_categories_to_sheet(sheet: Worksheet, categories: dict):
+def write_categories_to_sheet(sheet: Sheet, categories: dict):
     """Write categories data to the given worksheet."""
     sheet.append(["name", "monthly_budget"])
     for category_name, category_data in categories.items():
         sheet.append([category_name, category_data["monthly_budget"]])
 
 
+def discard_workbook(workbook: Workbook):
+    """Remove the temporary files of a write-only workbook that was not saved."""
+    for sheet in workbook.worksheets:
+        writer = getattr(sheet, "_writer", None)
+        if writer is None:
+            continue
+        if not sheet.closed:
+            sheet.close()
+        if os.path.exists(writer.out):
+            writer.cleanup()
+
+
+async def spool_export(write: ExportWriter, request: ExportRequest) -> IO[bytes]:
+    """
+    Build an export into a temporary file.
+
+    The file stays in memory while it is smaller than ``SPOOL_MAX_SIZE``
+    and is then moved to disk.
+    """
+    # Closed by stream_file once the response is sent
+    output = SpooledTemporaryFile(  # pylint: disable=consider-using-with
+        max_size=SPOOL_MAX_SIZE
+    )
+    try:
+        await write(request, output)
+    except BaseException:
+        output.close()
+        raise
+    return output
+
+
+def stream_file(file: IO[bytes]) -> Iterator[bytes]:
+    """Yield a file's content from the start in chunks, then close it."""
+    with file:
+        file.seek(0)
+        while chunk := file.read(STREAM_CHUNK_SIZE):
+            yield chunk
+
+
+def file_response(file: IO[bytes], media_type: str, filename: str) -> Response:
+    """Stream a finished export file to the client."""
+    size = file.seek(0, os.SEEK_END)
+    return StreamingResponse(
+        stream_file(file),
+        media_type=media_type,
+        headers={
+            "Content-Disposition": f"attachment; filename={filename}",
+            "Content-Length": str(size),
+        },
+    )
+
+
+async def write_xlsx_export(
+    request: ExportRequest, output: IO[bytes], progress: Progress = no_progress
+):
+    """
+    Write the expenses, accounts, and categories of a user as an XLSX file.
+
+    The workbook is write-only: expenses are read from the cursor a batch
+    at a time and their rows are written out to the sheet's temporary file
+    in a worker thread, so memory stays flat however many expenses match.
+    """
+    query = build_expense_query(*request[:3])
+    accounts, user = await fetch_accounts_and_user(request.user_id)
+
+    workbook = Workbook(write_only=True)
+    try:
+        # Write expenses
+        expenses_sheet = workbook.create_sheet(title="Expenses")
+        expenses_sheet.append(EXPENSE_COLUMNS)
+        expense_count = 0
+        async for columns in iter_expense_columns(
+            expenses_collection, query, EXPORT_FIELDS
+        ):
+            frame = ExpenseFrame(columns, request.report_currency)
+            await asyncio.to_thread(append_expense_rows, expenses_sheet, frame)
+            expense_count += len(frame)
+
+        if not expense_count and not accounts and not user:
+            raise HTTPException(status_code=404, detail="No data found")
+        await progress(0.5)
+
+        # Write accounts
+        accounts_sheet = workbook.create_sheet(title="Accounts")
+        write_accounts_to_sheet(accounts_sheet, accounts)
+
+        # Write categories
+        categories_sheet = workbook.create_sheet(title="Categories")
+        if user and user.get("categories"):
+            write_categories_to_sheet(categories_sheet, user["categories"])
+
+        await asyncio.to_thread(workbook.save, output)
+    except BaseException:
+        discard_workbook(workbook)
+        raise
+
+
 @router.get("/xlsx")
 async def data_to_xlsx(
     token: str = Header(None),
     from_date: Optional[datetime.date] = Query(None),
     to_date: Optional[datetime.date] = Query(None),
+    report_currency: str = Depends(get_report_currency),
 ) -> Response:
     """
     Export all expenses, accounts, and categories for a user to an XLSX file.
 
     Args:
         token (str): Authentication token.
+        report_currency (str): Currency of the added report_amount column.
 
     Returns:
         Response: XLSX file containing expenses, accounts, and categories data.
     """
     user_id = await verify_token(token)
-    expenses, accounts, user = await fetch_user_data(user_id, from_date, to_date)
-
-    if not expenses and not accounts and not user:
-        raise HTTPException(status_code=404, detail="No data found")
-
-    workbook = Workbook()
-
-    # Write expenses
-    expenses_sheet: Optional[Worksheet] = workbook.active
-    if expenses_sheet is not None:
-        expenses_sheet.title = "Expenses"
-        write_expenses_to_sheet(expenses_sheet, expenses)
-
-    # Write accounts
-    accounts_sheet: Optional[Worksheet] = workbook.create_sheet(title="Accounts")
-    if accounts_sheet is not None:
-        write_accounts_to_sheet(accounts_sheet, accounts)
-
-    # Write categories
-    categories_sheet: Optional[Worksheet] = workbook.create_sheet(title="Categories")
-    if categories_sheet is not None and user and user.get("categories"):
-        write_categories_to_sheet(categories_sheet, user["categories"])
-
-    output = BytesIO()
-    workbook.save(output)
-    output.seek(0)
-
-    response = Response(
-        content=output.getvalue(),
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-    )
-    response.headers["Content-Disposition"] = "attachment; filename=data.xlsx"
-    return response
-
-
-def create_paragraph(text: str, style: ParagraphStyle) -> Paragraph:
-    """Create a paragraph with the given text and style."""
-    return Paragraph(text, style)
-
-
-def create_table(data: list, col_widths: list, styles: TableStyle) -> Table:
-    """Create a table with the given data, column widths, and styles."""
-    table = Table(data, colWidths=col_widths)
-    table.setStyle(styles)
-    return table
+    request = ExportRequest(user_id, from_date, to_date, report_currency)
+    output = await spool_export(write_xlsx_export, request)
+    return file_response(output, XLSX_MEDIA_TYPE, "data.xlsx")
 
 
 @router.get("/csv")
@@ -197,6 +344,7 @@ async def data_to_csv(
     export_type: ExportType = Query(...),
     from_date: Optional[datetime.date] = Query(None),
     to_date: Optional[datetime.date] = Query(None),
+    report_currency: str = Depends(get_report_currency),
 ) -> Response:
     """
     Export expenses, accounts, or categories for a user to a CSV file.
@@ -204,41 +352,23 @@ async def data_to_csv(
     Args:
         token (str): Authentication token.
         export_type (ExportType): Type of data to export (expenses, accounts, categories).
+        report_currency (str): Currency of the added report_amount column.
 
     Returns:
         Response: CSV file containing the selected data.
     """
     user_id = await verify_token(token)
-    expenses, accounts, user = await fetch_user_data(user_id, from_date, to_date)
+    frame, accounts, user = await fetch_user_data(
+        user_id, from_date, to_date, report_currency
+    )
     output = StringIO()
     writer = csv.writer(output)
 
     if export_type == ExportType.EXPENSES:
-        if not expenses:
+        if not frame:
             raise HTTPException(status_code=404, detail="No expenses found")
-        writer.writerow(
-            [
-                "date",
-                "amount",
-                "currency",
-                "category",
-                "description",
-                "account_name",
-                "_id",
-            ]
-        )
-        for expense in expenses:
-            writer.writerow(
-                [
-                    expense["date"].strftime("%Y-%m-%d") if expense.get("date") else "",
-                    expense["amount"],
-                    expense["currency"],
-                    expense["category"],
-                    expense.get("description", ""),
-                    expense["account_name"],
-                    str(expense["_id"]),
-                ]
-            )
+        writer.writerow(EXPENSE_COLUMNS)
+        writer.writerows(expense_rows(frame))
     elif export_type == ExportType.ACCOUNTS:
         if not accounts:
             raise HTTPException(status_code=404, detail="No accounts found")
@@ -266,75 +396,45 @@ async def data_to_csv(
     return response
 
 
-@router.get("/pdf")
-async def data_to_pdf(
-    token: str = Header(None),
-    from_date: Optional[datetime.date] = Query(None),
-    to_date: Optional[datetime.date] = Query(None),
-) -> Response:
+async def write_pdf_export(
+    request: ExportRequest, output: IO[bytes], progress: Progress = no_progress
+):
     """
-    Export all expenses, accounts, and categories for a user to a PDF file within a date range.
+    Write the expenses, accounts, categories and charts of a user as a PDF file.
 
-    Args:
-        token (str): Authentication token.
-        from_date (datetime.date, optional): Start date for filtering expenses (inclusive).
-        to_date (datetime.date, optional): End date for filtering expenses (inclusive).
-
-    Returns:
-        Response: PDF file containing expenses, accounts, and categories data.
+    The document is laid out in a worker thread.
     """
     # pylint: disable=too-many-locals, too-many-statements, too-many-branches
-    user_id = await verify_token(token)
-    expenses, accounts, user = await fetch_user_data(user_id, from_date, to_date)
+    user_id, from_date, to_date, report_currency = request
+    query = build_expense_query(user_id, from_date, to_date)
+    accounts, user = await fetch_accounts_and_user(user_id)
+
+    # The charts only need totals, so a first pass over the expenses keeps
+    # nothing else; the table reads them again while it is laid out
+    totals = RunningTotals()
+    async for columns in iter_expense_columns(expenses_collection, query):
+        totals.add(ExpenseFrame(columns, report_currency))
 
-    if not expenses and not accounts and not user:
+    if not totals and not accounts and not user:
         raise HTTPException(status_code=404, detail="No data found")
+    await progress(0.2)
 
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(
-        buffer,
-        pagesize=letter,
-        title=f"MM PDF Export - {user['username'] if user else 'Unknown'}",
-        lang="en-gb",
-    )
-    styles = getSampleStyleSheet()
+    username = user["username"] if user else "Unknown"
+    styles = pdf_styles()
     elements = []
 
-    # Define a custom style for the title
-    title_style = ParagraphStyle(
-        name="Title",
-        parent=styles["Title"],
-        fontSize=32,  # Increase font size
-        spaceAfter=12,
-    )
-
-    # Define a custom style for the centered description
-    centered_style = ParagraphStyle(
-        name="Centered",
-        parent=styles["Normal"],
-        alignment=1,  # Center alignment
-    )
-
     # Add heading, logo, application description, and TOC on the first page
-    elements.append(create_paragraph("MONEY MANAGER", title_style))
+    elements.append(create_paragraph("MONEY MANAGER", styles["Cover"]))
     elements.append(Spacer(1, 12))
-    logo_path = os.path.abspath(
-        os.path.join(os.path.dirname(__file__), "../../docs/logo/logo.png")
-    )
-    logo = Image(logo_path)
-    logo.drawHeight = 3.0 * inch * logo.drawHeight / logo.drawWidth
-    logo.drawWidth = 3.0 * inch
-    elements.append(logo)
+    elements.append(logo_image(3.0 * inch))
     elements.append(Spacer(1, 18))
     app_description = """
     <b>Money Manager</b> is a comprehensive financial management tool designed to help you track your expenses, manage your accounts, and set budgets for various categories.
     With our application, you can easily export your financial data in various formats including XLSX, CSV, and PDF.
     """
-    elements.append(create_paragraph(app_description, centered_style))
+    elements.append(create_paragraph(app_description, styles["Centered"]))
     elements.append(Spacer(1, 18))
-    elements.append(
-        create_paragraph(f"PDF Report for - {user['username']}", styles["Title"])
-    )
+    elements.append(create_paragraph(f"PDF Report for - {username}", styles["Title"]))
     elements.append(Spacer(1, 36))
 
     # Table of Contents
@@ -372,16 +472,6 @@ async def data_to_pdf(
     elements.extend(toc)
     elements.append(PageBreak())
 
-    # Helper function to wrap text in table cells
-    def wrap_text(data):
-        wrapped_data = []
-        for row in data:
-            wrapped_row = []
-            for cell in row:
-                wrapped_row.append(Paragraph(str(cell), styles["Normal"]))
-            wrapped_data.append(wrapped_row)
-        return wrapped_data
-
     # Expenses
     elements.append(create_paragraph("<a name='expenses'/>Expenses", styles["Title"]))
     elements.append(Spacer(1, 12))
@@ -398,36 +488,19 @@ async def data_to_pdf(
         date_range_text = "Date Range: All"
     elements.append(create_paragraph(date_range_text, styles["Normal"]))
     elements.append(Spacer(1, 12))
-    expenses_data = [
-        ["Date", "Amount", "Currency", "Category", "Description", "Account Name"]
+    expenses_header = [
+        "Date",
+        "Amount",
+        "Currency",
+        "Category",
+        "Description",
+        "Account Name",
+        f"Amount ({report_currency})",
     ]
-    for expense in expenses:
-        expenses_data.append(
-            [
-                expense["date"].strftime("%Y-%m-%d") if expense.get("date") else "",
-                expense["amount"],
-                expense["currency"],
-                expense["category"],
-                expense.get("description", ""),
-                expense["account_name"],
-            ]
-        )
-    expenses_table = create_table(
-        wrap_text(expenses_data),
-        [60, 60, 60, 60, 120, 80, 80],
-        TableStyle(
-            [
-                ("BACKGROUND", (0, 0), (-1, 0), colors.grey),
-                ("TEXTCOLOR", (0, 0), (-1, 0), colors.whitesmoke),
-                ("ALIGN", (0, 0), (-1, -1), "CENTER"),
-                ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
-                ("BOTTOMPADDING", (0, 0), (-1, 0), 12),
-                ("BACKGROUND", (0, 1), (-1, -1), colors.beige),
-                ("GRID", (0, 0), (-1, -1), 1, colors.black),
-            ]
-        ),
-    )
-    elements.append(expenses_table)
+    # Replaced by the expense table in the layout thread, which pulls the rows
+    # a page at a time
+    table_index = len(elements)
+    elements.append(None)
     elements.append(PageBreak())
 
     # Accounts
@@ -436,22 +509,7 @@ async def data_to_pdf(
     accounts_data = [["Name", "Balance", "Currency"]]
     for account in accounts:
         accounts_data.append([account["name"], account["balance"], account["currency"]])
-    accounts_table = create_table(
-        wrap_text(accounts_data),
-        [100, 100, 100, 100],
-        TableStyle(
-            [
-                ("BACKGROUND", (0, 0), (-1, 0), colors.grey),
-                ("TEXTCOLOR", (0, 0), (-1, 0), colors.whitesmoke),
-                ("ALIGN", (0, 0), (-1, -1), "CENTER"),
-                ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
-                ("BOTTOMPADDING", (0, 0), (-1, 0), 12),
-                ("BACKGROUND", (0, 1), (-1, -1), colors.beige),
-                ("GRID", (0, 0), (-1, -1), 1, colors.black),
-            ]
-        ),
-    )
-    elements.append(accounts_table)
+    elements.append(create_table(accounts_data, [100, 100, 100, 100]))
     elements.append(PageBreak())
 
     # Categories
@@ -463,67 +521,236 @@ async def data_to_pdf(
     if user and "categories" in user:
         for category_name, category_data in user["categories"].items():
             categories_data.append([category_name, category_data["monthly_budget"]])
-    categories_table = create_table(
-        wrap_text(categories_data),
-        [200, 200],
-        TableStyle(
-            [
-                ("BACKGROUND", (0, 0), (-1, 0), colors.grey),
-                ("TEXTCOLOR", (0, 0), (-1, 0), colors.whitesmoke),
-                ("ALIGN", (0, 0), (-1, -1), "CENTER"),
-                ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
-                ("BOTTOMPADDING", (0, 0), (-1, 0), 12),
-                ("BACKGROUND", (0, 1), (-1, -1), colors.beige),
-                ("GRID", (0, 0), (-1, -1), 1, colors.black),
-            ]
-        ),
-    )
-    elements.append(categories_table)
+    elements.append(create_table(categories_data, [200, 200]))
 
     # Add analytics graphs
     elements.append(PageBreak())
     elements.append(create_paragraph("<a name='analytics'/>Analytics", styles["Title"]))
     elements.append(Spacer(1, 12))
 
-    # Replace graph fetching section with direct plot generation
-    plot_generators = {
-        "<a name='expense-chart'/>Expense Chart": create_expense_bar,
-        "<a name='category-pie'/>Category Distribution": create_category_pie,
-        "<a name='monthly-line'/>Monthly Expenses": create_monthly_line,
-        "<a name='category-bar'/>Category Comparison": create_category_bar,
-        "<a name='budget-actual'/>Budget vs Actual": lambda e, f, t: create_budget_vs_actual(
-            e, user["categories"] if user else {}, f, t
+    # Charts are drawn from the totals of the first pass
+    category_expenses = totals.totals("category")
+    granularity, bar_expenses = downsample(totals.totals("day"))
+    charts: Dict[str, tuple] = {
+        "<a name='expense-chart'/>Expense Chart": (
+            partial(create_expense_bar, granularity=granularity),
+            bar_expenses,
+            from_date,
+            to_date,
+        ),
+        "<a name='category-pie'/>Category Distribution": (
+            create_category_pie,
+            category_expenses,
+            from_date,
+            to_date,
+        ),
+        "<a name='monthly-line'/>Monthly Expenses": (
+            create_monthly_line,
+            totals.totals("month"),
+            from_date,
+            to_date,
+        ),
+        "<a name='category-bar'/>Category Comparison": (
+            create_category_bar,
+            category_expenses,
+            from_date,
+            to_date,
+        ),
+        "<a name='budget-actual'/>Budget vs Actual": (
+            create_budget_vs_actual,
+            category_expenses,
+            user["categories"] if user else {},
+            from_date,
+            to_date,
+            totals.first_date,
+            totals.last_date,
         ),
     }
 
-    for title, generator in plot_generators.items():
-        image_data = generator(expenses, from_date, to_date)  # type: ignore
-        if image_data:
-            elements.append(create_paragraph(title, styles["Heading2"]))
-            elements.append(Spacer(1, 12))
-            img = Image(image_data)
-            img.drawHeight = 4 * inch * img.drawHeight / img.drawWidth
-            img.drawWidth = 4 * inch
-            elements.append(img)
-            elements.append(Spacer(1, 24))
-
-    # Footer with date of export, "Money Manager V2", and page number
-    def footer(canvas, doc):
-        """Footer with date of export, 'Money Manager V2', and page number."""
-        canvas.saveState()
-        tz = timezone(TIME_ZONE)
-        footer_text = (
-            f"Money Manager V2 - Exported on "
-            f"{datetime.datetime.now(tz).strftime('%Y-%m-%d %H:%M:%S')}"
+    # The charts render concurrently in the render pool
+    images = (
+        await asyncio.gather(
+            *(
+                render_chart(*chart, currency=report_currency)
+                for chart in charts.values()
+            )
         )
-        canvas.setFont("Helvetica", 9)
-        canvas.drawString(inch, 0.75 * inch, footer_text)
-        canvas.drawRightString(7.5 * inch, 0.75 * inch, f"Page {doc.page}")
-        canvas.restoreState()
+        if totals
+        else []
+    )
+    for title, image_data in zip(charts, images):
+        elements.append(create_paragraph(title, styles["Heading2"]))
+        elements.append(Spacer(1, 12))
+        img = Image(BytesIO(image_data))
+        img.drawHeight = 4 * inch * img.drawHeight / img.drawWidth
+        img.drawWidth = 4 * inch
+        elements.append(img)
+        elements.append(Spacer(1, 24))
+
+    await progress(0.5)
+    loop = asyncio.get_running_loop()
+    batches = iter_expense_columns(expenses_collection, query, EXPORT_FIELDS)
+
+    def lay_out():
+        rows = threaded_rows(batches, report_currency, loop)
+        elements[table_index] = long_table(
+            expenses_header,
+            ([*row[:6], f"{row[7]:,.2f}"] for row in rows),
+            [60, 60, 60, 60, 120, 80, 80],
+        )
+        write_pdf(output, elements, f"MM PDF Export - {username}")
 
-    doc.build(elements, onFirstPage=footer, onLaterPages=footer)
-    buffer.seek(0)
+    try:
+        await asyncio.to_thread(lay_out)
+    except asyncio.CancelledError:
+        # The layout thread may still be reading the cursor
+        raise
+    except BaseException:
+        await batches.aclose()
+        raise
 
-    response = Response(content=buffer.getvalue(), media_type="application/pdf")
-    response.headers["Content-Disposition"] = "attachment; filename=data.pdf"
-    return response
+
+@router.get("/pdf")
+async def data_to_pdf(
+    token: str = Header(None),
+    from_date: Optional[datetime.date] = Query(None),
+    to_date: Optional[datetime.date] = Query(None),
+    report_currency: str = Depends(get_report_currency),
+) -> Response:
+    """
+    Export all expenses, accounts, and categories for a user to a PDF file within a date range.
+
+    Args:
+        token (str): Authentication token.
+        from_date (datetime.date, optional): Start date for filtering expenses (inclusive).
+        to_date (datetime.date, optional): End date for filtering expenses (inclusive).
+        report_currency (str): Currency that charts and converted amounts are shown in.
+
+    Returns:
+        Response: PDF file containing expenses, accounts, and categories data.
+    """
+    user_id = await verify_token(token)
+    request = ExportRequest(user_id, from_date, to_date, report_currency)
+    output = await spool_export(write_pdf_export, request)
+    return file_response(output, "application/pdf", "data.pdf")
+
+
+class ExportFormat(str, Enum):
+    """Formats that can be built by an export job."""
+
+    PDF = "pdf"
+    XLSX = "xlsx"
+
+
+EXPORT_FORMATS: Dict[ExportFormat, Tuple[ExportWriter, str]] = {
+    ExportFormat.PDF: (write_pdf_export, "application/pdf"),
+    ExportFormat.XLSX: (write_xlsx_export, XLSX_MEDIA_TYPE),
+}
+
+
+class ExportJobCreate(BaseModel):
+    """Model for starting an export job."""
+
+    format: ExportFormat
+    from_date: Optional[datetime.date] = None
+    to_date: Optional[datetime.date] = None
+
+
+def job_status(job: dict) -> dict:
+    """Return the public view of an export job."""
+    done = job["status"] == "done"
+    return {
+        "job_id": job["_id"],
+        "format": job["format"],
+        "status": job["status"],
+        "progress": job["progress"],
+        "size": job["size"],
+        "error": job["error"],
+        "created_at": job["created_at"],
+        "expires_at": job["expires_at"],
+        "download_url": f"/exports/jobs/{job['_id']}/file" if done else None,
+    }
+
+
+async def find_job(job_id: str, user_id: str) -> dict:
+    """Return one of the user's export jobs or fail with 404."""
+    job = await export_jobs_collection.find_one({"_id": job_id, "user_id": user_id})
+    if not job:
+        raise HTTPException(status_code=404, detail="Export job not found")
+    return job
+
+
+@router.post("/jobs", status_code=202)
+async def create_export_job(
+    job_request: ExportJobCreate,
+    principal: Principal = Depends(get_principal),
+    report_currency: str = Depends(get_report_currency),
+):
+    """
+    Start building a PDF or XLSX export in the background.
+
+    A job is identified by the user, format, date range, report currency and
+    the user's data version, so repeating a request while the data is
+    unchanged returns the existing job instead of building the export again.
+
+    Returns:
+        dict: The job's ID and status; poll ``GET /exports/jobs/{job_id}``.
+    """
+    validate_date_range(job_request.from_date, job_request.to_date)
+    # Read past the user cache, another process may just have changed the data
+    version = await data_version(principal.user_id)
+    if version is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    request = ExportRequest(
+        principal.user_id, job_request.from_date, job_request.to_date, report_currency
+    )
+    job = {
+        "_id": chart_digest(("export", job_request.format.value, *request, version)),
+        "user_id": principal.user_id,
+        "format": job_request.format.value,
+        "from_date": str(job_request.from_date) if job_request.from_date else None,
+        "to_date": str(job_request.to_date) if job_request.to_date else None,
+        "report_currency": report_currency,
+        "version": version,
+    }
+    write = EXPORT_FORMATS[job_request.format][0]
+
+    async def build(output: IO[bytes], progress: Progress):
+        await write(request, output, progress)
+
+    return job_status(await export_jobs.submit(job, build))
+
+
+@router.get("/jobs/{job_id}")
+async def get_export_job(job_id: str, principal: Principal = Depends(get_principal)):
+    """
+    Report the status of an export job.
+
+    ``status`` is "queued", "running", "done" or "failed" (see ``error``),
+    and ``progress`` goes from 0 to 1. Once done, the artifact is served at
+    ``download_url`` until ``expires_at``.
+    """
+    return job_status(await find_job(job_id, principal.user_id))
+
+
+@router.get("/jobs/{job_id}/file")
+async def download_export_job(
+    job_id: str, principal: Principal = Depends(get_principal)
+) -> Response:
+    """
+    Download the artifact of a finished export job.
+
+    ``Range`` requests are answered with the requested bytes, so an
+    interrupted download can be resumed.
+    """
+    job = await find_job(job_id, principal.user_id)
+    if job["status"] != "done":
+        raise HTTPException(status_code=409, detail="Export is not ready")
+    path = export_jobs.artifact(job)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Export has expired")
+    return FileResponse(
+        path,
+        media_type=EXPORT_FORMATS[ExportFormat(job["format"])][1],
+        filename=f"data.{job['format']}",
+    )
@@ -0,0 +1,187 @@
+"""
+This module contains the API routes for importing expenses from CSV and XLSX files.
+"""
+
+import csv
+import io
+import json
+import zipfile
+from itertools import islice
+from typing import IO, Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
+
+from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile
+from fastapi.responses import StreamingResponse
+from openpyxl import load_workbook
+from pydantic import ValidationError
+
+from api.routers.expenses import ExpenseCreate, ingest_expenses
+from api.utils.principal import Principal, get_principal
+
+router = APIRouter(prefix="/imports", tags=["Imports"])
+
+IMPORT_CHUNK_SIZE = 500
+SUPPORTED_FORMATS = ("csv", "xlsx")
+EXPENSE_FIELDS = [
+    "date",
+    "amount",
+    "currency",
+    "category",
+    "description",
+    "account_name",
+]
+
+Row = Tuple[int, Dict[str, Any]]
+
+
+def iter_csv_rows(file: IO[bytes]) -> Iterator[Row]:
+    """Yield (row number, row) pairs from a CSV file, one line at a time."""
+    reader = csv.DictReader(io.TextIOWrapper(file, encoding="utf-8-sig", newline=""))
+    for row in reader:
+        yield reader.line_num, row
+
+
+def iter_xlsx_rows(file: IO[bytes]) -> Iterator[Row]:
+    """
+    Return an iterator of (row number, row) pairs from the expenses sheet of an XLSX file.
+
+    The workbook is opened in read-only mode, so rows are parsed lazily
+    instead of loading the whole sheet into memory.
+    """
+    try:
+        workbook = load_workbook(file, read_only=True, data_only=True)
+    except (zipfile.BadZipFile, KeyError, OSError) as e:
+        raise HTTPException(status_code=400, detail="Invalid XLSX file") from e
+    return _sheet_rows(workbook)
+
+
+def _sheet_rows(workbook: Any) -> Iterator[Row]:
+    """Yield the rows of the expenses sheet keyed by the header row."""
+    sheet = (
+        workbook["Expenses"] if "Expenses" in workbook.sheetnames else workbook.active
+    )
+    rows = sheet.iter_rows(values_only=True)
+    header = [str(cell).strip() if cell is not None else "" for cell in next(rows, [])]
+    try:
+        for number, values in enumerate(rows, start=2):
+            if all(value is None for value in values):
+                continue
+            yield number, dict(zip(header, values))
+    finally:
+        workbook.close()
+
+
+def parse_row(row: Dict[str, Any]) -> ExpenseCreate:
+    """Validate one imported row with the same rules as POST /expenses/."""
+    fields = {
+        name: value
+        for name, value in row.items()
+        if name in EXPENSE_FIELDS and value not in (None, "")
+    }
+    return ExpenseCreate(**fields)
+
+
+def parse_chunk(chunk: List[Row]) -> Tuple[List[ExpenseCreate], List[int], List[dict]]:
+    """Parse a chunk of rows into expenses, their row numbers and the row errors."""
+    expenses: List[ExpenseCreate] = []
+    numbers: List[int] = []
+    errors: List[dict] = []
+    for number, row in chunk:
+        try:
+            expenses.append(parse_row(row))
+            numbers.append(number)
+        except ValidationError as e:
+            errors.append({"row": number, "detail": e.errors(include_url=False)})
+    return expenses, numbers, errors
+
+
+def detect_format(filename: Optional[str], file_format: Optional[str]) -> str:
+    """Pick the file format from the query parameter or the file extension."""
+    if not file_format and filename and "." in filename:
+        file_format = filename.rsplit(".", 1)[1]
+    file_format = (file_format or "").lower()
+    if file_format not in SUPPORTED_FORMATS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported file type. Supported types are {list(SUPPORTED_FORMATS)}",
+        )
+    return file_format
+
+
+async def import_rows(
+    user_id: str, user: dict, rows: Iterator[Row]
+) -> AsyncIterator[str]:
+    """
+    Parse, validate and record rows in chunks, yielding one NDJSON progress line each.
+
+    Only one chunk of rows is held in memory at a time.
+    """
+    processed = created = failed = 0
+    while True:
+        try:
+            chunk = list(islice(rows, IMPORT_CHUNK_SIZE))
+        except (csv.Error, UnicodeDecodeError) as e:
+            error = {"error": f"Unreadable file: {e}", "rows": processed}
+            yield json.dumps(error) + "\n"
+            return
+        if not chunk:
+            break
+
+        expenses, numbers, errors = parse_chunk(chunk)
+        if expenses:
+            try:
+                ingested = await ingest_expenses(user_id, user, expenses)
+            except HTTPException as e:
+                yield json.dumps({"error": e.detail, "rows": processed}) + "\n"
+                return
+            for result in ingested["results"]:
+                if result["status"] == "error":
+                    errors.append(
+                        {"row": numbers[result["index"]], "detail": result["detail"]}
+                    )
+
+        processed += len(chunk)
+        failed += len(errors)
+        created = processed - failed
+        errors.sort(key=lambda error: error["row"])
+        yield json.dumps(
+            {"rows": processed, "created": created, "errors": errors}, default=str
+        ) + "\n"
+
+    yield json.dumps(
+        {"done": True, "rows": processed, "created": created, "failed": failed}
+    ) + "\n"
+
+
+@router.post("/expenses")
+async def import_expenses(
+    file: UploadFile = File(...),
+    file_format: Optional[str] = Query(None, alias="format"),
+    principal: Principal = Depends(get_principal),
+) -> StreamingResponse:
+    """
+    Import expenses from a CSV or XLSX file, such as one produced by /exports.
+
+    The file is read as a stream and written in batches of IMPORT_CHUNK_SIZE
+    rows. The response is newline-delimited JSON: one progress line per batch
+    with its row-level errors, then a final summary line. The ``_id`` column
+    of exported files is ignored; every imported row becomes a new expense.
+
+    Args:
+        file (UploadFile): The CSV or XLSX file.
+        file_format (str, optional): "csv" or "xlsx"; defaults to the file extension.
+        principal (Principal): The authenticated caller.
+
+    Returns:
+        StreamingResponse: NDJSON progress report.
+    """
+    user_id = principal.user_id
+    user = await principal.require_user()
+
+    if detect_format(file.filename, file_format) == "csv":
+        rows = iter_csv_rows(file.file)
+    else:
+        rows = iter_xlsx_rows(file.file)
+
+    return StreamingResponse(
+        import_rows(user_id, user, rows), media_type="application/x-ndjson"
+    )
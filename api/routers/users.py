@@ -3,17 +3,28 @@ This module provides user-related API routes for the Money Manager application.
 """
 
 import datetime
+import uuid
 from typing import Optional
 
 from bson import ObjectId
 from fastapi import APIRouter, Depends, Header, HTTPException
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from jose import jwt
-from motor.motor_asyncio import AsyncIOMotorClient
 from pydantic import BaseModel
-
-from api.utils.auth import verify_token
-from config.config import MONGO_URI, TOKEN_ALGORITHM, TOKEN_SECRET_KEY
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from api.utils.auth import token_cache, verify_token
+from api.utils.db import (
+    accounts_collection,
+    expenses_collection,
+    rollups_collection,
+    tokens_collection,
+    users_collection,
+)
+from api.utils.principal import Principal, get_principal, update_user_doc, user_cache
+from api.utils.revocations import revoke_tokens
+from config.config import TOKEN_ALGORITHM, TOKEN_SECRET_KEY
 
 ACCESS_TOKEN_EXPIRE_MINUTES = 30 * 24 * 60
 
@@ -21,14 +32,6 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/token")
 
 router = APIRouter(prefix="/users", tags=["Users"])
 
-# MongoDB setup
-client: AsyncIOMotorClient = AsyncIOMotorClient(MONGO_URI)
-db = client.mmdb
-users_collection = db.users
-tokens_collection = db.tokens
-accounts_collection = db.accounts
-expenses_collection = db.expenses
-
 
 class UserCreate(BaseModel):
     """Schema for creating a user."""
@@ -54,7 +57,8 @@ def create_access_token(data: dict, expires_delta: datetime.timedelta):
     """Create an access token with an expiration time."""
     to_encode = data.copy()
     expire = datetime.datetime.now(datetime.UTC) + expires_delta
-    to_encode.update({"exp": expire})
+    # A unique token ID lets stateless verification revoke single tokens
+    to_encode.update({"exp": expire, "jti": uuid.uuid4().hex})
     encoded_jwt = jwt.encode(to_encode, TOKEN_SECRET_KEY, algorithm=TOKEN_ALGORITHM)
     return encoded_jwt
 
@@ -85,8 +89,12 @@ async def create_user(user: UserCreate):
         "password": user.password,  # In a real application, you should hash the password
         "categories": default_categories,
         "currencies": default_currencies,
+        "version": 0,
     }
-    result = await users_collection.insert_one(user_data)
+    try:
+        result = await users_collection.insert_one(user_data)
+    except DuplicateKeyError as e:
+        raise HTTPException(status_code=400, detail="Username already exists") from e
     user_id = result.inserted_id
     if not user_id:
         raise HTTPException(status_code=500, detail="Failed to create user")
@@ -113,23 +121,19 @@ async def create_user(user: UserCreate):
 
 
 @router.get("/")
-async def get_user(token: str = Header(None)):
+async def get_user(principal: Principal = Depends(get_principal)):
     """Get user details."""
-    user_id = await verify_token(token)
-    user = await users_collection.find_one({"_id": ObjectId(user_id)})
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    return format_id(user)
+    return format_id(await principal.require_user())
 
 
 @router.put("/")
-async def update_user(user_update: UserUpdate, token: str = Header(None)):
+async def update_user(
+    user_update: UserUpdate, principal: Principal = Depends(get_principal)
+):
     """Update user information such as password, currencies."""
-    user_id = await verify_token(token)
+    user_id = principal.user_id
     update_fields = user_update.dict(exclude_unset=True)
-    user: Optional[dict] = await users_collection.find_one({"_id": ObjectId(user_id)})
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
+    user = await principal.require_user(fresh=True)
 
     if "password" in update_fields and update_fields["password"]:
         # In a real application, you should hash the password
@@ -141,11 +145,10 @@ async def update_user(user_update: UserUpdate, token: str = Header(None)):
         )
         update_fields["currencies"] = new_currencies
     try:
-        result = await users_collection.update_one(
-            {"_id": ObjectId(user_id)}, {"$set": update_fields}
-        )
-        if result.modified_count == 1:
-            updated_user = await users_collection.find_one({"_id": ObjectId(user_id)})
+        if all(user.get(field) == value for field, value in update_fields.items()):
+            raise HTTPException(status_code=400, detail="Nothing to modify")
+        updated_user = await update_user_doc(user_id, {"$set": update_fields})
+        if updated_user:
             return {
                 "message": "User updated successfully",
                 "updated_user": format_id(updated_user),
@@ -156,13 +159,21 @@ async def update_user(user_update: UserUpdate, token: str = Header(None)):
 
 
 @router.delete("/")
-async def delete_user(token: str = Header(None)):
+async def delete_user(principal: Principal = Depends(get_principal)):
     """Delete a user and all associated accounts, tokens, and expenses."""
-    user_id = await verify_token(token)
+    user_id = principal.user_id
+    await revoke_tokens(
+        await tokens_collection.find(
+            {"user_id": user_id}, {"token": 1, "user_id": 1}
+        ).to_list(None)
+    )
     await tokens_collection.delete_many({"user_id": user_id})
+    token_cache.evict_user(user_id)
     await accounts_collection.delete_many({"user_id": user_id})
     await expenses_collection.delete_many({"user_id": user_id})
+    await rollups_collection.delete_many({"user_id": user_id})
     result = await users_collection.delete_one({"_id": ObjectId(user_id)})
+    user_cache.evict(user_id)
     if result.deleted_count == 1:
         return {"message": "User deleted successfully"}
     raise HTTPException(status_code=500, detail="Failed to delete user")
@@ -223,6 +234,24 @@ async def get_tokens(token: str = Header(None)):
     return {"tokens": formatted_tokens}
 
 
+@router.delete("/token/")
+async def logout(token: str = Header(None)):
+    """
+    Revoke the token used to make this request.
+
+    Args:
+        token (str): Authentication token to revoke.
+
+    Returns:
+        dict: Message indicating the token was revoked.
+    """
+    user_id = await verify_token(token)
+    await revoke_tokens([{"user_id": user_id, "token": token}])
+    await tokens_collection.delete_one({"user_id": user_id, "token": token})
+    token_cache.evict(token)
+    return {"message": "Logged out successfully"}
+
+
 @router.get("/token/{token_id}")
 async def get_token(token_id: str, token: str = Header(None)) -> dict:
     """
@@ -270,12 +299,16 @@ async def update_token(token_id: str, new_expiry: float, token: str = Header(Non
     new_expiry_time = datetime.datetime.now(datetime.UTC) + updated_expiry
 
     # Correct the filter to use _id for the token document
-    result = await tokens_collection.update_one(
+    token_data = await tokens_collection.find_one_and_update(
         {"user_id": user_id, "_id": ObjectId(token_id)},
         {"$set": {"expires_at": new_expiry_time}},
+        projection={"token": 1, "user_id": 1},
+        return_document=ReturnDocument.AFTER,
     )
 
-    if result.modified_count == 1:
+    if token_data:
+        await revoke_tokens([token_data], effective_at=new_expiry_time)
+        token_cache.evict(token_data["token"])
         return {"message": "Token expiration updated successfully"}
 
     raise HTTPException(status_code=500, detail="Failed to update token expiration")
@@ -294,17 +327,14 @@ async def delete_token(token_id: str, token: str = Header(None)):
         dict: Message indicating whether the token was successfully deleted.
     """
     user_id = await verify_token(token)
-    result = await tokens_collection.delete_one(
-        {"user_id": user_id, "_id": ObjectId(token_id)}
+    token_data = await tokens_collection.find_one_and_delete(
+        {"user_id": user_id, "_id": ObjectId(token_id)},
+        projection={"token": 1, "user_id": 1},
     )
 
-    if result.deleted_count == 1:
+    if token_data:
+        await revoke_tokens([token_data])
+        token_cache.evict(token_data["token"])
         return {"message": "Token deleted successfully"}
 
     raise HTTPException(status_code=404, detail="Token not found")
-
-
-@router.on_event("shutdown")
-async def shutdown_db_client():
-    """Shutdown event for MongoDB client."""
-    client.close()
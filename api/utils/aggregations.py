@@ -0,0 +1,364 @@
+"""
+Aggregation of expenses into the bucketed series drawn by the analytics charts.
+
+The ``*_totals`` coroutines run ``$match`` + ``$group`` pipelines over the
+per-day rollup collection (see ``api.utils.rollups``) so only one document per
+bucket and currency crosses the network. ``ExpenseFrame`` gives the same series
+for expense rows that are already in memory, and ``RunningTotals`` sums them
+over the batches of a streamed query (e.g. the PDF export).
+
+Given a ``report_currency``, the per-currency and per-day totals are converted
+at the rate of their day in one vectorised step before they are summed, so
+expenses in different currencies add up to a meaningful total. Without one,
+amounts are summed as stored.
+"""
+
+import datetime
+from typing import Any, Dict, Iterable, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from pytz import timezone  # type: ignore
+
+from api.utils.columnar import FRAME_FIELDS, documents_to_columns
+from api.utils.currency import convert_column
+from api.utils.db import rollups_collection, validate_date_range
+from config.config import TIME_ZONE
+
+LOCAL_TZ = timezone(TIME_ZONE)
+# Most buckets the "auto" granularity allows before moving to a coarser unit
+MAX_AUTO_BUCKETS = 90
+
+
+class CategoryTotals(NamedTuple):
+    """Spend per category plus the local dates of the first and last expense."""
+
+    totals: pd.Series
+    first_date: Optional[datetime.date]
+    last_date: Optional[datetime.date]
+
+
+def to_local_date(value: datetime.datetime) -> datetime.date:
+    """Convert a stored (UTC) datetime to the calendar date in ``TIME_ZONE``."""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=datetime.timezone.utc)
+    return value.astimezone(LOCAL_TZ).date()
+
+
+def local_midnight(day: datetime.date) -> datetime.datetime:
+    """Return the (naive UTC) instant at which ``day`` starts in ``TIME_ZONE``."""
+    midnight = LOCAL_TZ.localize(datetime.datetime.combine(day, datetime.time.min))
+    return midnight.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+
+
+def day_bucket(value: datetime.datetime) -> datetime.datetime:
+    """Truncate a stored datetime to its local day, like ``$dateTrunc`` does."""
+    return local_midnight(to_local_date(value))
+
+
+def build_rollup_query(
+    user_id: str, from_date: Optional[datetime.date], to_date: Optional[datetime.date]
+) -> dict:
+    """Build the rollup filter for a user and an inclusive range of local days."""
+    validate_date_range(from_date, to_date)
+    query: dict = {"user_id": user_id}
+    day_range = {}
+    if from_date:
+        day_range["$gte"] = local_midnight(from_date)
+    if to_date:
+        day_range["$lte"] = local_midnight(to_date)
+    if day_range:
+        query["day"] = day_range
+    return query
+
+
+def to_report_currency(
+    amounts: Iterable[float],
+    currencies: Iterable[str],
+    report_currency: Optional[str],
+    dates: Optional[Iterable[Any]] = None,
+) -> np.ndarray:
+    """Convert a column of amounts into ``report_currency`` at their own dates."""
+    if report_currency is None:
+        return np.asarray(amounts, dtype=np.float64)
+    return convert_column(amounts, currencies, report_currency, dates)
+
+
+def currency_key(report_currency: Optional[str]) -> dict:
+    """
+    Extra ``$group`` key fields that keep amounts convertible.
+
+    Amounts are only summed within one currency, and for a report currency
+    also within one day, so each total is converted at the rate of its day.
+    """
+    if report_currency is None:
+        return {"currency": "$currency"}
+    return {"currency": "$currency", "day": "$day"}
+
+
+def category_values(values: pd.Categorical, missing: str) -> np.ndarray:
+    """Expand a categorical into its values, with ``missing`` for missing ones."""
+    lookup = np.asarray([*values.categories, missing], dtype=object)
+    # Code -1 reads the last entry
+    return lookup[values.codes]
+
+
+def bucket_amounts(buckets: list, report_currency: Optional[str]) -> np.ndarray:
+    """Convert the totals of grouped rollups into ``report_currency``."""
+    return to_report_currency(
+        [bucket["total"] for bucket in buckets],
+        [bucket["_id"]["currency"] for bucket in buckets],
+        report_currency,
+        [bucket["_id"].get("day") for bucket in buckets],
+    )
+
+
+def _bucket_index(buckets: list, unit: str) -> pd.Index:
+    """Label truncated datetimes the way the charts expect them."""
+    dates = [to_local_date(bucket) for bucket in buckets]
+    if unit == "month":
+        return pd.PeriodIndex([pd.Period(date, freq="M") for date in dates])
+    return pd.Index(dates)
+
+
+async def expense_totals(
+    user_id: str,
+    from_date: Optional[datetime.date],
+    to_date: Optional[datetime.date],
+    unit: str = "day",
+    report_currency: Optional[str] = None,
+) -> pd.Series:
+    """
+    Sum expenses per ``unit`` ("day" or "month") in the configured time zone.
+
+    Returns:
+        pd.Series: Totals indexed by date (day) or ``pd.Period`` (month), oldest first.
+    """
+    key = {
+        "bucket": {"$dateTrunc": {"date": "$day", "unit": unit, "timezone": TIME_ZONE}},
+        **currency_key(report_currency),
+    }
+    pipeline = [
+        {"$match": build_rollup_query(user_id, from_date, to_date)},
+        {"$group": {"_id": key, "total": {"$sum": "$amount"}}},
+    ]
+    buckets = await rollups_collection.aggregate(pipeline).to_list(None)
+    totals = pd.Series(
+        bucket_amounts(buckets, report_currency),
+        index=_bucket_index([bucket["_id"]["bucket"] for bucket in buckets], unit),
+        dtype="float64",
+    )
+    return totals.groupby(level=0).sum()
+
+
+async def category_totals(
+    user_id: str,
+    from_date: Optional[datetime.date],
+    to_date: Optional[datetime.date],
+    report_currency: Optional[str] = None,
+) -> CategoryTotals:
+    """Sum expenses per category, also returning the first and last expense dates."""
+    pipeline = [
+        {"$match": build_rollup_query(user_id, from_date, to_date)},
+        {
+            "$group": {
+                "_id": {"category": "$category", **currency_key(report_currency)},
+                "total": {"$sum": "$amount"},
+                "first": {"$min": "$day"},
+                "last": {"$max": "$day"},
+            }
+        },
+    ]
+    buckets = await rollups_collection.aggregate(pipeline).to_list(None)
+    totals = (
+        pd.Series(
+            bucket_amounts(buckets, report_currency),
+            index=pd.Index(
+                [bucket["_id"]["category"] for bucket in buckets], dtype="object"
+            ),
+            dtype="float64",
+        )
+        .groupby(level=0)
+        .sum()
+    )
+    if not buckets:
+        return CategoryTotals(totals, None, None)
+    return CategoryTotals(
+        totals,
+        to_local_date(min(bucket["first"] for bucket in buckets)),
+        to_local_date(max(bucket["last"] for bucket in buckets)),
+    )
+
+
+class ExpenseFrame:
+    """
+    Columnar view of already fetched expense rows, built once per request.
+
+    The amounts are converted into the report currency and the rows are
+    labelled with their local day, month and category up front, so every
+    chart series and table of an export reads the same arrays instead of
+    rebuilding a DataFrame and converting the amounts again.
+
+    Args:
+        columns (dict): Columns as decoded by ``api.utils.columnar``.
+        report_currency (str, optional): Currency to convert the amounts into.
+    """
+
+    def __init__(self, columns: Dict[str, Any], report_currency: Optional[str] = None):
+        self.columns = columns
+        self.report_currency = report_currency
+        self.amounts: np.ndarray = columns["amount"]
+        self.dates = pd.DatetimeIndex(columns["date"]).tz_localize("UTC")
+        self.report_amounts = (
+            self.amounts
+            if report_currency is None
+            else to_report_currency(
+                self.amounts,
+                category_values(columns["currency"], report_currency),
+                report_currency,
+                self.dates,
+            )
+        )
+        local_days = self.dates.tz_convert(TIME_ZONE).tz_localize(None).normalize()
+        day_codes, days = pd.factorize(local_days, sort=True)
+        month_codes, months = pd.factorize(local_days.to_period("M"), sort=True)
+        categories: pd.Categorical = columns["category"]
+        # Group codes and labels per unit; -1 marks rows without a date or category
+        self.groups = {
+            "day": (day_codes, pd.Index(days.date, dtype="object")),
+            "month": (month_codes, months),
+            "category": (categories.codes, categories.categories),
+        }
+
+    @classmethod
+    def from_documents(
+        cls,
+        expenses: Iterable[dict],
+        report_currency: Optional[str] = None,
+        fields: Sequence[str] = FRAME_FIELDS,
+    ) -> "ExpenseFrame":
+        """Build a frame from expense documents that are already in memory."""
+        return cls(documents_to_columns(expenses, fields), report_currency)
+
+    def __len__(self) -> int:
+        return len(self.amounts)
+
+    def totals(self, unit: str) -> pd.Series:
+        """Sum the report amounts per "day", "month" or "category"."""
+        codes, labels = self.groups[unit]
+        present = codes >= 0
+        sums = np.bincount(
+            codes[present],
+            weights=self.report_amounts[present],
+            minlength=len(labels),
+        )
+        return pd.Series(sums, index=labels, dtype="float64")
+
+    @property
+    def first_date(self) -> Optional[datetime.date]:
+        """Local date of the earliest expense."""
+        labels = self.groups["day"][1]
+        return labels[0] if len(labels) else None
+
+    @property
+    def last_date(self) -> Optional[datetime.date]:
+        """Local date of the latest expense."""
+        labels = self.groups["day"][1]
+        return labels[-1] if len(labels) else None
+
+
+class RunningTotals:
+    """
+    Day, month and category totals summed over ExpenseFrames of one query.
+
+    Exports that read their expenses batch by batch add each batch's frame
+    and drop it, keeping only the totals the charts need.
+    """
+
+    UNITS = ("day", "month", "category")
+
+    def __init__(self):
+        self._parts: Dict[str, list] = {unit: [] for unit in self.UNITS}
+        self._count = 0
+
+    def add(self, frame: ExpenseFrame):
+        """Add the totals of one batch of expenses."""
+        for unit in self.UNITS:
+            self._parts[unit].append(frame.totals(unit))
+        self._count += len(frame)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def totals(self, unit: str) -> pd.Series:
+        """Sum the report amounts per "day", "month" or "category"."""
+        parts = self._parts[unit]
+        if not parts:
+            return pd.Series(dtype="float64")
+        if len(parts) > 1:
+            parts[:] = [pd.concat(parts).groupby(level=0).sum()]
+        return parts[0]
+
+    @property
+    def first_date(self) -> Optional[datetime.date]:
+        """Local date of the earliest expense."""
+        days = self.totals("day").index
+        return days[0] if len(days) else None
+
+    @property
+    def last_date(self) -> Optional[datetime.date]:
+        """Local date of the latest expense."""
+        days = self.totals("day").index
+        return days[-1] if len(days) else None
+
+
+def bucket_totals(daily: pd.Series, unit: str) -> pd.Series:
+    """
+    Re-bucket daily totals into "day", "week" or "month" totals.
+
+    Weeks start on Monday and are labelled with that date; months are
+    ``pd.Period`` like the monthly series.
+    """
+    if unit == "day" or daily.empty:
+        return daily
+    days = pd.DatetimeIndex(pd.to_datetime(list(daily.index)))
+    if unit == "week":
+        keys = pd.Index(days.to_period("W-SUN").start_time.date, dtype="object")
+    else:
+        keys = days.to_period("M")
+    return daily.groupby(keys).sum()
+
+
+def downsample(
+    daily: pd.Series, granularity: str = "auto", max_buckets: int = MAX_AUTO_BUCKETS
+) -> Tuple[str, pd.Series]:
+    """
+    Bucket daily totals at a fixed or automatically chosen granularity.
+
+    With ``granularity="auto"`` the finest of day, week and month that yields
+    at most ``max_buckets`` buckets is used, or month if none does.
+
+    Returns:
+        tuple: The granularity used and the bucketed totals.
+    """
+    if granularity != "auto":
+        return granularity, bucket_totals(daily, granularity)
+    for unit in ("day", "week"):
+        totals = bucket_totals(daily, unit)
+        if len(totals) <= max_buckets:
+            return unit, totals
+    return "month", bucket_totals(daily, "month")
+
+
+def group_expenses(
+    expenses: list, unit: str, report_currency: Optional[str] = None
+) -> pd.Series:
+    """
+    In-memory equivalent of the pipelines for already fetched expense rows.
+
+    Args:
+        expenses (list): Expense documents.
+        unit (str): "day", "month" or "category".
+        report_currency (str, optional): Currency to convert the amounts into.
+    """
+    return ExpenseFrame.from_documents(expenses, report_currency).totals(unit)
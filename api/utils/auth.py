@@ -1,29 +1,139 @@
 """Utilities to manage authentication"""
 
+import datetime
+import hashlib
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
+from typing import Optional, Tuple
+
 from fastapi import HTTPException
 from jose import JWTError, jwt
-from motor.motor_asyncio import AsyncIOMotorClient
 
-from config.config import MONGO_URI, TOKEN_ALGORITHM, TOKEN_SECRET_KEY
+from api.utils.db import tokens_collection
+from api.utils.revocations import revocations
+from config.config import (
+    AUTH_MODE,
+    TOKEN_ALGORITHM,
+    TOKEN_CACHE_MAX_SIZE,
+    TOKEN_CACHE_TTL_SECONDS,
+    TOKEN_SECRET_KEY,
+)
+
+# (token, user_id) already verified for the current request, set by POST /batch
+# so that its sub-requests do not verify the same token again
+verified_token: ContextVar[Optional[Tuple[str, str]]] = ContextVar(
+    "verified_token", default=None
+)
+
+
+class TokenCache:
+    """
+    Bounded LRU cache of verified tokens, keyed by the SHA-256 of the token.
+
+    An entry lives for at most ``ttl`` seconds and never past the expiry of
+    its token. The cache is per process: endpoints that revoke or change a
+    token evict it here, other API processes drop it once the TTL runs out.
+    """
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: OrderedDict[str, Tuple[str, float]] = OrderedDict()
+
+    @staticmethod
+    def _key(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def get(self, token: str) -> Optional[str]:
+        """Return the user ID of a cached, unexpired token."""
+        key = self._key(token)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        user_id, expires = entry
+        if expires <= time.time():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return user_id
+
+    def put(self, token: str, user_id: str, expires: Optional[float] = None):
+        """Cache a verified token until ``expires`` (epoch seconds) or the TTL."""
+        if self.ttl <= 0 or self.max_size <= 0:
+            return
+        deadline = time.time() + self.ttl
+        if expires is not None:
+            deadline = min(deadline, expires)
+        key = self._key(token)
+        self._entries[key] = (user_id, deadline)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def evict(self, token: str):
+        """Forget one token."""
+        self._entries.pop(self._key(token), None)
+
+    def evict_user(self, user_id: str):
+        """Forget every token of a user."""
+        for key in [k for k, (uid, _) in self._entries.items() if uid == user_id]:
+            del self._entries[key]
+
+    def clear(self):
+        """Forget every token."""
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
 
-client: AsyncIOMotorClient = AsyncIOMotorClient(MONGO_URI)
-db = client.mmdb
-users_collection = db.users
-tokens_collection = db.tokens
+
+token_cache = TokenCache(TOKEN_CACHE_MAX_SIZE, TOKEN_CACHE_TTL_SECONDS)
+
+
+def token_expiry(payload: dict, token_data: dict) -> Optional[float]:
+    """Return the earliest of the JWT ``exp`` and the stored ``expires_at``."""
+    deadlines = []
+    if payload.get("exp") is not None:
+        deadlines.append(float(payload["exp"]))
+    expires_at = token_data.get("expires_at")
+    if isinstance(expires_at, datetime.datetime):
+        if expires_at.tzinfo is None:
+            expires_at = expires_at.replace(tzinfo=datetime.timezone.utc)
+        deadlines.append(expires_at.timestamp())
+    return min(deadlines) if deadlines else None
 
 
 async def verify_token(token: str):
-    """Verify the validity of an access token."""
+    """
+    Verify the validity of an access token.
+
+    In the "stateless" AUTH_MODE a signed, unexpired token with a ``jti`` is
+    accepted unless it is in the revocation set; tokens issued without a
+    ``jti`` and the default "lookup" mode check the tokens collection.
+    """
     if token is None:
         raise HTTPException(status_code=401, detail="Token is missing")
+    verified = verified_token.get()
+    if verified and verified[0] == token:
+        return verified[1]
+    cached_user_id = token_cache.get(token)
+    if cached_user_id is not None:
+        return cached_user_id
     try:
         payload = jwt.decode(token, TOKEN_SECRET_KEY, algorithms=[TOKEN_ALGORITHM])
         user_id = payload.get("sub")
+        if AUTH_MODE == "stateless" and payload.get("jti"):
+            await revocations.refresh_if_stale()
+            if revocations.is_revoked(payload["jti"]):
+                raise HTTPException(status_code=401, detail="Token has been revoked")
+            return user_id
         token_exists = await tokens_collection.find_one(
             {"user_id": user_id, "token": token}
         )
         if not token_exists:
             raise HTTPException(status_code=401, detail="Token does not exist")
+        token_cache.put(token, user_id, token_expiry(payload, token_exists))
         return user_id
     except JWTError as e:
         if "Signature has expired" in str(e):
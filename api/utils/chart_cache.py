@@ -0,0 +1,154 @@
+"""
+Cache of rendered charts.
+
+A chart is fully determined by its key: the user, the chart type, the date
+range, the report currency and the user's data version. Every expense or
+category write bumps the version (see ``api.utils.principal``), so a changed
+key, never an invalidation, is what retires an outdated chart.
+
+Entries are addressed by a digest of their key. The digest doubles as the
+chart's ``ETag``, which lets a client's ``If-None-Match`` be answered with 304
+from the key alone, before any expense is read or anything is rendered. Charts
+are kept in a per-process LRU and, with ``CHART_CACHE_DIR`` set, in a disk
+tier shared by the API workers of a host that survives restarts.
+"""
+
+import glob
+import hashlib
+import os
+from collections import OrderedDict
+from typing import Any, Optional, Tuple
+
+from config.config import (
+    CHART_CACHE_DIR,
+    CHART_CACHE_DISK_MAX_FILES,
+    CHART_CACHE_MAX_SIZE,
+)
+
+# Disk writes between two checks of the disk tier's size
+PRUNE_INTERVAL = 64
+
+
+def chart_digest(key: Tuple[Any, ...]) -> str:
+    """Return the content address of a chart key."""
+    return hashlib.sha256("\x1f".join(map(str, key)).encode()).hexdigest()[:32]
+
+
+def chart_etag(key: Tuple[Any, ...]) -> str:
+    """Return the strong ETag of the chart with this key."""
+    return f'"{chart_digest(key)}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Check an ``If-None-Match`` header against an ETag."""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    # If-None-Match uses the weak comparison
+    return "*" in candidates or etag in (tag.removeprefix("W/") for tag in candidates)
+
+
+class ChartCache:
+    """LRU cache of rendered charts with an optional disk tier."""
+
+    def __init__(
+        self,
+        max_size: int,
+        directory: Optional[str] = None,
+        max_files: int = CHART_CACHE_DISK_MAX_FILES,
+    ):
+        self.max_size = max_size
+        self.directory = directory
+        self.max_files = max_files
+        self._entries: OrderedDict[str, bytes] = OrderedDict()
+        self._writes = 0
+
+    def get(self, key: Tuple[Any, ...]) -> Optional[bytes]:
+        """Return a cached chart, promoting a disk hit into memory."""
+        digest = chart_digest(key)
+        data = self._entries.get(digest)
+        if data is not None:
+            self._entries.move_to_end(digest)
+            return data
+        data = self._read(digest)
+        if data is not None:
+            self._remember(digest, data)
+        return data
+
+    def put(self, key: Tuple[Any, ...], data: bytes):
+        """Cache a rendered chart."""
+        digest = chart_digest(key)
+        self._remember(digest, data)
+        self._write(digest, data)
+
+    def clear(self):
+        """Forget every chart held in memory."""
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _remember(self, digest: str, data: bytes):
+        if self.max_size <= 0:
+            return
+        self._entries[digest] = data
+        self._entries.move_to_end(digest)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def _path(self, digest: str) -> str:
+        return os.path.join(self.directory or "", f"{digest}.chart")
+
+    def _read(self, digest: str) -> Optional[bytes]:
+        if not self.directory:
+            return None
+        path = self._path(digest)
+        try:
+            with open(path, "rb") as file:
+                data = file.read()
+            # Mark the file as recently used for pruning
+            os.utime(path)
+        except OSError:
+            return None
+        return data
+
+    def _write(self, digest: str, data: bytes):
+        if not self.directory:
+            return
+        path = self._path(digest)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            # Other workers may be reading; only complete files get the final name
+            with open(temp_path, "wb") as file:
+                file.write(data)
+            os.replace(temp_path, path)
+        except OSError:
+            # The disk tier is best effort, the chart is cached in memory
+            return
+        self._writes += 1
+        if self._writes % PRUNE_INTERVAL == 0:
+            self.prune()
+
+    def prune(self):
+        """Delete the least recently used files beyond ``max_files``."""
+        if not self.directory:
+            return
+        paths = glob.glob(os.path.join(self.directory, "*.chart"))
+        if len(paths) <= self.max_files:
+            return
+        used = []
+        for path in paths:
+            try:
+                used.append((os.stat(path).st_mtime, path))
+            except OSError:
+                continue
+        used.sort()
+        for _, path in used[: len(used) - self.max_files]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+chart_cache = ChartCache(CHART_CACHE_MAX_SIZE, CHART_CACHE_DIR or None)
@@ -0,0 +1,204 @@
+"""
+Columnar decoding of expense query results.
+
+``fetch_expense_columns`` reads the raw BSON batches of a query with a
+projection of only the needed fields and decodes them batch by batch into
+typed arrays: dates as ``datetime64[ms]``, amounts as ``float64`` and
+repeated strings (currency, category, account) as categorical codes. Only one
+batch is ever held as documents, so a large result never exists as a list of
+dicts, and the arrays are handed to ``ExpenseFrame`` without another copy.
+
+``iter_expense_columns`` yields the columns of each batch instead of
+collecting them, for exports that write rows out as they arrive.
+"""
+
+import datetime
+from array import array
+from typing import Any, AsyncGenerator, Dict, Iterable, List, Optional, Sequence
+
+import bson
+import numpy as np
+import pandas as pd
+from bson.codec_options import CodecOptions, DatetimeConversion
+
+# Fields the charts and totals need
+FRAME_FIELDS = ("date", "amount", "currency", "category", "account_name")
+# Fields the export tables show on top of FRAME_FIELDS
+EXPORT_FIELDS = FRAME_FIELDS + ("description", "_id")
+# Documents per batch when the columns are yielded batch by batch
+STREAM_BATCH_SIZE = 5000
+CATEGORICAL_FIELDS = frozenset({"currency", "category", "account_name"})
+
+# Dates decode to integer milliseconds instead of datetime objects
+CODEC_OPTIONS: CodecOptions = CodecOptions(
+    datetime_conversion=DatetimeConversion.DATETIME_MS
+)
+NAT_MS = np.iinfo(np.int64).min
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def to_epoch_ms(value: Any) -> int:
+    """Convert a decoded date (milliseconds or datetime) to epoch milliseconds."""
+    if value is None:
+        return NAT_MS
+    if isinstance(value, datetime.datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=datetime.timezone.utc)
+        return (value - EPOCH) // datetime.timedelta(milliseconds=1)
+    return int(value)
+
+
+class ColumnBuilder:
+    """Accumulates decoded documents into one typed array per field."""
+
+    def __init__(self, fields: Sequence[str] = FRAME_FIELDS):
+        self.fields = tuple(fields)
+        self._numbers: Dict[str, array] = {}
+        self._lookups: Dict[str, Dict[Any, int]] = {}
+        self._objects: Dict[str, List[Any]] = {}
+        for field in self.fields:
+            if field == "date":
+                self._numbers[field] = array("q")
+            elif field == "amount":
+                self._numbers[field] = array("d")
+            elif field in CATEGORICAL_FIELDS:
+                self._numbers[field] = array("i")
+                self._lookups[field] = {}
+            else:
+                self._objects[field] = []
+
+    def add_documents(self, documents: List[dict]):
+        """Append a batch of decoded documents, one field at a time."""
+        for field in self.fields:
+            values = [document.get(field) for document in documents]
+            if field == "date":
+                self._numbers[field].extend([to_epoch_ms(value) for value in values])
+            elif field == "amount":
+                self._numbers[field].extend(
+                    [np.nan if value is None else value for value in values]
+                )
+            elif field in self._lookups:
+                lookup = self._lookups[field]
+                # A new value gets the next code
+                self._numbers[field].extend(
+                    [
+                        -1 if value is None else lookup.setdefault(value, len(lookup))
+                        for value in values
+                    ]
+                )
+            else:
+                self._objects[field].extend(values)
+
+    def add_batch(self, batch: bytes):
+        """Decode and append one raw BSON batch."""
+        self.add_documents(bson.decode_all(batch, CODEC_OPTIONS))
+
+    def finish(self) -> Dict[str, Any]:
+        """
+        Return the columns.
+
+        Returns:
+            dict: ``date`` as naive UTC ``datetime64[ms]`` (NaT if missing),
+                ``amount`` as ``float64``, the categorical fields as
+                ``pd.Categorical`` with sorted categories, and any other
+                field as an object array.
+        """
+        columns: Dict[str, Any] = {}
+        for field in self.fields:
+            if field == "date":
+                columns[field] = np.frombuffer(
+                    self._numbers[field], dtype=np.int64
+                ).view("datetime64[ms]")
+            elif field == "amount":
+                columns[field] = np.frombuffer(self._numbers[field], dtype=np.float64)
+            elif field in self._lookups:
+                columns[field] = sorted_categorical(
+                    np.frombuffer(self._numbers[field], dtype=np.int32),
+                    list(self._lookups[field]),
+                )
+            else:
+                objects = np.empty(len(self._objects[field]), dtype=object)
+                objects[:] = self._objects[field]
+                columns[field] = objects
+        return columns
+
+
+def sorted_categorical(codes: np.ndarray, values: List[Any]) -> pd.Categorical:
+    """Build a categorical whose categories are sorted, remapping the codes."""
+    order = np.argsort(np.asarray(values, dtype=object), kind="stable")
+    remap = np.empty(len(values) + 1, dtype=np.int32)
+    remap[order] = np.arange(len(values), dtype=np.int32)
+    # Index -1 (a missing value) reads the last slot
+    remap[-1] = -1
+    return pd.Categorical.from_codes(
+        remap[codes], categories=pd.Index([values[i] for i in order], dtype=object)
+    )
+
+
+def documents_to_columns(
+    documents: Iterable[dict], fields: Sequence[str] = FRAME_FIELDS
+) -> Dict[str, Any]:
+    """Convert expense documents that are already in memory to columns."""
+    builder = ColumnBuilder(fields)
+    builder.add_documents(list(documents))
+    return builder.finish()
+
+
+def projection_of(fields: Sequence[str]) -> Dict[str, bool]:
+    """Return the projection of only the given fields."""
+    projection = {field: True for field in fields}
+    if "_id" not in fields:
+        projection["_id"] = False
+    return projection
+
+
+async def fetch_expense_columns(
+    collection: Any,
+    query: dict,
+    fields: Sequence[str] = FRAME_FIELDS,
+    limit: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    Run an expense query and decode the matching documents into columns.
+
+    Args:
+        collection: The expenses collection.
+        query (dict): The filter.
+        fields (sequence): Fields to project and decode.
+        limit (int, optional): Maximum number of documents.
+
+    Returns:
+        dict: The columns, as returned by ``ColumnBuilder.finish``.
+    """
+    builder = ColumnBuilder(fields)
+    cursor = collection.find_raw_batches(query, projection_of(fields), limit=limit or 0)
+    async for batch in cursor:
+        builder.add_batch(batch)
+    return builder.finish()
+
+
+async def iter_expense_columns(
+    collection: Any,
+    query: dict,
+    fields: Sequence[str] = FRAME_FIELDS,
+    batch_size: int = STREAM_BATCH_SIZE,
+) -> AsyncGenerator[Dict[str, Any], None]:
+    """
+    Run an expense query and yield the matching documents as columns.
+
+    Args:
+        collection: The expenses collection.
+        query (dict): The filter.
+        fields (sequence): Fields to project and decode.
+        batch_size (int): Documents the server returns per batch.
+
+    Yields:
+        dict: The columns of one batch, as returned by ``ColumnBuilder.finish``.
+    """
+    cursor = collection.find_raw_batches(
+        query, projection_of(fields), batch_size=batch_size
+    )
+    async for batch in cursor:
+        builder = ColumnBuilder(fields)
+        builder.add_batch(batch)
+        yield builder.finish()
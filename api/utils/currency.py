@@ -0,0 +1,330 @@
+"""
+Currency conversion backed by the ECB reference rate history.
+
+The rate file is compiled into a dense matrix with one row per calendar day
+and one column per currency (units per euro). Days without a quote, such as
+weekends, holidays, the time before a currency was first quoted and the time
+after it was discontinued, are filled from the nearest quote, so the last row
+holds the last published rate of every currency. Converting a column of
+amounts at their own dates is then a single array lookup and multiplication.
+
+The compiled matrix is saved as ``.npy`` under ``CURRENCY_MATRIX_DIR`` and
+opened memory-mapped, so every API worker on a host shares one copy in the
+page cache and only the first one pays for parsing. Without that directory
+each worker keeps its own matrix in memory. ``currency_service`` compiles or
+maps it on first use instead of at import time. The rate file is checked for
+changes at most once per ``CURRENCY_RELOAD_SECONDS``, and a new file replaces
+the loaded rates without a restart.
+"""
+
+import datetime
+import glob
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+from currency_converter.currency_converter import CURRENCY_FILE  # type: ignore
+from fastapi import HTTPException, Query
+
+from config.config import (
+    CURRENCY_MATRIX_DIR,
+    CURRENCY_RATES_FILE,
+    CURRENCY_RELOAD_SECONDS,
+    REPORT_CURRENCY,
+)
+
+REF_CURRENCY = "EUR"
+
+
+class RateTable(NamedTuple):
+    """Daily rates of one rate file, in units of each currency per euro."""
+
+    codes: Dict[str, int]
+    first_day: np.datetime64
+    # One row per day from first_day on, one column per currency in codes
+    matrix: np.ndarray
+    stamp: Tuple[float, int]
+    # Memoised latest cross rates, keyed by (from, to)
+    cross: Dict[Tuple[str, str], float]
+
+
+def file_stamp(path: str) -> Tuple[float, int]:
+    """Return the modification time and size of a file, to detect replacements."""
+    stat = os.stat(path)
+    return stat.st_mtime, stat.st_size
+
+
+def read_rate_file(path: str) -> Tuple[List[str], np.datetime64, np.ndarray]:
+    """
+    Parse an ECB rate file (CSV or zipped CSV) into a forward-filled daily matrix.
+
+    Returns:
+        tuple: Currency codes, the first day and the (days, currencies) matrix.
+    """
+    frame = pd.read_csv(path, index_col=0, parse_dates=[0], na_values=["N/A", ""])
+    frame.columns = [str(column).strip() for column in frame.columns]
+    frame = frame.dropna(axis=1, how="all").sort_index()
+    frame = frame[~frame.index.duplicated(keep="last")]
+    frame[REF_CURRENCY] = 1.0
+    days = pd.date_range(frame.index[0], frame.index[-1], freq="D")
+    frame = frame.reindex(days).ffill().bfill()
+    codes = sorted(frame.columns)
+    return (
+        codes,
+        np.datetime64(days[0].date(), "D"),
+        frame[codes].to_numpy(dtype=np.float64),
+    )
+
+
+def compiled_prefix(path: str, cache_dir: str) -> str:
+    """Return the prefix shared by every compiled version of one rate file."""
+    key = hashlib.sha256(os.path.abspath(path).encode()).hexdigest()
+    return os.path.join(cache_dir, f"rates-{key[:16]}-")
+
+
+def compiled_paths(
+    path: str, stamp: Tuple[float, int], cache_dir: str
+) -> Tuple[str, str]:
+    """Return the matrix and metadata paths compiled from one version of a file."""
+    version = hashlib.sha256(str(stamp).encode()).hexdigest()
+    base = compiled_prefix(path, cache_dir) + version[:16]
+    return f"{base}.npy", f"{base}.json"
+
+
+def compile_rate_file(path: str, stamp: Tuple[float, int], cache_dir: str):
+    """Write the matrix of a rate file to ``cache_dir`` and drop its older versions."""
+    codes, first_day, matrix = read_rate_file(path)
+    matrix_path, meta_path = compiled_paths(path, stamp, cache_dir)
+    os.makedirs(cache_dir, exist_ok=True)
+    # Write under temporary names first, other workers may be reading
+    suffix = f".{os.getpid()}.tmp"
+    with open(matrix_path + suffix, "wb") as file:
+        np.save(file, matrix)
+    os.replace(matrix_path + suffix, matrix_path)
+    with open(meta_path + suffix, "w", encoding="utf-8") as file:
+        json.dump({"codes": codes, "first_day": str(first_day)}, file)
+    os.replace(meta_path + suffix, meta_path)
+    # Only this file's versions, the directory may hold other rate files
+    for old in glob.glob(compiled_prefix(path, cache_dir) + "*"):
+        if old not in (matrix_path, meta_path) and not old.endswith(".tmp"):
+            try:
+                os.remove(old)
+            except OSError:
+                pass
+
+
+def load_rate_table(path: str, cache_dir: Optional[str] = None) -> RateTable:
+    """
+    Load the rate matrix of a file, compiling it first if needed.
+
+    With a ``cache_dir`` the matrix is memory-mapped from its compiled copy;
+    without one, or if that directory is not writable, it stays in memory.
+    """
+    stamp = file_stamp(path)
+    if cache_dir:
+        matrix_path, meta_path = compiled_paths(path, stamp, cache_dir)
+        for _ in range(2):
+            try:
+                with open(meta_path, encoding="utf-8") as file:
+                    meta = json.load(file)
+                matrix = np.load(matrix_path, mmap_mode="r")
+                return RateTable(
+                    {code: i for i, code in enumerate(meta["codes"])},
+                    np.datetime64(meta["first_day"], "D"),
+                    matrix,
+                    stamp,
+                    {},
+                )
+            except (OSError, ValueError, KeyError):
+                try:
+                    compile_rate_file(path, stamp, cache_dir)
+                except OSError:
+                    break
+    codes, first_day, matrix = read_rate_file(path)
+    return RateTable(
+        {code: i for i, code in enumerate(codes)}, first_day, matrix, stamp, {}
+    )
+
+
+def to_days(dates: Iterable[Any]) -> np.ndarray:
+    """Convert dates or (naive UTC or aware) datetimes to datetime64[D], None to NaT."""
+    stamps = pd.to_datetime(
+        pd.Series(np.asarray(dates, dtype=object).ravel()), utc=True, errors="coerce"
+    )
+    return stamps.dt.tz_localize(None).to_numpy(dtype="datetime64[D]")
+
+
+class CurrencyService:
+    """Lazily loaded, hot-swappable currency converter."""
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        reload_interval: float = 60,
+        cache_dir: Optional[str] = None,
+    ):
+        self.path = path or CURRENCY_FILE
+        self.reload_interval = reload_interval
+        self.cache_dir = cache_dir
+        self._table: Optional[RateTable] = None
+        self._checked = 0.0
+        self._lock = threading.Lock()
+
+    def _load(self) -> RateTable:
+        with self._lock:
+            if self._table is None or self._changed():
+                # Requests holding the old table keep using it until they finish
+                self._table = load_rate_table(self.path, self.cache_dir)
+            self._checked = time.monotonic()
+            return self._table
+
+    def _changed(self) -> bool:
+        try:
+            return self._table is None or file_stamp(self.path) != self._table.stamp
+        except OSError:
+            # Keep serving the loaded rates while the file is being replaced
+            return False
+
+    @property
+    def table(self) -> RateTable:
+        """The current rate table, loading or reloading it when due."""
+        table = self._table
+        if table is None or time.monotonic() - self._checked >= self.reload_interval:
+            table = self._load()
+        return table
+
+    def reload(self):
+        """Check the rate file now and load it if it changed."""
+        self._checked = -self.reload_interval
+        _ = self.table
+
+    @property
+    def currencies(self) -> Tuple[str, ...]:
+        """Every supported currency code."""
+        return tuple(self.table.codes)
+
+    def rate(self, from_cur: str, to_cur: str) -> float:
+        """Return the memoised latest rate that converts ``from_cur`` into ``to_cur``."""
+        if from_cur == to_cur:
+            return 1.0
+        table = self.table
+        pair = (from_cur, to_cur)
+        if pair not in table.cross:
+            latest = table.matrix[-1]
+            table.cross[pair] = float(
+                latest[self._index(table, to_cur)]
+                / latest[self._index(table, from_cur)]
+            )
+        return table.cross[pair]
+
+    def convert_one(
+        self,
+        amount: float,
+        from_cur: str,
+        to_cur: str,
+        date: Optional[Union[datetime.date, datetime.datetime]] = None,
+    ) -> float:
+        """Convert one amount, at the rate of ``date`` if given, else the latest."""
+        if from_cur == to_cur:
+            return amount
+        if date is None:
+            return amount * self.rate(from_cur, to_cur)
+        return float(self.convert([amount], [from_cur], to_cur, [date])[0])
+
+    def convert(
+        self,
+        amounts: Union[np.ndarray, Iterable[float]],
+        from_currencies: Union[np.ndarray, Iterable[str], str],
+        to_cur: str,
+        dates: Optional[Iterable[Any]] = None,
+    ) -> np.ndarray:
+        """
+        Convert a column of amounts into one currency.
+
+        Args:
+            amounts (ndarray): Amounts to convert.
+            from_currencies (ndarray or str): Currency of each amount, or one
+                currency for all of them.
+            to_cur (str): Currency to convert into.
+            dates (iterable, optional): Date of each amount; the rate of that
+                day is used. Without dates, or for a missing date, the latest
+                rate is used. Dates outside the rate history use its first or
+                last day.
+
+        Returns:
+            ndarray: The converted amounts as float64.
+
+        Raises:
+            ValueError: If a currency is not supported.
+        """
+        amounts = np.asarray(amounts, dtype=np.float64)
+        table = self.table
+        if isinstance(from_currencies, str):
+            from_columns: Union[int, np.ndarray] = self._index(table, from_currencies)
+        else:
+            currencies, inverse = np.unique(
+                np.asarray(from_currencies, dtype=object).astype(str),
+                return_inverse=True,
+            )
+            columns = np.array(
+                [self._index(table, code) for code in currencies], dtype=np.intp
+            )
+            from_columns = columns[inverse.reshape(amounts.shape)]
+        to_column = self._index(table, to_cur)
+
+        if dates is None:
+            rows: Union[int, np.ndarray] = len(table.matrix) - 1
+        else:
+            rows = self._rows(table, dates).reshape(amounts.shape)
+        return (
+            amounts * table.matrix[rows, to_column] / table.matrix[rows, from_columns]
+        )
+
+    @staticmethod
+    def _rows(table: RateTable, dates: Iterable[Any]) -> np.ndarray:
+        days = to_days(dates)
+        last = len(table.matrix) - 1
+        offsets = (days - table.first_day).astype(np.int64)
+        return np.where(np.isnat(days), last, np.clip(offsets, 0, last))
+
+    @staticmethod
+    def _index(table: RateTable, code: str) -> int:
+        try:
+            return table.codes[code]
+        except KeyError as e:
+            raise ValueError(f"{code} is not a supported currency") from e
+
+
+currency_service = CurrencyService(
+    CURRENCY_RATES_FILE, CURRENCY_RELOAD_SECONDS, CURRENCY_MATRIX_DIR or None
+)
+
+
+def convert_column(
+    amounts: Iterable[float],
+    currencies: Iterable[str],
+    to_cur: str,
+    dates: Optional[Iterable[Any]] = None,
+) -> np.ndarray:
+    """``currency_service.convert`` for request handlers, failing with 400."""
+    try:
+        return currency_service.convert(amounts, currencies, to_cur, dates)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=400, detail=f"Currency conversion failed: {str(e)}"
+        ) from e
+
+
+def get_report_currency(report_currency: str = Query(REPORT_CURRENCY)) -> str:
+    """FastAPI dependency for the currency that reports and charts are shown in."""
+    code = report_currency.upper()
+    if code not in currency_service.table.codes:
+        raise HTTPException(
+            status_code=400, detail=f"Unsupported report currency: {report_currency}"
+        )
+    return code
@@ -3,35 +3,199 @@ Utility functions for database operations.
 """
 
 import datetime
-from typing import Any, Dict, List, Optional, Tuple
+import threading
+from typing import Any, Callable, Coroutine, Dict, Optional, TypeVar
 
-from bson import ObjectId
 from fastapi import HTTPException
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import monitoring
+
+from config.config import (
+    MONGO_CONNECT_TIMEOUT_MS,
+    MONGO_DB_NAME,
+    MONGO_MAX_IDLE_TIME_MS,
+    MONGO_MAX_POOL_SIZE,
+    MONGO_MIN_POOL_SIZE,
+    MONGO_SERVER_SELECTION_TIMEOUT_MS,
+    MONGO_URI,
+    MONGO_WAIT_QUEUE_TIMEOUT_MS,
+)
+
+T = TypeVar("T")
+
+
+class PoolStatsListener(monitoring.ConnectionPoolListener):
+    """Collect connection pool checkout and wait statistics for one client."""
+
+    # pylint: disable=too-many-instance-attributes
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.connections_open = 0
+        self.connections_in_use = 0
+        self.checkouts = 0
+        self.checkout_failures = 0
+        self.checkout_wait_total = 0.0
+        self.checkout_wait_max = 0.0
+        self.pool_clears = 0
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Return a copy of the current counters."""
+        with self._lock:
+            average_wait = (
+                self.checkout_wait_total / self.checkouts if self.checkouts else 0.0
+            )
+            return {
+                "connections_open": self.connections_open,
+                "connections_in_use": self.connections_in_use,
+                "checkouts": self.checkouts,
+                "checkout_failures": self.checkout_failures,
+                "checkout_wait_avg_ms": round(average_wait * 1000, 3),
+                "checkout_wait_max_ms": round(self.checkout_wait_max * 1000, 3),
+                "pool_clears": self.pool_clears,
+            }
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self.pool_clears += 1
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        with self._lock:
+            self.connections_open += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.connections_open -= 1
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self.checkout_failures += 1
+
+    def connection_checked_out(self, event):
+        with self._lock:
+            self.checkouts += 1
+            self.connections_in_use += 1
+            wait = getattr(event, "duration", 0.0) or 0.0
+            self.checkout_wait_total += wait
+            self.checkout_wait_max = max(self.checkout_wait_max, wait)
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.connections_in_use -= 1
+
+
+class MongoManager:
+    """
+    Owns the single MongoDB client of the API process.
+
+    Motor connects lazily, so collections can be bound at import time while the
+    FastAPI lifespan decides when the pool is verified and when it is closed.
+    """
+
+    def __init__(self, uri: str, db_name: str):
+        self.pool_stats = PoolStatsListener()
+        self.client: AsyncIOMotorClient = AsyncIOMotorClient(
+            uri,
+            minPoolSize=MONGO_MIN_POOL_SIZE,
+            maxPoolSize=MONGO_MAX_POOL_SIZE,
+            maxIdleTimeMS=MONGO_MAX_IDLE_TIME_MS,
+            waitQueueTimeoutMS=MONGO_WAIT_QUEUE_TIMEOUT_MS,
+            connectTimeoutMS=MONGO_CONNECT_TIMEOUT_MS,
+            serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+            event_listeners=[self.pool_stats],
+        )
+        self.db = self.client[db_name]
+        self.supports_transactions: Optional[bool] = None
+
+    async def connect(self):
+        """Ping the server so a bad URI fails at startup instead of on first request."""
+        await self.client.admin.command("ping")
+        await self.detect_transactions()
+
+    async def detect_transactions(self) -> bool:
+        """Multi-document transactions need a replica set or a sharded cluster."""
+        if self.supports_transactions is None:
+            hello = await self.client.admin.command("hello")
+            self.supports_transactions = (
+                "setName" in hello or hello.get("msg") == "isdbgrid"
+            )
+        return self.supports_transactions
+
+    def close(self):
+        """Close every pooled connection."""
+        self.client.close()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the pool configuration together with live checkout statistics."""
+        return {
+            "min_pool_size": MONGO_MIN_POOL_SIZE,
+            "max_pool_size": MONGO_MAX_POOL_SIZE,
+            "max_idle_time_ms": MONGO_MAX_IDLE_TIME_MS,
+            "wait_queue_timeout_ms": MONGO_WAIT_QUEUE_TIMEOUT_MS,
+            **self.pool_stats.snapshot(),
+        }
 
-from config.config import MONGO_URI
 
 # Shared MongoDB client
-client: AsyncIOMotorClient = AsyncIOMotorClient(MONGO_URI)
-db = client.mmdb
+mongo = MongoManager(MONGO_URI, MONGO_DB_NAME)
+client: AsyncIOMotorClient = mongo.client
+db = mongo.db
 users_collection = db.users
 expenses_collection = db.expenses
 accounts_collection = db.accounts
 tokens_collection = db.tokens
+rollups_collection = db.expense_rollups
+revocations_collection = db.token_revocations
+export_jobs_collection = db.export_jobs
 
 
-async def fetch_data(
-    user_id: str, from_date: Optional[datetime.date], to_date: Optional[datetime.date]
-) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]], Optional[Dict[str, Any]]]:
+async def run_in_transaction(callback: Callable[[Any], Coroutine[Any, Any, T]]) -> T:
     """
-    Fetch user data from the database based on user ID and date range.
+    Run ``callback(session)`` as one retryable transaction when the deployment
+    supports transactions, otherwise run it directly with ``session=None``.
+
+    Every write in the callback must pass ``session=session``.
     """
+    if not await mongo.detect_transactions():
+        return await callback(None)
+    async with await client.start_session() as session:
+        return await session.with_transaction(callback)
+
+
+def validate_date_range(
+    from_date: Optional[datetime.date], to_date: Optional[datetime.date]
+):
+    """Reject a date range whose start is after its end."""
     if from_date and to_date and from_date > to_date:
         raise HTTPException(
             status_code=422,
             detail="Invalid date range: 'from_date' must be before 'to_date'",
         )
 
+
+def build_expense_query(
+    user_id: str, from_date: Optional[datetime.date], to_date: Optional[datetime.date]
+) -> Dict[str, Any]:
+    """
+    Build the expenses filter for a user and an inclusive date range.
+    """
+    validate_date_range(from_date, to_date)
+
     from_dt = (
         datetime.datetime.combine(from_date, datetime.time.min) if from_date else None
     )
@@ -44,12 +208,7 @@ async def fetch_data(
         query["date"] = {"$gte": from_dt}  # type: ignore
     elif to_dt:
         query["date"] = {"$lte": to_dt}  # type: ignore
-
-    expenses = await expenses_collection.find(query).to_list(1000)
-    accounts = await accounts_collection.find({"user_id": user_id}).to_list(100)
-    user = await users_collection.find_one({"_id": ObjectId(user_id)})
-
-    return expenses, accounts, user
+    return query
 
 
 def calculate_days_in_range(
@@ -0,0 +1,234 @@
+"""
+Background export jobs.
+
+``POST /exports/jobs`` hands an export to ``export_jobs`` instead of building
+it in the request. A job's ID is a digest of everything the export depends on
+(user, format, date range, report currency and the user's data version), so
+the same export requested again, by another click or another API worker,
+finds the existing job and reuses its build.
+
+Job status and progress live in the ``export_jobs`` collection, where a TTL
+index removes them once ``expires_at`` has passed. Queued and running jobs
+refresh their ``updated_at`` regularly, and a job that stops doing so for
+``EXPORT_JOB_STALE_SECONDS`` is taken as lost and restarted. Each API process builds at
+most ``EXPORT_JOB_WORKERS`` exports at a time and writes the artifacts to
+``EXPORT_JOBS_DIR``, which API processes on several hosts must share.
+"""
+
+import asyncio
+import datetime
+import glob
+import logging
+import os
+import tempfile
+import time
+from typing import IO, Any, Awaitable, Callable, Dict, Optional
+
+from fastapi import HTTPException
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError, PyMongoError
+
+from api.utils.db import export_jobs_collection
+from config.config import (
+    EXPORT_JOB_MAX_PENDING,
+    EXPORT_JOB_STALE_SECONDS,
+    EXPORT_JOB_TTL_SECONDS,
+    EXPORT_JOB_WORKERS,
+    EXPORT_JOBS_DIR,
+)
+
+logger = logging.getLogger(__name__)
+
+Progress = Callable[[float], Awaitable[None]]
+Build = Callable[[IO[bytes], Progress], Awaitable[None]]
+
+
+def utcnow() -> datetime.datetime:
+    """Return the current time as stored by MongoDB (naive UTC, milliseconds)."""
+    now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+    return now.replace(microsecond=now.microsecond // 1000 * 1000)
+
+
+class ExportJobs:
+    """Bounded pool of export builds whose status is kept in MongoDB."""
+
+    def __init__(
+        self,
+        directory: str,
+        workers: int = EXPORT_JOB_WORKERS,
+        max_pending: int = EXPORT_JOB_MAX_PENDING,
+        ttl: float = EXPORT_JOB_TTL_SECONDS,
+        stale_after: float = EXPORT_JOB_STALE_SECONDS,
+    ):
+        # pylint: disable=too-many-arguments,too-many-positional-arguments
+        self.directory = directory
+        self.workers = workers
+        self.max_pending = max_pending
+        self.ttl = ttl
+        self.stale_after = stale_after
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._tasks: Dict[asyncio.Task, str] = {}
+
+    def path(self, job: Dict[str, Any]) -> str:
+        """Return where the artifact of a job is stored."""
+        return os.path.join(self.directory, f"{job['_id']}.{job['format']}")
+
+    def artifact(self, job: Dict[str, Any]) -> Optional[str]:
+        """Return the path of a finished, unexpired job's artifact, if it exists."""
+        if job["status"] != "done" or job["expires_at"] <= utcnow():
+            return None
+        path = self.path(job)
+        return path if os.path.exists(path) else None
+
+    async def submit(self, job: Dict[str, Any], build: Build) -> Dict[str, Any]:
+        """
+        Start a job, or return the existing job with the same ID.
+
+        A job is started again if it failed, has expired, lost its artifact
+        or was left queued or running by a worker that stopped updating it.
+
+        Args:
+            job (dict): ``_id``, ``user_id`` and ``format`` plus any fields
+                describing the export.
+            build (callable): Writes the artifact to a file, reporting
+                progress between 0 and 1.
+
+        Returns:
+            dict: The job document.
+        """
+        if len(self._tasks) >= self.max_pending:
+            raise HTTPException(
+                status_code=503, detail="Too many exports in progress, retry later"
+            )
+        now = utcnow()
+        queued = {
+            **job,
+            "status": "queued",
+            "progress": 0.0,
+            "size": None,
+            "error": None,
+            "created_at": now,
+            "updated_at": now,
+            "expires_at": now + datetime.timedelta(seconds=self.ttl),
+        }
+        try:
+            await export_jobs_collection.insert_one(queued)
+            self._start(queued, build)
+            return queued
+        except DuplicateKeyError:
+            pass
+
+        existing = await export_jobs_collection.find_one({"_id": job["_id"]})
+        if existing is None:
+            # Removed by the TTL monitor in the meantime
+            return await self.submit(job, build)
+        # A build of this process is alive however long it has been queued
+        if self._reusable(existing, now) or job["_id"] in self._tasks.values():
+            return existing
+        # Only one caller wins the restart, the others see its queued job
+        restarted = await export_jobs_collection.find_one_and_update(
+            {"_id": job["_id"], "updated_at": existing["updated_at"]},
+            {"$set": queued},
+            return_document=ReturnDocument.AFTER,
+        )
+        if restarted is None:
+            return await export_jobs_collection.find_one({"_id": job["_id"]}) or queued
+        self._start(restarted, build)
+        return restarted
+
+    def _reusable(self, job: Dict[str, Any], now: datetime.datetime) -> bool:
+        if job["status"] == "done":
+            return self.artifact(job) is not None
+        if job["status"] == "failed" or job["expires_at"] <= now:
+            return False
+        stale = now - datetime.timedelta(seconds=self.stale_after)
+        return job["updated_at"] > stale
+
+    def _start(self, job: Dict[str, Any], build: Build):
+        task = asyncio.create_task(self._run(job, build))
+        self._tasks[task] = job["_id"]
+        task.add_done_callback(self._forget)
+
+    def _forget(self, task: asyncio.Task):
+        self._tasks.pop(task, None)
+
+    async def _update(self, job_id: str, **fields: Any):
+        await export_jobs_collection.update_one(
+            {"_id": job_id}, {"$set": {**fields, "updated_at": utcnow()}}
+        )
+
+    async def _heartbeat(self, job_id: str):
+        """Refresh ``updated_at`` so a queued or slow build is not taken as lost."""
+        while True:
+            await asyncio.sleep(self.stale_after / 3)
+            try:
+                await self._update(job_id)
+            except PyMongoError:
+                logger.warning("Could not refresh export job %s", job_id)
+
+    async def _run(self, job: Dict[str, Any], build: Build):
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.workers)
+        job_id = job["_id"]
+        path = self.path(job)
+        temp_path: Optional[str] = None
+        heartbeat = asyncio.create_task(self._heartbeat(job_id))
+
+        async def progress(fraction: float):
+            await self._update(job_id, progress=round(min(max(fraction, 0.0), 1.0), 3))
+
+        try:
+            async with self._slots:
+                await self._update(job_id, status="running")
+                os.makedirs(self.directory, exist_ok=True)
+                # A unique name, a restarted build of the same job may be writing too
+                handle, temp_path = tempfile.mkstemp(
+                    prefix=f"{job_id}.", suffix=".tmp", dir=self.directory
+                )
+                with os.fdopen(handle, "wb") as output:
+                    await build(output, progress)
+                # Readers only ever see complete files
+                os.replace(temp_path, path)
+                # The artifact is kept for a full TTL after it is built
+                await self._update(
+                    job_id,
+                    status="done",
+                    progress=1.0,
+                    size=os.path.getsize(path),
+                    expires_at=utcnow() + datetime.timedelta(seconds=self.ttl),
+                )
+        except HTTPException as e:
+            await self._update(job_id, status="failed", error=e.detail)
+        except Exception:  # pylint: disable=broad-exception-caught
+            logger.exception("Export job %s failed", job_id)
+            await self._update(job_id, status="failed", error="Export failed")
+        finally:
+            heartbeat.cancel()
+            if temp_path and os.path.exists(temp_path):
+                os.remove(temp_path)
+        self.prune()
+
+    def prune(self):
+        """Delete artifacts older than the job TTL."""
+        cutoff = time.time() - self.ttl
+        for path in glob.glob(os.path.join(self.directory, "*.*")):
+            try:
+                if os.stat(path).st_mtime < cutoff:
+                    os.remove(path)
+            except OSError:
+                continue
+
+    async def shutdown(self):
+        """Cancel the running builds, marking their jobs as failed."""
+        tasks = dict(self._tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for task, job_id in tasks.items():
+            if task.cancelled():
+                await self._update(job_id, status="failed", error="Export interrupted")
+
+
+export_jobs = ExportJobs(
+    EXPORT_JOBS_DIR or os.path.join(tempfile.gettempdir(), "moneymanager-exports")
+)
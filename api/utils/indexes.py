@@ -0,0 +1,228 @@
+"""
+Index declarations for every collection and verification of the hot query shapes.
+
+Run ``python -m api.utils.indexes`` to create the indexes and check that no
+registered query falls back to a collection scan. The API runs the same steps
+at startup (see ``MONGO_ENSURE_INDEXES`` and ``MONGO_VERIFY_INDEXES``).
+"""
+
+import argparse
+import asyncio
+import datetime
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ASCENDING, DESCENDING, IndexModel
+
+from api.utils.db import db, mongo
+
+INDEXES: Dict[str, List[IndexModel]] = {
+    "users": [
+        IndexModel([("username", ASCENDING)], name="username_unique", unique=True),
+    ],
+    "expenses": [
+        # Serves date range filters and (date, _id) keyset pagination
+        IndexModel(
+            [("user_id", ASCENDING), ("date", ASCENDING), ("_id", ASCENDING)],
+            name="user_date_id",
+        ),
+    ],
+    "expense_rollups": [
+        IndexModel(
+            [
+                ("user_id", ASCENDING),
+                ("day", ASCENDING),
+                ("category", ASCENDING),
+                ("currency", ASCENDING),
+            ],
+            name="user_day_category_currency_unique",
+            unique=True,
+        ),
+    ],
+    "accounts": [
+        IndexModel(
+            [("user_id", ASCENDING), ("name", ASCENDING)],
+            name="user_name_unique",
+            unique=True,
+        ),
+    ],
+    "tokens": [
+        IndexModel([("user_id", ASCENDING), ("token", ASCENDING)], name="user_token"),
+        IndexModel([("token", ASCENDING)], name="token"),
+        # Expired tokens are removed by MongoDB once ``expires_at`` has passed
+        IndexModel(
+            [("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0
+        ),
+    ],
+    "token_revocations": [
+        IndexModel([("jti", ASCENDING)], name="jti_unique", unique=True),
+        IndexModel([("revoked_at", ASCENDING)], name="revoked_at"),
+        # A revocation is pointless once the token has expired on its own
+        IndexModel(
+            [("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0
+        ),
+    ],
+    "export_jobs": [
+        # Jobs and their deduplication keys are forgotten once they expire
+        IndexModel(
+            [("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0
+        ),
+    ],
+    "telegram_bot": [
+        IndexModel([("telegram_id", ASCENDING)], name="telegram_id"),
+        IndexModel([("token", ASCENDING)], name="token"),
+    ],
+}
+
+
+class IndexVerificationError(RuntimeError):
+    """Raised when a registered query shape is not served by an index."""
+
+
+@dataclass(frozen=True)
+class QueryShape:
+    """A representative query issued by the API, used to check its plan."""
+
+    name: str
+    collection: str
+    filter: Dict[str, Any]
+    sort: Optional[List[Any]] = field(default=None)
+
+
+_SAMPLE_ID = "000000000000000000000000"
+_SAMPLE_DATE = datetime.datetime(2024, 1, 1)
+
+QUERY_SHAPES: List[QueryShape] = [
+    QueryShape("create_token", "users", {"username": "sample"}),
+    QueryShape(
+        "export_expenses",
+        "expenses",
+        {"user_id": _SAMPLE_ID, "date": {"$gte": _SAMPLE_DATE, "$lte": _SAMPLE_DATE}},
+    ),
+    QueryShape(
+        "get_expenses_first_page",
+        "expenses",
+        {"user_id": _SAMPLE_ID},
+        sort=[("date", DESCENDING), ("_id", DESCENDING)],
+    ),
+    QueryShape(
+        "get_expenses_next_page",
+        "expenses",
+        {
+            "user_id": _SAMPLE_ID,
+            "$or": [
+                {"date": {"$lt": _SAMPLE_DATE}},
+                {"date": _SAMPLE_DATE, "_id": {"$lt": ObjectId(_SAMPLE_ID)}},
+            ],
+        },
+        sort=[("date", DESCENDING), ("_id", DESCENDING)],
+    ),
+    QueryShape(
+        "analytics_rollups",
+        "expense_rollups",
+        {"user_id": _SAMPLE_ID, "day": {"$gte": _SAMPLE_DATE, "$lte": _SAMPLE_DATE}},
+    ),
+    QueryShape("add_expense", "accounts", {"user_id": _SAMPLE_ID, "name": "Checking"}),
+    QueryShape("get_accounts", "accounts", {"user_id": _SAMPLE_ID}),
+    QueryShape("verify_token", "tokens", {"user_id": _SAMPLE_ID, "token": "sample"}),
+    QueryShape("expired_token", "tokens", {"token": "sample"}),
+    QueryShape("get_tokens", "tokens", {"user_id": _SAMPLE_ID}),
+    QueryShape(
+        "revocations_load",
+        "token_revocations",
+        {"expires_at": {"$gt": _SAMPLE_DATE}},
+        sort=[("revoked_at", ASCENDING)],
+    ),
+    QueryShape(
+        "revocations_refresh",
+        "token_revocations",
+        {"revoked_at": {"$gte": _SAMPLE_DATE}},
+        sort=[("revoked_at", ASCENDING)],
+    ),
+    QueryShape("telegram_user", "telegram_bot", {"telegram_id": 0}),
+]
+
+
+async def ensure_indexes(database: AsyncIOMotorDatabase = db) -> Dict[str, List[str]]:
+    """Create every declared index. Existing indexes with the same spec are kept."""
+    created = {}
+    for collection_name, models in INDEXES.items():
+        created[collection_name] = await database[collection_name].create_indexes(
+            models
+        )
+    return created
+
+
+def plan_stages(plan: Any) -> List[str]:
+    """Collect every ``stage`` name of an explain plan, depth first."""
+    stages = []
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            stages.append(plan["stage"])
+        for value in plan.values():
+            stages.extend(plan_stages(value))
+    elif isinstance(plan, list):
+        for item in plan:
+            stages.extend(plan_stages(item))
+    return stages
+
+
+async def explain_shape(
+    shape: QueryShape, database: AsyncIOMotorDatabase = db
+) -> List[str]:
+    """Return the stages of the winning plan for a query shape."""
+    cursor = database[shape.collection].find(shape.filter)
+    if shape.sort:
+        cursor = cursor.sort(shape.sort)
+    explanation = await cursor.explain()
+    return plan_stages(explanation["queryPlanner"]["winningPlan"])
+
+
+async def verify_indexes(
+    database: AsyncIOMotorDatabase = db, shapes: Optional[List[QueryShape]] = None
+) -> Dict[str, List[str]]:
+    """
+    Explain every registered query shape and fail if any of them scans a collection.
+
+    Returns:
+        dict: Winning plan stages keyed by query shape name.
+
+    Raises:
+        IndexVerificationError: If one or more shapes use a COLLSCAN.
+    """
+    plans = {}
+    failures = []
+    for shape in shapes if shapes is not None else QUERY_SHAPES:
+        stages = await explain_shape(shape, database)
+        plans[shape.name] = stages
+        if "COLLSCAN" in stages:
+            failures.append(f"{shape.name} ({shape.collection})")
+    if failures:
+        raise IndexVerificationError(
+            f"Query shapes fall back to COLLSCAN: {', '.join(failures)}"
+        )
+    return plans
+
+
+async def main(verify_only: bool = False):
+    """Create (unless ``verify_only``) and verify indexes, printing each plan."""
+    try:
+        if not verify_only:
+            for collection_name, names in (await ensure_indexes()).items():
+                print(f"{collection_name}: {', '.join(names)}")
+        for shape_name, stages in (await verify_indexes()).items():
+            print(f"{shape_name}: {' <- '.join(stages)}")
+    finally:
+        mongo.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--verify-only",
+        action="store_true",
+        help="only explain the registered query shapes, do not create indexes",
+    )
+    asyncio.run(main(parser.parse_args().verify_only))
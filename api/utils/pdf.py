@@ -0,0 +1,209 @@
+"""
+Layout helpers for the PDF export.
+
+Styles, the table style and the logo are built once per process instead of
+once per export. Table cells are plain strings unless their text needs
+wrapping, and the expense table is laid out by ``ChunkedTable``, which pulls
+only a page worth of rows at a time from an iterator, so neither the
+flowables nor the table split work grow with the number of expenses.
+"""
+
+import datetime
+import os
+from functools import lru_cache
+from io import BytesIO
+from itertools import islice
+from typing import IO, Any, Dict, Iterable, Iterator, List, Sequence, Tuple
+from xml.sax.saxutils import escape
+
+from pytz import timezone  # type: ignore
+from reportlab.lib import colors  # type: ignore
+from reportlab.lib.pagesizes import letter  # type: ignore
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet  # type: ignore
+from reportlab.lib.units import inch  # type: ignore
+from reportlab.lib.utils import ImageReader  # type: ignore
+from reportlab.pdfbase.pdfmetrics import stringWidth  # type: ignore
+from reportlab.platypus import (  # type: ignore
+    Flowable,
+    FrameBreak,
+    Image,
+    LongTable,
+    Paragraph,
+    SimpleDocTemplate,
+    TableStyle,
+)
+
+from config.config import TIME_ZONE
+
+LOGO_PATH = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), "../../docs/logo/logo.png")
+)
+# Rows a ChunkedTable first lays out, about a page of one-line rows
+TABLE_CHUNK_ROWS = 40
+# Font and horizontal padding of table cells, used to decide on wrapping
+CELL_FONT = ("Helvetica", 10)
+CELL_PADDING = 12
+
+TABLE_STYLE = TableStyle(
+    [
+        ("BACKGROUND", (0, 0), (-1, 0), colors.grey),
+        ("TEXTCOLOR", (0, 0), (-1, 0), colors.whitesmoke),
+        ("ALIGN", (0, 0), (-1, -1), "CENTER"),
+        ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
+        ("BOTTOMPADDING", (0, 0), (-1, 0), 12),
+        ("BACKGROUND", (0, 1), (-1, -1), colors.beige),
+        ("GRID", (0, 0), (-1, -1), 1, colors.black),
+    ]
+)
+
+
+@lru_cache(maxsize=None)
+def pdf_styles() -> Dict[str, ParagraphStyle]:
+    """Return the paragraph styles of the export, built on first use."""
+    styles = getSampleStyleSheet()
+    return {
+        "Title": styles["Title"],
+        "Heading2": styles["Heading2"],
+        "Normal": styles["Normal"],
+        "Cover": ParagraphStyle(
+            name="Cover",
+            parent=styles["Title"],
+            fontSize=32,
+            spaceAfter=12,
+        ),
+        "Centered": ParagraphStyle(
+            name="Centered",
+            parent=styles["Normal"],
+            alignment=1,  # Center alignment
+        ),
+    }
+
+
+@lru_cache(maxsize=None)
+def logo_data() -> Tuple[bytes, float]:
+    """Return the logo's PNG bytes and its height to width ratio."""
+    with open(LOGO_PATH, "rb") as file:
+        data = file.read()
+    width, height = ImageReader(BytesIO(data)).getSize()
+    return data, height / width
+
+
+def logo_image(width: float) -> Image:
+    """Return the logo scaled to ``width``."""
+    data, ratio = logo_data()
+    return Image(BytesIO(data), width=width, height=width * ratio)
+
+
+def create_paragraph(text: str, style: ParagraphStyle) -> Paragraph:
+    """Create a paragraph with the given text and style."""
+    return Paragraph(text, style)
+
+
+def table_cell(value: Any, width: float) -> Any:
+    """Return a cell as a plain string, or as a paragraph if it must wrap."""
+    text = str(value)
+    if stringWidth(text, *CELL_FONT) <= width - CELL_PADDING:
+        return text
+    return Paragraph(escape(text), pdf_styles()["Normal"])
+
+
+def table_rows(rows: Iterable[Sequence[Any]], col_widths: list) -> Iterator[list]:
+    """Convert rows of values to table cells."""
+    for row in rows:
+        yield [table_cell(value, width) for value, width in zip(row, col_widths)]
+
+
+def cells_table(cells: list, col_widths: list) -> LongTable:
+    """Create a table from rows of cells, repeating the first row on every page."""
+    table = LongTable(cells, colWidths=col_widths, repeatRows=1)
+    table.setStyle(TABLE_STYLE)
+    return table
+
+
+def create_table(data: list, col_widths: list) -> LongTable:
+    """Create a table whose first row is a header repeated on every page."""
+    return cells_table(list(table_rows(data, col_widths)), col_widths)
+
+
+class ChunkedTable(Flowable):
+    """
+    A table of rows drawn from an iterator, one page at a time.
+
+    The flowable never fits a frame, so the document asks it to split; it
+    then lays out the header plus a chunk of pending rows a little larger
+    than what fitted the previous page, hands over the part that fits and
+    keeps the rest. Cells are converted once, when rows are pulled.
+    """
+
+    def __init__(self, header: list, rows: Iterator[Sequence[Any]], col_widths: list):
+        super().__init__()
+        self.rows = iter(rows)
+        self.col_widths = col_widths
+        self.header = next(table_rows([header], col_widths))
+        self.chunk_rows = TABLE_CHUNK_ROWS
+        self.pending: List[list] = []
+        self._refill()
+
+    def _refill(self) -> bool:
+        """Pull rows up to the chunk size, returning whether any are left."""
+        missing = self.chunk_rows - len(self.pending)
+        self.pending.extend(table_rows(islice(self.rows, missing), self.col_widths))
+        return len(self.pending) == self.chunk_rows
+
+    def wrap(self, availWidth, availHeight):
+        return availWidth, availHeight + 1
+
+    def split(self, availWidth, availheight):
+        more = len(self.pending) == self.chunk_rows
+        while True:
+            table = cells_table([self.header, *self.pending], self.col_widths)
+            _, height = table.wrapOn(self.canv, availWidth, availheight)
+            if height > availheight or not more:
+                break
+            # The whole chunk fits, make it larger
+            self.chunk_rows *= 2
+            more = self._refill()
+        if height <= availheight:
+            return [table]
+
+        parts = table.splitOn(self.canv, availWidth, availheight)
+        if not parts:
+            # Not even one row fits, continue in the next frame
+            return [FrameBreak(), self]
+        # pylint: disable-next=protected-access
+        drawn = parts[0]._nrows - 1
+        del self.pending[:drawn]
+        self.chunk_rows = max(drawn + drawn // 4 + 1, len(self.pending))
+        self._refill()
+        return [parts[0], self] if self.pending else [parts[0]]
+
+    def draw(self):
+        """Nothing to draw, the split tables are drawn instead."""
+
+
+def long_table(header: list, rows: Iterator[Sequence[Any]], col_widths: list):
+    """Return the flowable for a possibly long table of rows."""
+    table = ChunkedTable(header, rows, col_widths)
+    if not table.pending:
+        return create_table([header], col_widths)
+    return table
+
+
+def footer(canvas, doc):
+    """Footer with date of export, 'Money Manager V2', and page number."""
+    canvas.saveState()
+    tz = timezone(TIME_ZONE)
+    footer_text = (
+        f"Money Manager V2 - Exported on "
+        f"{datetime.datetime.now(tz).strftime('%Y-%m-%d %H:%M:%S')}"
+    )
+    canvas.setFont("Helvetica", 9)
+    canvas.drawString(inch, 0.75 * inch, footer_text)
+    canvas.drawRightString(7.5 * inch, 0.75 * inch, f"Page {doc.page}")
+    canvas.restoreState()
+
+
+def write_pdf(output: IO[bytes], elements: list, title: str):
+    """Lay out the flowables and write the document to ``output``."""
+    doc = SimpleDocTemplate(output, pagesize=letter, title=title, lang="en-gb")
+    doc.build(elements, onFirstPage=footer, onLaterPages=footer)
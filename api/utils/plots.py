@@ -1,60 +1,87 @@
-"""Shared plotting utilities for analytics and exports."""
+"""
+Shared plotting utilities for analytics and exports.
+
+Charts are drawn on their own ``Figure`` objects instead of pyplot's global
+state, so they can be rendered concurrently; ``api.utils.render`` runs them
+in worker processes. Every chart is saved as PNG or, for clients that scale
+it themselves, as SVG.
+"""
 
 import datetime
 import io
-from typing import Optional
+from typing import List, Optional, Tuple
 
-import matplotlib.pyplot as plt
+import matplotlib
+import numpy as np
 import pandas as pd
+from matplotlib.axes import Axes
+from matplotlib.figure import Figure
+
+IMAGE_MEDIA_TYPES = {"png": "image/png", "svg": "image/svg+xml"}
+
+# Most bars annotated with their amount, the largest ones win
+MAX_BAR_LABELS = 31
+# Most labelled ticks on a bar chart's x axis
+MAX_TICK_LABELS = 31
+# Beyond this many bars, they are drawn as one filled step artist
+MAX_BAR_PATCHES = 400
 
+BAR_TITLES = {
+    "day": ("Total Expenses per Day", "Date"),
+    "week": ("Total Expenses per Week", "Week Starting"),
+    "month": ("Total Expenses per Month", "Month"),
+}
 
-def create_expense_bar(
-    expenses: list,
+
+def create_expense_bar(  # pylint: disable=too-many-arguments,too-many-positional-arguments
+    expenses: pd.Series,
     from_date: Optional[datetime.date] = None,
     to_date: Optional[datetime.date] = None,
+    currency: Optional[str] = None,
+    image_format: str = "png",
+    granularity: str = "day",
 ) -> io.BytesIO:
-    """Generate expense bar chart."""
-    df = pd.DataFrame(expenses)
-    df["date"] = pd.to_datetime(df["date"])
-    daily_expenses = df.groupby(df["date"].dt.date)["amount"].sum()
+    """
+    Generate expense bar chart from totals indexed by day, week or month.
 
-    plt.figure(figsize=(10, 6))
-    ax = daily_expenses.plot(kind="bar", color="skyblue")
+    ``granularity`` names the bucket of the totals (see
+    ``api.utils.aggregations.downsample``) for the title and axis label.
+    """
+    fig = Figure(figsize=(10, 6))
+    ax = fig.add_subplot()
+    draw_bars(ax, expenses)
 
+    title, xlabel = BAR_TITLES[granularity]
     date_range_text = get_date_range_text(from_date, to_date)
-    total_spend = daily_expenses.sum()
-    plt.title(
-        f"Total Expenses per Day\n{date_range_text}\nTotal Spend: ${total_spend:,.2f}"
+    total_spend = expenses.sum()
+    ax.set_title(
+        f"{title}\n{date_range_text}\n"
+        f"Total Spend: {format_amount(total_spend, currency)}"
     )
 
-    plt.xlabel("Date")
-    plt.ylabel("Total Expense Amount")
-    plt.xticks(rotation=45)
-    plt.tight_layout()
-
-    for i, value in enumerate(daily_expenses):
-        ax.text(i, value + 0.5, f"{value:.2f}", ha="center", va="bottom", fontsize=10)
+    ax.set_xlabel(xlabel)
+    ax.set_ylabel(amount_label("Total Expense Amount", currency))
+    fig.tight_layout()
 
-    return save_plot_to_buffer()
+    return save_figure_to_buffer(fig, image_format)
 
 
 def create_category_pie(
-    expenses: list,
+    category_expenses: pd.Series,
     from_date: Optional[datetime.date] = None,
     to_date: Optional[datetime.date] = None,
+    currency: Optional[str] = None,
+    image_format: str = "png",
 ) -> io.BytesIO:
-    """Generate category pie chart."""
-    df = pd.DataFrame(expenses)
-    df["date"] = pd.to_datetime(df["date"])
-
-    category_expenses = df.groupby("category")["amount"].sum()
-
-    plt.figure(figsize=(8, 8))
+    """Generate category pie chart from totals indexed by category."""
+    fig = Figure(figsize=(8, 8))
+    ax = fig.add_subplot()
 
     date_range_text = get_date_range_text(from_date, to_date)
     total_spend = category_expenses.sum()
-    plt.title(
-        f"Expense Distribution by Category\n{date_range_text}\nTotal Spend: ${total_spend:,.2f}",
+    ax.set_title(
+        f"Expense Distribution by Category\n{date_range_text}\n"
+        f"Total Spend: {format_amount(total_spend, currency)}",
         pad=20,
     )
 
@@ -71,90 +98,136 @@ def create_category_pie(
         "#16a085",  # green sea
     ]
 
-    labels = [f"{cat}\n(${amount:,.2f})" for cat, amount in category_expenses.items()]
+    labels = [
+        f"{cat}\n({format_amount(amount, currency)})"
+        for cat, amount in category_expenses.items()
+    ]
 
-    plt.pie(
+    ax.pie(
         category_expenses,
         labels=labels,
         autopct="%1.1f%%",
         startangle=140,
         colors=colors,
     )
-    plt.axis("equal")
+    ax.axis("equal")
 
-    return save_plot_to_buffer()
+    return save_figure_to_buffer(fig, image_format)
 
 
 def create_monthly_line(
-    expenses: list,
+    monthly_expenses: pd.Series,
     from_date: Optional[datetime.date] = None,
     to_date: Optional[datetime.date] = None,
+    currency: Optional[str] = None,
+    image_format: str = "png",
 ) -> io.BytesIO:
-    """Generate monthly expense line chart."""
-    df = pd.DataFrame(expenses)
-    df["date"] = pd.to_datetime(df["date"])
-    monthly_expenses = df.groupby(df["date"].dt.to_period("M"))["amount"].sum()
-
-    plt.figure(figsize=(10, 6))
+    """Generate monthly expense line chart from totals indexed by month."""
+    fig = Figure(figsize=(10, 6))
+    ax = fig.add_subplot()
+    positions = range(len(monthly_expenses))
+    ax.plot(positions, monthly_expenses.to_numpy(), marker="o", color="skyblue")
+    ax.set_xticks(
+        positions, [str(month) for month in monthly_expenses.index], rotation=45
+    )
 
     date_range_text = get_date_range_text(from_date, to_date)
     total_spend = monthly_expenses.sum()
-    plt.title(f"Monthly Expenses\n{date_range_text}\nTotal Spend: ${total_spend:,.2f}")
+    ax.set_title(
+        f"Monthly Expenses\n{date_range_text}\n"
+        f"Total Spend: {format_amount(total_spend, currency)}"
+    )
 
-    plt.xlabel("Month")
-    plt.ylabel("Total Expense Amount")
-    plt.xticks(rotation=45)
-    plt.tight_layout()
+    ax.set_xlabel("Month")
+    ax.set_ylabel(amount_label("Total Expense Amount", currency))
+    fig.tight_layout()
 
-    return save_plot_to_buffer()
+    return save_figure_to_buffer(fig, image_format)
 
 
 def create_category_bar(
-    expenses: list,
+    category_expenses: pd.Series,
     from_date: Optional[datetime.date] = None,
     to_date: Optional[datetime.date] = None,
+    currency: Optional[str] = None,
+    image_format: str = "png",
 ) -> io.BytesIO:
-    """Generate category bar chart."""
-    df = pd.DataFrame(expenses)
-    df["date"] = pd.to_datetime(df["date"])
-
-    category_expenses = df.groupby("category")["amount"].sum()
-
-    plt.figure(figsize=(10, 6))
-    ax = category_expenses.plot(kind="bar", color="skyblue")
+    """Generate category bar chart from totals indexed by category."""
+    fig = Figure(figsize=(10, 6))
+    ax = fig.add_subplot()
+    draw_bars(ax, category_expenses)
 
     date_range_text = get_date_range_text(from_date, to_date)
     total_spend = category_expenses.sum()
-    plt.title(
-        f"Expenses by Category\n{date_range_text}\nTotal Spend: ${total_spend:,.2f}"
+    ax.set_title(
+        f"Expenses by Category\n{date_range_text}\n"
+        f"Total Spend: {format_amount(total_spend, currency)}"
     )
 
-    plt.xlabel("Category")
-    plt.ylabel("Total Expense Amount")
-    plt.xticks(rotation=45)
-    plt.tight_layout()
-
-    for i, value in enumerate(category_expenses):
-        ax.text(i, value + 0.5, f"{value:.2f}", ha="center", va="bottom", fontsize=10)
+    ax.set_xlabel("Category")
+    ax.set_ylabel(amount_label("Total Expense Amount", currency))
+    fig.tight_layout()
 
-    return save_plot_to_buffer()
+    return save_figure_to_buffer(fig, image_format)
 
 
-def create_budget_vs_actual(
-    expenses: list,
+def create_budget_vs_actual(  # pylint: disable=too-many-arguments,too-many-positional-arguments
+    category_expenses: pd.Series,
     categories: dict,
     from_date: Optional[datetime.date] = None,
     to_date: Optional[datetime.date] = None,
+    first_expense_date: Optional[datetime.date] = None,
+    last_expense_date: Optional[datetime.date] = None,
+    currency: Optional[str] = None,
+    image_format: str = "png",
 ) -> io.BytesIO:
-    """Generate budget vs actual comparison chart."""
-    df = pd.DataFrame(expenses)
-    df["date"] = pd.to_datetime(df["date"])
-    category_expenses = df.groupby("category")["amount"].sum()
-    first_expense_date = df["date"].min().date() if not from_date else from_date
-    last_expense_date = df["date"].max().date() if not to_date else to_date
-
-    category_names = list(set(category_expenses.index).union(set(categories.keys())))
-    actuals = [category_expenses.get(cat, 0) for cat in category_names]
+    """Generate budget vs actual comparison chart from totals indexed by category."""
+    category_names, actuals, budgeted = budget_vs_actual_series(
+        category_expenses,
+        categories,
+        from_date,
+        to_date,
+        first_expense_date,
+        last_expense_date,
+    )
+
+    fig = Figure(figsize=(10, 6))
+    ax = fig.add_subplot()
+    x = range(len(category_names))
+    ax.bar(x, budgeted, width=0.4, label="Budgeted", align="center")
+    ax.bar(x, actuals, width=0.4, label="Actual", align="edge")
+    ax.set_xticks(x, category_names, rotation=45)
+
+    date_range_text = get_date_range_text(from_date, to_date)
+    ax.set_title(f"Budget vs Actual Expenses\n{date_range_text}")
+    ax.set_xlabel("Category")
+    ax.set_ylabel(amount_label("Amount", currency))
+    ax.legend()
+    fig.tight_layout()
+
+    return save_figure_to_buffer(fig, image_format)
+
+
+def budget_vs_actual_series(  # pylint: disable=too-many-arguments,too-many-positional-arguments
+    category_expenses: pd.Series,
+    categories: dict,
+    from_date: Optional[datetime.date] = None,
+    to_date: Optional[datetime.date] = None,
+    first_expense_date: Optional[datetime.date] = None,
+    last_expense_date: Optional[datetime.date] = None,
+) -> Tuple[List[str], List[float], List[float]]:
+    """
+    Pair the spend of every category with its budget prorated to the date range.
+
+    Returns:
+        tuple: Category names in alphabetical order, their actual spend and
+            their prorated budgets.
+    """
+    first_expense_date = from_date or first_expense_date
+    last_expense_date = to_date or last_expense_date
+
+    category_names = sorted(set(category_expenses.index).union(categories.keys()))
+    actuals = [float(category_expenses.get(cat, 0)) for cat in category_names]
     budgeted = [
         (
             prorate_budget(
@@ -165,25 +238,52 @@ def create_budget_vs_actual(
                 last_expense_date,
             )
             if cat in categories
-            else 0
+            else 0.0
         )
         for cat in category_names
     ]
+    return category_names, actuals, budgeted
 
-    plt.figure(figsize=(10, 6))
-    x = range(len(category_names))
-    plt.bar(x, budgeted, width=0.4, label="Budgeted", align="center")
-    plt.bar(x, actuals, width=0.4, label="Actual", align="edge")
-    plt.xticks(x, category_names, rotation=45)
 
-    date_range_text = get_date_range_text(from_date, to_date)
-    plt.title(f"Budget vs Actual Expenses\n{date_range_text}")
-    plt.xlabel("Category")
-    plt.ylabel("Amount")
-    plt.legend()
-    plt.tight_layout()
+def draw_bars(ax: Axes, totals: pd.Series):
+    """
+    Draw one bar per total, like ``Series.plot(kind="bar")``.
+
+    The number of artists stays bounded however many totals there are: at
+    most ``MAX_TICK_LABELS`` evenly spaced ticks are labelled, only the
+    ``MAX_BAR_LABELS`` largest bars show their amount, and more than
+    ``MAX_BAR_PATCHES`` bars are drawn as a single step patch.
+    """
+    values = totals.to_numpy()
+    if len(values) > MAX_BAR_PATCHES:
+        ax.stairs(values, np.arange(len(values) + 1) - 0.5, fill=True, color="skyblue")
+    else:
+        ax.bar(range(len(values)), values, width=0.5, color="skyblue")
+
+    step = -(-len(values) // MAX_TICK_LABELS) or 1
+    ticks = range(0, len(values), step)
+    ax.set_xticks(ticks, [str(totals.index[i]) for i in ticks], rotation=45)
+
+    labelled = np.sort(np.argsort(-values, kind="stable")[:MAX_BAR_LABELS])
+    for i in labelled:
+        ax.text(
+            i,
+            values[i] + 0.5,
+            f"{values[i]:.2f}",
+            ha="center",
+            va="bottom",
+            fontsize=10,
+        )
 
-    return save_plot_to_buffer()
+
+def format_amount(amount: float, currency: Optional[str] = None) -> str:
+    """Format an amount for a chart, followed by its currency code if known."""
+    return f"{amount:,.2f} {currency}" if currency else f"{amount:,.2f}"
+
+
+def amount_label(label: str, currency: Optional[str] = None) -> str:
+    """Append the currency code to an axis label if known."""
+    return f"{label} ({currency})" if currency else label
 
 
 def get_date_range_text(
@@ -203,11 +303,18 @@ def get_date_range_text(
     return "Date Range: All"
 
 
-def save_plot_to_buffer() -> io.BytesIO:
-    """Save current plot to BytesIO buffer."""
+def save_figure_to_buffer(fig: Figure, image_format: str = "png") -> io.BytesIO:
+    """Render a figure as PNG or SVG into a BytesIO buffer."""
     buf = io.BytesIO()
-    plt.savefig(buf, format="png", bbox_inches="tight")
-    plt.close()
+    if image_format == "svg":
+        # Keep text as text and element IDs stable, so an SVG is small and the
+        # same data always gives the same bytes
+        with matplotlib.rc_context(
+            {"svg.fonttype": "none", "svg.hashsalt": "moneymanager"}
+        ):
+            fig.savefig(buf, format="svg", bbox_inches="tight", metadata={"Date": None})
+    else:
+        fig.savefig(buf, format="png", bbox_inches="tight")
     buf.seek(0)
     return buf
 
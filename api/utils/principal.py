@@ -0,0 +1,186 @@
+"""
+Request-scoped authentication context and a cross-request cache of user documents.
+
+Routes depend on ``get_principal`` instead of calling ``verify_token`` and
+re-reading the user document. ``Principal.user()`` loads the document at most
+once per request, from ``user_cache`` when possible.
+
+Every user document carries a ``version`` that ``update_user_doc`` increments
+on each change and writes through to the cache. The cache never replaces a
+document with an older version. Changes made by other API processes become
+visible once the cached entry reaches ``USER_CACHE_TTL_SECONDS``.
+
+Expense and account writes bump the version too, in the same transaction,
+through ``run_data_write``, so the version identifies everything a user's
+charts and exports are drawn from. Anything keyed by the version reads it with
+``data_version``, which bypasses the cache.
+"""
+
+import copy
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Coroutine, List, Optional, Tuple, TypeVar
+
+from bson import ObjectId
+from fastapi import Header, HTTPException
+from pymongo import ReturnDocument
+
+from api.utils.auth import verify_token
+from api.utils.db import run_in_transaction, users_collection
+from config.config import USER_CACHE_MAX_SIZE, USER_CACHE_TTL_SECONDS
+
+T = TypeVar("T")
+
+
+class UserCache:
+    """Bounded LRU cache of user documents keyed by user ID."""
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: OrderedDict[str, Tuple[dict, float]] = OrderedDict()
+
+    def get(self, user_id: str) -> Optional[dict]:
+        """Return a copy of a cached, fresh user document."""
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return None
+        user, expires = entry
+        if expires <= time.monotonic():
+            del self._entries[user_id]
+            return None
+        self._entries.move_to_end(user_id)
+        return copy.deepcopy(user)
+
+    def put(self, user: dict):
+        """Cache a user document unless a newer version is already cached."""
+        if self.ttl <= 0 or self.max_size <= 0:
+            return
+        user_id = str(user["_id"])
+        cached = self._entries.get(user_id)
+        if cached and cached[0].get("version", 0) > user.get("version", 0):
+            return
+        self._entries[user_id] = (copy.deepcopy(user), time.monotonic() + self.ttl)
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def evict(self, user_id: str):
+        """Forget one user."""
+        self._entries.pop(user_id, None)
+
+    def clear(self):
+        """Forget every user."""
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+user_cache = UserCache(USER_CACHE_MAX_SIZE, USER_CACHE_TTL_SECONDS)
+
+
+async def load_user(user_id: str, fresh: bool = False) -> Optional[dict]:
+    """
+    Return a user document, from the cache when it holds a fresh copy.
+
+    Pass ``fresh=True`` to read the database, e.g. before a read-modify-write.
+    """
+    user = None if fresh else user_cache.get(user_id)
+    if user is None:
+        user = await users_collection.find_one({"_id": ObjectId(user_id)})
+        if user:
+            user_cache.put(user)
+    return user
+
+
+async def update_user_doc(user_id: str, update: dict) -> Optional[dict]:
+    """
+    Apply an update to a user document, bump its version and cache the result.
+
+    Args:
+        user_id (str): ID of the user.
+        update (dict): MongoDB update operators, e.g. ``{"$set": {...}}``.
+
+    Returns:
+        dict: The updated user document, or None if the user does not exist.
+    """
+    update = {**update, "$inc": {**update.get("$inc", {}), "version": 1}}
+    user = await users_collection.find_one_and_update(
+        {"_id": ObjectId(user_id)}, update, return_document=ReturnDocument.AFTER
+    )
+    if user:
+        user_cache.put(user)
+    else:
+        user_cache.evict(user_id)
+    return user
+
+
+async def run_data_write(
+    user_id: str, callback: Callable[[Any], Coroutine[Any, Any, T]]
+) -> T:
+    """
+    Run an expense or account write and bump the user's data version with it.
+
+    ``callback(session)`` runs through ``run_in_transaction`` and the version
+    is incremented in the same transaction, so wherever transactions are
+    supported a write is never recorded without its bump. The bumped user
+    document is cached once the transaction commits.
+    """
+    bumped: List[Optional[dict]] = [None]
+
+    async def write(session) -> T:
+        result = await callback(session)
+        bumped[0] = await users_collection.find_one_and_update(
+            {"_id": ObjectId(user_id)},
+            {"$inc": {"version": 1}},
+            return_document=ReturnDocument.AFTER,
+            session=session,
+        )
+        return result
+
+    result = await run_in_transaction(write)
+    if bumped[0]:
+        user_cache.put(bumped[0])
+    else:
+        user_cache.evict(user_id)
+    return result
+
+
+async def data_version(user_id: str) -> Optional[int]:
+    """Read a user's current data version, or None if the user does not exist."""
+    user = await users_collection.find_one({"_id": ObjectId(user_id)}, {"version": 1})
+    return user.get("version", 0) if user else None
+
+
+class Principal:
+    """The authenticated caller of one request."""
+
+    def __init__(self, user_id: str, token: str):
+        self.user_id = user_id
+        self.token = token
+        self._user: Optional[dict] = None
+        self._loaded = False
+
+    async def user(self, fresh: bool = False) -> Optional[dict]:
+        """
+        Return the caller's user document, loading it at most once.
+
+        ``fresh=True`` bypasses the cross-request cache for the first load.
+        """
+        if not self._loaded:
+            self._user = await load_user(self.user_id, fresh)
+            self._loaded = True
+        return self._user
+
+    async def require_user(self, fresh: bool = False) -> dict:
+        """Return the caller's user document or fail with 404."""
+        user = await self.user(fresh)
+        if not user:
+            raise HTTPException(status_code=404, detail="User not found")
+        return user
+
+
+async def get_principal(token: str = Header(None)) -> Principal:
+    """FastAPI dependency that authenticates the request."""
+    return Principal(await verify_token(token), token)
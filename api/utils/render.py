@@ -0,0 +1,94 @@
+"""
+Chart rendering off the event loop.
+
+The ``create_*`` functions of ``api.utils.plots`` take hundreds of milliseconds
+of CPU. ``render_chart`` runs them in a bounded pool of worker processes
+that import matplotlib and build its font cache when they start, so a chart
+request neither blocks other requests nor pays that start-up cost.
+
+``RENDER_WORKERS = 0`` renders in the event loop's default thread pool
+instead, which the object-oriented ``Figure`` API makes safe.
+"""
+
+import asyncio
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor
+from functools import partial
+from typing import Any, Callable, Optional
+
+import pandas as pd
+
+from api.utils.plots import create_category_pie
+from config.config import RENDER_MAX_PENDING, RENDER_WORKERS
+
+
+def warm_up():
+    """Render a throwaway chart so the worker has imported and cached everything."""
+    create_category_pie(pd.Series([1.0], index=["warm up"]))
+
+
+def run_chart(chart: Callable[..., Any], *args: Any, **kwargs: Any) -> bytes:
+    """Render a chart in the worker and return its PNG bytes."""
+    return chart(*args, **kwargs).getvalue()
+
+
+class RenderPool:
+    """Lazily started pool of chart rendering processes."""
+
+    def __init__(self, workers: int, max_pending: int):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor: Optional[Executor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    def start(self) -> Optional[Executor]:
+        """Start the worker processes if they are not running yet."""
+        if self._executor is None and self.workers > 0:
+            # Forking the API process would copy its threads' locks; start clean
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=warm_up,
+            )
+        return self._executor
+
+    async def warm(self):
+        """Start every worker now instead of on the first chart request."""
+        executor = self.start()
+        if executor is not None:
+            loop = asyncio.get_running_loop()
+            await asyncio.gather(
+                *(loop.run_in_executor(executor, int) for _ in range(self.workers))
+            )
+
+    def shutdown(self):
+        """Stop the worker processes."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def render(self, chart: Callable[..., Any], *args: Any, **kwargs: Any):
+        """
+        Render a chart without blocking the event loop.
+
+        At most ``max_pending`` renders are queued or running; further callers
+        wait for a slot, which keeps a burst of chart requests from piling up
+        work that outlives their clients.
+
+        Returns:
+            bytes: The PNG image.
+        """
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_pending)
+        async with self._slots:
+            return await asyncio.get_running_loop().run_in_executor(
+                self.start(), partial(run_chart, chart, *args, **kwargs)
+            )
+
+
+render_pool = RenderPool(RENDER_WORKERS, RENDER_MAX_PENDING)
+
+
+async def render_chart(chart: Callable[..., Any], *args: Any, **kwargs: Any) -> bytes:
+    """Render one of the ``api.utils.plots`` charts in the shared pool."""
+    return await render_pool.render(chart, *args, **kwargs)
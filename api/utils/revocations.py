@@ -0,0 +1,186 @@
+"""
+Revocation feed for stateless token verification (``AUTH_MODE = "stateless"``).
+
+Every revoked token ``jti`` is upserted into the ``token_revocations``
+collection with the server time of the write (``revoked_at``). Each API
+process keeps the unexpired revocations in memory as a bloom filter in front
+of an exact ``jti`` map. It loads them at startup and then pulls only the
+entries written since its last refresh.
+
+The feed is written in every auth mode, so switching to stateless
+verification does not revive tokens that were deleted before the switch.
+"""
+
+import asyncio
+import datetime
+import hashlib
+import math
+import time
+from typing import Dict, Iterable, Optional, Tuple
+
+from jose import jwt
+from pymongo import ASCENDING, UpdateOne
+
+from api.utils.db import revocations_collection
+from config.config import REVOCATION_BLOOM_CAPACITY, REVOCATION_REFRESH_SECONDS
+
+# Re-read entries this close to the watermark, they may have committed late
+REFRESH_OVERLAP = datetime.timedelta(seconds=30)
+
+
+def to_epoch(value: datetime.datetime) -> float:
+    """Convert a stored (naive UTC) datetime to epoch seconds."""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=datetime.timezone.utc)
+    return value.timestamp()
+
+
+class BloomFilter:
+    """Fixed size bloom filter of strings using double hashing."""
+
+    def __init__(self, capacity: int, error_rate: float = 0.01):
+        self.capacity = max(capacity, 1)
+        self.size = math.ceil(-self.capacity * math.log(error_rate) / math.log(2) ** 2)
+        self.hashes = max(1, round(self.size / self.capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item: str) -> Iterable[int]:
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        return ((first + i * second) % self.size for i in range(self.hashes))
+
+    def add(self, item: str):
+        """Add an item to the filter."""
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item: str) -> bool:
+        return all(
+            self.bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(item)
+        )
+
+
+class RevocationSet:
+    """In-memory view of the revocation feed."""
+
+    def __init__(self, capacity: int, refresh_interval: float):
+        self.capacity = capacity
+        self.refresh_interval = refresh_interval
+        # jti -> (revoked from, token expiry) in epoch seconds
+        self._revoked: Dict[str, Tuple[float, float]] = {}
+        self._bloom = BloomFilter(capacity)
+        self._watermark: Optional[datetime.datetime] = None
+        self._refreshed = -math.inf
+        self._lock = asyncio.Lock()
+
+    def __len__(self) -> int:
+        return len(self._revoked)
+
+    def add(self, jti: str, effective_at: float, expires_at: float):
+        """Record that ``jti`` is revoked from ``effective_at`` on."""
+        self._revoked[jti] = (effective_at, expires_at)
+        if len(self._revoked) > self.capacity:
+            self.capacity *= 2
+            self._rebuild()
+        else:
+            self._bloom.add(jti)
+
+    def _rebuild(self):
+        self._bloom = BloomFilter(self.capacity)
+        for jti in self._revoked:
+            self._bloom.add(jti)
+
+    def is_revoked(self, jti: str, now: Optional[float] = None) -> bool:
+        """Return whether a token ID is revoked at ``now``."""
+        if jti not in self._bloom:
+            return False
+        entry = self._revoked.get(jti)
+        if entry is None:
+            return False
+        return entry[0] <= (time.time() if now is None else now)
+
+    def purge(self, now: Optional[float] = None):
+        """Drop revocations of tokens that have expired on their own."""
+        now = time.time() if now is None else now
+        expired = [jti for jti, (_, expires) in self._revoked.items() if expires <= now]
+        for jti in expired:
+            del self._revoked[jti]
+        if expired:
+            self._rebuild()
+
+    async def refresh(self):
+        """Pull the revocations written since the last refresh."""
+        if self._watermark is None:
+            query: dict = {"expires_at": {"$gt": datetime.datetime.now(datetime.UTC)}}
+        else:
+            query = {"revoked_at": {"$gte": self._watermark - REFRESH_OVERLAP}}
+        async for doc in revocations_collection.find(query).sort(
+            "revoked_at", ASCENDING
+        ):
+            self.add(
+                doc["jti"], to_epoch(doc["effective_at"]), to_epoch(doc["expires_at"])
+            )
+            if self._watermark is None or doc["revoked_at"] > self._watermark:
+                self._watermark = doc["revoked_at"]
+        if self._watermark is None:
+            self._watermark = datetime.datetime.now(datetime.UTC).replace(tzinfo=None)
+        self._refreshed = time.monotonic()
+
+    async def load(self):
+        """Load every unexpired revocation, replacing the in-memory state."""
+        self._revoked.clear()
+        self._rebuild()
+        self._watermark = None
+        await self.refresh()
+
+    async def refresh_if_stale(self):
+        """Refresh at most once per ``refresh_interval`` across concurrent callers."""
+        if time.monotonic() - self._refreshed < self.refresh_interval:
+            return
+        async with self._lock:
+            if time.monotonic() - self._refreshed >= self.refresh_interval:
+                await self.refresh()
+                self.purge()
+
+
+revocations = RevocationSet(REVOCATION_BLOOM_CAPACITY, REVOCATION_REFRESH_SECONDS)
+
+
+async def revoke_tokens(
+    token_docs: Iterable[dict], effective_at: Optional[datetime.datetime] = None
+):
+    """
+    Append tokens to the revocation feed and to this process's revocation set.
+
+    Args:
+        token_docs (iterable): Token documents; only their ``token`` is used.
+        effective_at (datetime, optional): When the tokens stop being valid.
+            Defaults to now.
+    """
+    effective_at = effective_at or datetime.datetime.now(datetime.UTC)
+    operations = []
+    for token_doc in token_docs:
+        claims = jwt.get_unverified_claims(token_doc["token"])
+        if not claims.get("jti"):
+            # Issued before token IDs existed, only the lookup mode can verify it
+            continue
+        expires_at = datetime.datetime.fromtimestamp(claims["exp"], datetime.UTC)
+        revocations.add(claims["jti"], effective_at.timestamp(), expires_at.timestamp())
+        operations.append(
+            UpdateOne(
+                {"jti": claims["jti"]},
+                {
+                    "$set": {
+                        "user_id": token_doc.get("user_id"),
+                        "effective_at": effective_at,
+                        "expires_at": expires_at,
+                    },
+                    "$currentDate": {"revoked_at": True},
+                },
+                upsert=True,
+            )
+        )
+    if operations:
+        await revocations_collection.bulk_write(operations, ordered=False)
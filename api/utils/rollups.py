@@ -0,0 +1,200 @@
+"""
+Per-user daily rollups of expenses keyed by (user_id, day, category, currency).
+
+Expense writes keep the rollups current with ``$inc``; the analytics pipelines
+read them instead of the raw expenses. ``day`` is the instant at which the local
+day starts in ``TIME_ZONE`` (the value ``$dateTrunc`` produces).
+
+Run ``python -m api.utils.rollups rebuild`` to backfill and
+``python -m api.utils.rollups check`` to compare rollups with the raw expenses.
+"""
+
+import argparse
+import asyncio
+import sys
+from typing import Any, Dict, List, Optional
+
+from pymongo import UpdateOne
+
+from api.utils.aggregations import day_bucket
+from api.utils.db import expenses_collection, mongo, rollups_collection
+from config.config import TIME_ZONE
+
+ROLLUP_FIELDS = ["user_id", "day", "category", "currency"]
+AMOUNT_TOLERANCE = 1e-6
+
+
+def rollup_key(user_id: str, expense: dict) -> Dict[str, Any]:
+    """Return the rollup document key an expense contributes to."""
+    return {
+        "user_id": user_id,
+        "day": day_bucket(expense["date"]),
+        "category": expense["category"],
+        "currency": expense["currency"],
+    }
+
+
+async def apply_expense(user_id: str, expense: dict, sign: int = 1, session=None):
+    """Add (``sign=1``) or remove (``sign=-1``) one expense from its rollup."""
+    key = rollup_key(user_id, expense)
+    await rollups_collection.update_one(
+        key,
+        {"$inc": {"amount": sign * expense["amount"], "count": sign}},
+        upsert=True,
+        session=session,
+    )
+    if sign < 0:
+        await rollups_collection.delete_one(
+            {**key, "count": {"$lte": 0}}, session=session
+        )
+
+
+async def apply_expenses(user_id: str, expenses: List[dict], session=None):
+    """Add many new expenses to their rollups with one bulk write."""
+    increments: Dict[tuple, Dict[str, float]] = {}
+    for expense in expenses:
+        key = tuple(rollup_key(user_id, expense).items())
+        increment = increments.setdefault(key, {"amount": 0.0, "count": 0})
+        increment["amount"] += expense["amount"]
+        increment["count"] += 1
+    if increments:
+        await rollups_collection.bulk_write(
+            [
+                UpdateOne(dict(key), {"$inc": increment}, upsert=True)
+                for key, increment in increments.items()
+            ],
+            ordered=False,
+            session=session,
+        )
+
+
+async def move_expense(user_id: str, old: dict, new: dict, session=None):
+    """Move an updated expense from its old rollup to its new one."""
+    if rollup_key(user_id, old) == rollup_key(user_id, new):
+        if new["amount"] != old["amount"]:
+            await rollups_collection.update_one(
+                rollup_key(user_id, new),
+                {"$inc": {"amount": new["amount"] - old["amount"]}},
+                upsert=True,
+                session=session,
+            )
+        return
+    await apply_expense(user_id, old, -1, session=session)
+    await apply_expense(user_id, new, 1, session=session)
+
+
+async def clear_user(user_id: str, session=None):
+    """Drop every rollup of a user."""
+    await rollups_collection.delete_many({"user_id": user_id}, session=session)
+
+
+def _rollup_pipeline(user_id: Optional[str]) -> List[Dict[str, Any]]:
+    """Group raw expenses into rollup documents."""
+    match = {"user_id": user_id} if user_id else {}
+    return [
+        {"$match": match},
+        {
+            "$group": {
+                "_id": {
+                    "user_id": "$user_id",
+                    "day": {
+                        "$dateTrunc": {
+                            "date": "$date",
+                            "unit": "day",
+                            "timezone": TIME_ZONE,
+                        }
+                    },
+                    "category": "$category",
+                    "currency": "$currency",
+                },
+                "amount": {"$sum": "$amount"},
+                "count": {"$sum": 1},
+            }
+        },
+        {
+            "$project": {
+                "_id": 0,
+                **{field: f"$_id.{field}" for field in ROLLUP_FIELDS},
+                "amount": 1,
+                "count": 1,
+            }
+        },
+    ]
+
+
+async def rebuild(user_id: Optional[str] = None):
+    """Recompute the rollups of one user (or of everybody) from the raw expenses."""
+    await rollups_collection.delete_many({"user_id": user_id} if user_id else {})
+    pipeline = _rollup_pipeline(user_id) + [
+        {
+            "$merge": {
+                "into": rollups_collection.name,
+                "on": ROLLUP_FIELDS,
+                "whenMatched": "replace",
+                "whenNotMatched": "insert",
+            }
+        }
+    ]
+    await expenses_collection.aggregate(pipeline).to_list(None)
+
+
+async def check(user_id: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Compare the stored rollups with a fresh aggregation of the raw expenses.
+
+    Returns:
+        list: One entry per key whose stored amount or count differs.
+    """
+    expected = {
+        tuple(doc[field] for field in ROLLUP_FIELDS): doc
+        for doc in await expenses_collection.aggregate(
+            _rollup_pipeline(user_id)
+        ).to_list(None)
+    }
+    actual = {
+        tuple(doc[field] for field in ROLLUP_FIELDS): doc
+        for doc in await rollups_collection.find(
+            {"user_id": user_id} if user_id else {}
+        ).to_list(None)
+    }
+
+    mismatches = []
+    for key in expected.keys() | actual.keys():
+        want = expected.get(key, {"amount": 0, "count": 0})
+        have = actual.get(key, {"amount": 0, "count": 0})
+        if (
+            abs(want["amount"] - have["amount"]) > AMOUNT_TOLERANCE
+            or want["count"] != have["count"]
+        ):
+            mismatches.append(
+                {
+                    **dict(zip(ROLLUP_FIELDS, key)),
+                    "expected": {"amount": want["amount"], "count": want["count"]},
+                    "actual": {"amount": have["amount"], "count": have["count"]},
+                }
+            )
+    return mismatches
+
+
+async def main(command: str, user_id: Optional[str]) -> int:
+    """Run a rollup maintenance command and return the process exit code."""
+    try:
+        if command == "rebuild":
+            await rebuild(user_id)
+            print("Rollups rebuilt")
+            return 0
+        mismatches = await check(user_id)
+        for mismatch in mismatches:
+            print(mismatch)
+        print(f"{len(mismatches)} inconsistent rollups")
+        return 1 if mismatches else 0
+    finally:
+        mongo.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("command", choices=["rebuild", "check"])
+    parser.add_argument("--user-id", help="limit the command to a single user")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(main(args.command, args.user_id)))
@@ -1,5 +1,7 @@
+import asyncio
 import calendar
 import smtplib
+import time
 from datetime import datetime
 from email.mime.application import MIMEApplication
 from email.mime.multipart import MIMEMultipart
@@ -30,6 +32,9 @@ from config.config import (
 )
 
 TIMEOUT = 10
+# PDF and XLSX exports are built as export jobs, polled until they finish
+EXPORT_JOB_TIMEOUT = 300  # seconds
+EXPORT_JOB_POLL_INTERVAL = 1  # seconds
 
 # States for the conversation
 (
@@ -365,6 +370,49 @@ async def send_email(email: str, files: list, context: dict) -> bool:
         return False
 
 
+async def fetch_export(export_format: str, headers: dict, params: dict) -> bytes:
+    """
+    Build a PDF or XLSX export through the export job API and download it.
+
+    Repeated requests for the same export join the job that is already
+    building it instead of starting another one.
+    """
+    response = requests.post(
+        f"{TELEGRAM_BOT_API_BASE_URL}/exports/jobs",
+        headers=headers,
+        json={"format": export_format, **params},
+        timeout=TIMEOUT,
+    )
+    if response.status_code != 202:
+        raise RuntimeError(response.text)
+    job = response.json()
+
+    deadline = time.monotonic() + EXPORT_JOB_TIMEOUT
+    while job["status"] in ("queued", "running"):
+        if time.monotonic() > deadline:
+            raise RuntimeError("The export is taking too long, please try again later")
+        await asyncio.sleep(EXPORT_JOB_POLL_INTERVAL)
+        response = requests.get(
+            f"{TELEGRAM_BOT_API_BASE_URL}/exports/jobs/{job['job_id']}",
+            headers=headers,
+            timeout=TIMEOUT,
+        )
+        if response.status_code != 200:
+            raise RuntimeError(response.text)
+        job = response.json()
+    if job["status"] != "done":
+        raise RuntimeError(job["error"])
+
+    response = requests.get(
+        f"{TELEGRAM_BOT_API_BASE_URL}{job['download_url']}",
+        headers=headers,
+        timeout=TIMEOUT,
+    )
+    if response.status_code != 200:
+        raise RuntimeError(response.text)
+    return response.content
+
+
 @authenticate
 async def handle_export(
     update: Update, context: ContextTypes.DEFAULT_TYPE, token: str
@@ -390,6 +438,7 @@ async def handle_export(
         headers = {"token": token, "Accept": "application/octet-stream"}
 
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        export_format = None
 
         if export_type.startswith("csv_"):
             export_subtype = export_type[4:]  # get expenses, accounts, etc
@@ -397,11 +446,11 @@ async def handle_export(
             mime_type = "text/csv"
             filename = f"{export_subtype}_{timestamp}.csv"
         elif export_type == "export_pdf":
-            endpoint = "exports/pdf"
+            export_format = "pdf"
             mime_type = "application/pdf"
             filename = f"ultimate_analytics_{timestamp}.pdf"
         elif export_type == "export_excel":
-            endpoint = "exports/xlsx"
+            export_format = "xlsx"
             mime_type = (
                 "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
             )
@@ -409,29 +458,31 @@ async def handle_export(
         elif export_type == "export_email":
             endpoint = "exports/email"
 
-        response = requests.get(
-            f"{TELEGRAM_BOT_API_BASE_URL}/{endpoint}",
-            headers=headers,
-            params=params,  # Now only includes dates if they were selected
-            timeout=TIMEOUT,
-        )
+        if export_format:
+            content = await fetch_export(export_format, headers, params)
+        else:
+            response = requests.get(
+                f"{TELEGRAM_BOT_API_BASE_URL}/{endpoint}",
+                headers=headers,
+                params=params,  # Now only includes dates if they were selected
+                timeout=TIMEOUT,
+            )
+            if response.status_code != 200:
+                await query.message.reply_text(f"❌ Export failed: {response.text}")
+                return
+            content = response.content
 
-        if response.status_code == 200:
-            if export_type == "export_email":
-                await query.message.reply_text(
-                    "✅ Exports have been sent to your email!"
-                )
-            else:
-                await query.message.reply_document(
-                    document=BytesIO(response.content),
-                    filename=filename,
-                    caption="Here's your exported file 📎",
-                    read_timeout=30,
-                    write_timeout=30,
-                    connect_timeout=30,
-                )
+        if export_type == "export_email":
+            await query.message.reply_text("✅ Exports have been sent to your email!")
         else:
-            await query.message.reply_text(f"❌ Export failed: {response.text}")
+            await query.message.reply_document(
+                document=BytesIO(content),
+                filename=filename,
+                caption="Here's your exported file 📎",
+                read_timeout=30,
+                write_timeout=30,
+                connect_timeout=30,
+            )
 
     except Exception as e:
         await query.message.reply_text(f"❌ Error during export: {str(e)}")
@@ -463,25 +514,16 @@ async def handle_email_input(
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         export_files = []
 
-        # Get PDF
-        response = requests.get(
-            f"{TELEGRAM_BOT_API_BASE_URL}/exports/pdf",
-            headers=headers,
-            params=params,
-            timeout=TIMEOUT,
-        )
-        if response.status_code == 200:
-            export_files.append((f"analytics_{timestamp}.pdf", response.content))
-
-        # Get Excel
-        response = requests.get(
-            f"{TELEGRAM_BOT_API_BASE_URL}/exports/xlsx",
-            headers=headers,
-            params=params,
-            timeout=TIMEOUT,
-        )
-        if response.status_code == 200:
-            export_files.append((f"all_data_{timestamp}.xlsx", response.content))
+        # Get PDF and Excel
+        for export_format, filename in [
+            ("pdf", f"analytics_{timestamp}.pdf"),
+            ("xlsx", f"all_data_{timestamp}.xlsx"),
+        ]:
+            try:
+                content = await fetch_export(export_format, headers, params)
+            except RuntimeError:
+                continue
+            export_files.append((filename, content))
 
         # Get CSV files
         csv_types = ["expenses", "accounts", "categories"]
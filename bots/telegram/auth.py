@@ -223,6 +223,17 @@ def authenticate(func):
 
 async def logout(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     user_id = update.effective_user.id
+    # Revoke the API tokens too, not only the bot's copy of them
+    async for user in telegram_collection.find({"telegram_id": user_id}):
+        if user.get("token"):
+            try:
+                requests.delete(
+                    f"{config.TELEGRAM_BOT_API_BASE_URL}/users/token/",
+                    headers={"token": user["token"]},
+                    timeout=TIMEOUT,
+                )
+            except requests.RequestException:
+                pass
     result = await telegram_collection.delete_many({"telegram_id": user_id})
     if result.deleted_count > 0:
         await update.message.reply_text(
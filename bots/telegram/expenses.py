@@ -40,6 +40,46 @@ TIMEOUT = 10  # seconds
 ) = range(12)
 
 
+def fetch_expenses_page(
+    token: str,
+    context: ContextTypes.DEFAULT_TYPE,
+    page: int,
+    items_per_page: int,
+    cursor_key: str,
+):
+    """
+    Fetch a single page of expenses using the API's keyset cursors.
+
+    The cursor of every page visited so far is kept in ``context.user_data``
+    under ``cursor_key`` so only the rows that are shown are requested.
+
+    Returns:
+        tuple: The API response, the page actually fetched and the number of
+        pages known so far (one more than the current page if there is a next one).
+    """
+    cursors = context.user_data.get(cursor_key) if page > 1 else None
+    if not cursors:
+        cursors = [None]
+    page = max(1, min(page, len(cursors)))
+
+    params = {"limit": items_per_page}
+    if cursors[page - 1]:
+        params["cursor"] = cursors[page - 1]
+    response = requests.get(
+        f"{TELEGRAM_BOT_API_BASE_URL}/expenses/",
+        headers={"token": token},
+        params=params,
+        timeout=TIMEOUT,
+    )
+    if response.status_code == 200:
+        next_cursor = response.json().get("next_cursor")
+        del cursors[page:]
+        if next_cursor:
+            cursors.append(next_cursor)
+        context.user_data[cursor_key] = cursors
+    return response, page, len(cursors)
+
+
 @authenticate
 async def expenses_add(
     update: Update, context: ContextTypes.DEFAULT_TYPE, token: str
@@ -74,11 +114,36 @@ async def fetch_and_show_categories(
 ) -> None:
     """Fetch and display categories for the user to select."""
     headers = {"token": token}
-    response = requests.get(
-        f"{TELEGRAM_BOT_API_BASE_URL}/categories/", headers=headers, timeout=TIMEOUT
+    categories = None
+    # Fetch the categories, currencies and accounts of the next steps at once
+    response = requests.post(
+        f"{TELEGRAM_BOT_API_BASE_URL}/batch/",
+        headers=headers,
+        json={
+            "requests": [
+                {"method": "GET", "path": "/categories/"},
+                {"method": "GET", "path": "/users/"},
+                {"method": "GET", "path": "/accounts/"},
+            ]
+        },
+        timeout=TIMEOUT,
     )
-    if response.status_code == 200:
-        categories = response.json().get("categories", [])
+    results = response.json()["results"] if response.status_code == 200 else []
+    if results and all(result["status"] == 200 for result in results):
+        categories = results[0]["body"].get("categories", [])
+        context.user_data["currencies"] = results[1]["body"].get("currencies", [])
+        context.user_data["accounts"] = results[2]["body"].get("accounts", [])
+    else:
+        # Fall back to the categories alone; the next steps fetch their own data
+        context.user_data.pop("currencies", None)
+        context.user_data.pop("accounts", None)
+        response = requests.get(
+            f"{TELEGRAM_BOT_API_BASE_URL}/categories/", headers=headers, timeout=TIMEOUT
+        )
+        if response.status_code == 200:
+            categories = response.json().get("categories", [])
+
+    if categories is not None:
         if not categories:
             message = "No categories found."
             if update.message:
@@ -122,12 +187,15 @@ async def fetch_and_show_currencies(
     update: Update, context: ContextTypes.DEFAULT_TYPE, token: str
 ) -> None:
     """Fetch and display currencies for the user to select."""
-    headers = {"token": token}
-    response = requests.get(
-        f"{TELEGRAM_BOT_API_BASE_URL}/users/", headers=headers, timeout=TIMEOUT
-    )
-    if response.status_code == 200:
-        currencies = response.json().get("currencies", [])
+    currencies = context.user_data.pop("currencies", None)
+    if currencies is None:
+        headers = {"token": token}
+        response = requests.get(
+            f"{TELEGRAM_BOT_API_BASE_URL}/users/", headers=headers, timeout=TIMEOUT
+        )
+        if response.status_code == 200:
+            currencies = response.json().get("currencies", [])
+    if currencies is not None:
         if not currencies:
             await update.callback_query.message.edit_text("No currencies found.")
             return
@@ -158,12 +226,15 @@ async def fetch_and_show_accounts(
     update: Update, context: ContextTypes.DEFAULT_TYPE, token: str
 ) -> None:
     """Fetch and display accounts for the user to select."""
-    headers = {"token": token}
-    response = requests.get(
-        f"{TELEGRAM_BOT_API_BASE_URL}/accounts/", headers=headers, timeout=TIMEOUT
-    )
-    if response.status_code == 200:
-        accounts = response.json().get("accounts", [])
+    accounts = context.user_data.pop("accounts", None)
+    if accounts is None:
+        headers = {"token": token}
+        response = requests.get(
+            f"{TELEGRAM_BOT_API_BASE_URL}/accounts/", headers=headers, timeout=TIMEOUT
+        )
+        if response.status_code == 200:
+            accounts = response.json().get("accounts", [])
+    if accounts is not None:
         if not accounts:
             await update.callback_query.message.edit_text("No accounts found.")
             return
@@ -295,30 +366,24 @@ async def expenses_view(
     update: Update, context: ContextTypes.DEFAULT_TYPE, token: str
 ) -> None:
     """View the list of expenses with pagination."""
-    headers = {"token": token}
-    response = requests.get(
-        f"{TELEGRAM_BOT_API_BASE_URL}/expenses/", headers=headers, timeout=TIMEOUT
+    page = int(context.args[0]) if context.args else 1
+    items_per_page = 5
+    response, page, total_pages = fetch_expenses_page(
+        token, context, page, items_per_page, "view_cursors"
     )
     if response.status_code == 200:
-        expenses = response.json()["expenses"]
-        if not expenses:
+        expenses_page = response.json()["expenses"]
+        if not expenses_page:
             await update.message.reply_text("No expenses found.")
             return
 
         # Pagination setup
-        page = int(context.args[0]) if context.args else 1
-        items_per_page = 5
         paginator = InlineKeyboardPaginator(
-            len(expenses) // items_per_page
-            + (1 if len(expenses) % items_per_page else 0),
+            total_pages,
             current_page=page,
             data_pattern="view_expenses#{page}",
         )
 
-        start_idx = (page - 1) * items_per_page
-        end_idx = start_idx + items_per_page
-        expenses_page = expenses[start_idx:end_idx]
-
         message = "💰 *Your Expenses:*\n\n"
         for expense in expenses_page:
             # Convert date to human-readable format, handling datetime strings with time components
@@ -369,13 +434,14 @@ async def expenses_delete(
     update: Update, context: ContextTypes.DEFAULT_TYPE, token: str
 ) -> int:
     """Start the expense deletion process."""
-    headers = {"token": token}
-    response = requests.get(
-        f"{TELEGRAM_BOT_API_BASE_URL}/expenses/", headers=headers, timeout=TIMEOUT
+    page = int(context.args[0]) if context.args else 1
+    items_per_page = 2
+    response, page, total_pages = fetch_expenses_page(
+        token, context, page, items_per_page, "delete_cursors"
     )
     if response.status_code == 200:
-        expenses = response.json()["expenses"]
-        if not expenses:
+        expenses_page = response.json()["expenses"]
+        if not expenses_page:
             message = "No expenses found to delete."
             if update.message:
                 await update.message.reply_text(message)
@@ -383,29 +449,22 @@ async def expenses_delete(
                 await update.callback_query.message.edit_text(message)
             return ConversationHandler.END
 
-        # Pagination setup
-        page = int(context.args[0]) if context.args else 1
-        items_per_page = 2
-        total_pages = len(expenses) // items_per_page + (
-            1 if len(expenses) % items_per_page else 0
-        )
-
         # Create pagination buttons manually
         pagination_buttons = []
         if total_pages > 1:
             if page > 1:
                 pagination_buttons.append(
-                    InlineKeyboardButton("⬅️", callback_data=f"delete_expenses#{page-1}")
+                    InlineKeyboardButton(
+                        "⬅️", callback_data=f"delete_expenses#{page-1}"
+                    )
                 )
             if page < total_pages:
                 pagination_buttons.append(
-                    InlineKeyboardButton("➡️", callback_data=f"delete_expenses#{page+1}")
+                    InlineKeyboardButton(
+                        "➡️", callback_data=f"delete_expenses#{page+1}"
+                    )
                 )
 
-        start_idx = (page - 1) * items_per_page
-        end_idx = start_idx + items_per_page
-        expenses_page = expenses[start_idx:end_idx]
-
         keyboard = []
         for expense in expenses_page:
             button_text = (
@@ -506,7 +565,10 @@ async def expenses_delete_all(
     """Start the process to delete all expenses."""
     headers = {"token": token}
     response = requests.get(
-        f"{TELEGRAM_BOT_API_BASE_URL}/expenses/", headers=headers, timeout=TIMEOUT
+        f"{TELEGRAM_BOT_API_BASE_URL}/expenses/",
+        headers=headers,
+        params={"limit": 1},
+        timeout=TIMEOUT,
     )
     if response.status_code == 200:
         expenses = response.json()["expenses"]
@@ -514,7 +576,6 @@ async def expenses_delete_all(
             await update.message.reply_text("No expenses found to delete.")
             return ConversationHandler.END
 
-        total_expenses = len(expenses)
         keyboard = [
             [
                 InlineKeyboardButton("Yes", callback_data="confirm_delete_all"),
@@ -523,7 +584,7 @@ async def expenses_delete_all(
         ]
         reply_markup = InlineKeyboardMarkup(keyboard)
         await update.message.reply_text(
-            f"⚠️ Are you sure you want to delete all {total_expenses} expenses? This action cannot be undone!",
+            "⚠️ Are you sure you want to delete all your expenses? This action cannot be undone!",
             reply_markup=reply_markup,
         )
         return DELETE_ALL_CONFIRM
@@ -562,40 +623,34 @@ async def expenses_update(
     update: Update, context: ContextTypes.DEFAULT_TYPE, token: str
 ) -> int:
     """Start the expense update process by showing list of expenses."""
-    headers = {"token": token}
-    response = requests.get(
-        f"{TELEGRAM_BOT_API_BASE_URL}/expenses/", headers=headers, timeout=TIMEOUT
+    page = int(context.args[0]) if context.args else 1
+    items_per_page = 5
+    response, page, total_pages = fetch_expenses_page(
+        token, context, page, items_per_page, "update_cursors"
     )
 
     if response.status_code == 200:
-        expenses = response.json()["expenses"]
-        if not expenses:
+        expenses_page = response.json()["expenses"]
+        if not expenses_page:
             await update.message.reply_text("No expenses found to update.")
             return ConversationHandler.END
 
-        # Pagination setup
-        page = int(context.args[0]) if context.args else 1
-        items_per_page = 5
-        total_pages = len(expenses) // items_per_page + (
-            1 if len(expenses) % items_per_page else 0
-        )
-
         # Create pagination buttons
         pagination_buttons = []
         if total_pages > 1:
             if page > 1:
                 pagination_buttons.append(
-                    InlineKeyboardButton("⬅️", callback_data=f"update_expenses#{page-1}")
+                    InlineKeyboardButton(
+                        "⬅️", callback_data=f"update_expenses#{page-1}"
+                    )
                 )
             if page < total_pages:
                 pagination_buttons.append(
-                    InlineKeyboardButton("➡️", callback_data=f"update_expenses#{page+1}")
+                    InlineKeyboardButton(
+                        "➡️", callback_data=f"update_expenses#{page+1}"
+                    )
                 )
 
-        start_idx = (page - 1) * items_per_page
-        end_idx = start_idx + items_per_page
-        expenses_page = expenses[start_idx:end_idx]
-
         keyboard = []
         for expense in expenses_page:
             button_text = (
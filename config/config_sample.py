@@ -9,10 +9,75 @@ MONGO_URI = os.getenv(
     "MONGO_URI",
     "mongodb://localhost:27017",
 )
+MONGO_DB_NAME = os.getenv("MONGO_DB_NAME", "mmdb")
+
+# Connection pool settings shared by every request handled by one API process
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "0"))
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "100"))
+MONGO_MAX_IDLE_TIME_MS = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "60000"))
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "5000"))
+MONGO_CONNECT_TIMEOUT_MS = int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "5000"))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(
+    os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000")
+)
+
+# Create the declared indexes and fail startup if a hot query would COLLSCAN
+MONGO_ENSURE_INDEXES = os.getenv("MONGO_ENSURE_INDEXES", "true").lower() == "true"
+MONGO_VERIFY_INDEXES = os.getenv("MONGO_VERIFY_INDEXES", "true").lower() == "true"
 
 TOKEN_SECRET_KEY = os.getenv("TOKEN_SECRET_KEY", "")
 TOKEN_ALGORITHM = os.getenv("TOKEN_ALGORITHM", "HS256")
 
+# Verified tokens are cached per API process for at most this many seconds
+# (never past their expiry); 0 disables the cache
+TOKEN_CACHE_TTL_SECONDS = float(os.getenv("TOKEN_CACHE_TTL_SECONDS", "60"))
+TOKEN_CACHE_MAX_SIZE = int(os.getenv("TOKEN_CACHE_MAX_SIZE", "10000"))
+
+# User documents are cached per API process for at most this many seconds;
+# 0 disables the cache
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", "30"))
+USER_CACHE_MAX_SIZE = int(os.getenv("USER_CACHE_MAX_SIZE", "10000"))
+
+# "lookup" checks every token against the tokens collection; "stateless" trusts
+# the signature and expiry and only checks the in-memory revocation set
+AUTH_MODE = os.getenv("AUTH_MODE", "lookup").lower()
+REVOCATION_REFRESH_SECONDS = float(os.getenv("REVOCATION_REFRESH_SECONDS", "5"))
+REVOCATION_BLOOM_CAPACITY = int(os.getenv("REVOCATION_BLOOM_CAPACITY", "100000"))
+
+# ECB rate history (CSV or zipped CSV); empty uses the file bundled with the
+# currencyconverter package. A replaced file is picked up within the interval.
+CURRENCY_RATES_FILE = os.getenv("CURRENCY_RATES_FILE", "")
+CURRENCY_RELOAD_SECONDS = float(os.getenv("CURRENCY_RELOAD_SECONDS", "60"))
+# The rate file is compiled to a day x currency matrix in this directory and
+# memory-mapped by every API worker; empty keeps one matrix in memory per worker.
+# Use a directory only the API's user can write to
+CURRENCY_MATRIX_DIR = os.getenv("CURRENCY_MATRIX_DIR", "")
+# Analytics and exports total mixed-currency expenses in this currency unless
+# the request passes report_currency
+REPORT_CURRENCY = os.getenv("REPORT_CURRENCY", "USD")
+
+# Charts are rendered by this many worker processes (0 renders in threads of
+# the API process); at most RENDER_MAX_PENDING renders are queued at a time
+RENDER_WORKERS = int(os.getenv("RENDER_WORKERS", "2"))
+RENDER_MAX_PENDING = int(os.getenv("RENDER_MAX_PENDING", "16"))
+# Rendered charts are kept in an in-memory LRU of this many entries per API
+# process (0 disables it) and, if a directory is set, on disk as well, where
+# at most CHART_CACHE_DISK_MAX_FILES are kept
+CHART_CACHE_MAX_SIZE = int(os.getenv("CHART_CACHE_MAX_SIZE", "512"))
+CHART_CACHE_DIR = os.getenv("CHART_CACHE_DIR", "")
+CHART_CACHE_DISK_MAX_FILES = int(os.getenv("CHART_CACHE_DISK_MAX_FILES", "10000"))
+
+# Export jobs are built by at most EXPORT_JOB_WORKERS tasks per API process,
+# which accepts at most EXPORT_JOB_MAX_PENDING jobs at a time. Artifacts are
+# kept in EXPORT_JOBS_DIR (empty uses a directory under /tmp; API processes on
+# several hosts must share it) for EXPORT_JOB_TTL_SECONDS. A job whose status
+# was not updated for EXPORT_JOB_STALE_SECONDS is assumed lost and restarted
+EXPORT_JOB_WORKERS = int(os.getenv("EXPORT_JOB_WORKERS", "2"))
+EXPORT_JOB_MAX_PENDING = int(os.getenv("EXPORT_JOB_MAX_PENDING", "32"))
+EXPORT_JOBS_DIR = os.getenv("EXPORT_JOBS_DIR", "")
+EXPORT_JOB_TTL_SECONDS = float(os.getenv("EXPORT_JOB_TTL_SECONDS", "3600"))
+EXPORT_JOB_STALE_SECONDS = float(os.getenv("EXPORT_JOB_STALE_SECONDS", "900"))
+
 API_BIND_HOST = os.getenv("API_BIND_HOST", "0.0.0.0")
 API_BIND_PORT = int(os.getenv("API_BIND_PORT", "9999"))
 
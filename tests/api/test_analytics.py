@@ -1,9 +1,23 @@
-from datetime import datetime, timedelta
+import json
+from datetime import date, datetime, timedelta
 
+import pandas as pd
 import pytest
 from httpx import AsyncClient
 
 from api.app import app
+from api.routers.analytics import series_payload
+from api.utils.aggregations import (
+    ExpenseFrame,
+    RunningTotals,
+    category_totals,
+    downsample,
+    expense_totals,
+    group_expenses,
+)
+from api.utils.currency import currency_service
+from api.utils.db import expenses_collection
+from api.utils.plots import budget_vs_actual_series
 
 
 @pytest.mark.anyio
@@ -276,3 +290,325 @@ class TestAnalyticsDateValidation:
         )
         assert response.status_code == 404
         assert response.json()["detail"] == "No expenses found"
+
+
+class TestGroupExpenses:
+    expenses = [
+        {"date": datetime(2024, 1, 15, 12), "amount": 10.0, "category": "Food"},
+        {"date": datetime(2024, 1, 15, 18), "amount": 5.0, "category": "Transport"},
+        {"date": datetime(2024, 2, 1, 12), "amount": 7.5, "category": "Food"},
+    ]
+
+    def test_by_day(self):
+        totals = group_expenses(self.expenses, "day")
+        assert list(totals) == [15.0, 7.5]
+
+    def test_by_month(self):
+        totals = group_expenses(self.expenses, "month")
+        assert [str(month) for month in totals.index] == ["2024-01", "2024-02"]
+        assert list(totals) == [15.0, 7.5]
+
+    def test_by_category(self):
+        totals = group_expenses(self.expenses, "category")
+        assert totals.to_dict() == {"Food": 17.5, "Transport": 5.0}
+
+    def test_report_currency(self):
+        expenses = [
+            {**self.expenses[0], "currency": "INR"},
+            {**self.expenses[2], "currency": "USD"},
+        ]
+        totals = group_expenses(expenses, "category", "USD")
+        # Converted at the rate of the expense's own day
+        assert totals["Food"] == pytest.approx(
+            currency_service.convert_one(10.0, "INR", "USD", datetime(2024, 1, 15))
+            + 7.5
+        )
+
+
+class TestExpenseFrame:
+    def test_matches_group_expenses(self):
+        frame = ExpenseFrame.from_documents(TestGroupExpenses.expenses)
+        for unit in ("day", "month", "category"):
+            assert (
+                frame.totals(unit).to_dict()
+                == group_expenses(TestGroupExpenses.expenses, unit).to_dict()
+            )
+        assert len(frame) == 3
+
+    def test_first_and_last_date(self):
+        frame = ExpenseFrame.from_documents(TestGroupExpenses.expenses)
+        assert frame.first_date == datetime(2024, 1, 15).date()
+        assert frame.last_date == datetime(2024, 2, 1).date()
+        assert ExpenseFrame.from_documents([]).first_date is None
+
+    def test_rows_without_date(self):
+        expenses = TestGroupExpenses.expenses + [
+            {"date": None, "amount": 2.0, "category": "Food"}
+        ]
+        frame = ExpenseFrame.from_documents(expenses)
+        assert frame.totals("category")["Food"] == 19.5
+        assert frame.totals("day").sum() == 22.5
+
+
+class TestRunningTotals:
+    def test_matches_one_frame(self):
+        expenses = TestGroupExpenses.expenses
+        whole = ExpenseFrame.from_documents(expenses)
+        totals = RunningTotals()
+        for expense in expenses:
+            totals.add(ExpenseFrame.from_documents([expense]))
+        for unit in ("day", "month", "category"):
+            assert totals.totals(unit).to_dict() == whole.totals(unit).to_dict()
+        assert len(totals) == 3
+        assert totals.first_date == whole.first_date
+        assert totals.last_date == whole.last_date
+
+    def test_empty(self):
+        totals = RunningTotals()
+        assert not totals
+        assert totals.totals("day").empty
+        assert totals.first_date is None
+
+    def test_converts_once(self, monkeypatch):
+        calls = []
+        convert = currency_service.convert
+
+        def counting_convert(*args, **kwargs):
+            calls.append(args)
+            return convert(*args, **kwargs)
+
+        monkeypatch.setattr(currency_service, "convert", counting_convert)
+        expenses = [
+            {**expense, "currency": "INR"} for expense in TestGroupExpenses.expenses
+        ]
+        frame = ExpenseFrame.from_documents(expenses, "USD")
+        for unit in ("day", "month", "category"):
+            frame.totals(unit)
+        assert len(calls) == 1
+
+
+@pytest.mark.anyio
+class TestReportCurrency:
+    async def test_mixed_currencies(self, async_client_auth: AsyncClient):
+        await async_client_auth.post(
+            "/expenses/",
+            json={
+                "amount": 1000.0,
+                "currency": "INR",
+                "category": "Food",
+                "description": "Report currency",
+                "account_name": "Savings",
+                "date": "2020-03-01T12:00:00",
+            },
+        )
+        user_id = (await async_client_auth.get("/users/")).json()["_id"]
+        totals = await category_totals(
+            user_id, datetime(2020, 3, 1).date(), datetime(2020, 3, 1).date(), "EUR"
+        )
+        assert totals.totals["Food"] == pytest.approx(
+            currency_service.convert_one(1000.0, "INR", "EUR", datetime(2020, 3, 1))
+        )
+
+        response = await async_client_auth.get(
+            "/analytics/category/pie",
+            params={"from_date": "2020-03-01", "report_currency": "eur"},
+        )
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "image/png"
+
+    async def test_unsupported_currency(self, async_client_auth: AsyncClient):
+        response = await async_client_auth.get(
+            "/analytics/expense/bar", params={"report_currency": "XYZ"}
+        )
+        assert response.status_code == 400
+        assert response.json()["detail"] == "Unsupported report currency: XYZ"
+
+
+@pytest.mark.anyio
+class TestServerAggregation:
+    async def test_matches_in_memory_grouping(self, async_client_auth: AsyncClient):
+        user_id = (await async_client_auth.get("/users/")).json()["_id"]
+        expenses = await expenses_collection.find({"user_id": user_id}).to_list(None)
+
+        daily = await expense_totals(user_id, None, None, "day")
+        monthly = await expense_totals(user_id, None, None, "month")
+        categories = await category_totals(user_id, None, None)
+
+        assert daily.to_dict() == group_expenses(expenses, "day").to_dict()
+        assert monthly.to_dict() == group_expenses(expenses, "month").to_dict()
+        assert (
+            categories.totals.to_dict()
+            == group_expenses(expenses, "category").to_dict()
+        )
+
+
+@pytest.mark.anyio
+class TestChartCaching:
+    async def test_not_modified_until_write(self, async_client_auth: AsyncClient):
+        response = await async_client_auth.get("/analytics/category/pie")
+        assert response.status_code == 200
+        etag = response.headers["etag"]
+
+        response = await async_client_auth.get(
+            "/analytics/category/pie", headers={"If-None-Match": etag}
+        )
+        assert response.status_code == 304
+        assert response.content == b""
+
+        response = await async_client_auth.post(
+            "/expenses/",
+            json={
+                "amount": 5.0,
+                "currency": "USD",
+                "category": "Food",
+                "description": "Snack",
+                "account_name": "Checking",
+            },
+        )
+        assert response.status_code == 200, response.json()
+
+        response = await async_client_auth.get(
+            "/analytics/category/pie", headers={"If-None-Match": etag}
+        )
+        assert response.status_code == 200
+        assert response.headers["etag"] != etag
+
+
+class TestDataPayloads:
+    def test_series_payload(self):
+        totals = group_expenses(TestGroupExpenses.expenses, "month")
+        assert json.loads(series_payload(totals, "USD")) == {
+            "currency": "USD",
+            "labels": ["2024-01", "2024-02"],
+            "values": [15.0, 7.5],
+            "total": 22.5,
+        }
+
+    def test_budget_vs_actual_series(self):
+        totals = group_expenses(TestGroupExpenses.expenses, "category")
+        labels, actuals, budgets = budget_vs_actual_series(
+            totals,
+            {"Rent": {"monthly_budget": 300.0}, "Food": {"monthly_budget": 60.0}},
+            datetime(2024, 1, 1).date(),
+            datetime(2024, 1, 15).date(),
+        )
+        assert labels == ["Food", "Rent", "Transport"]
+        assert actuals == [17.5, 0.0, 5.0]
+        assert budgets == [30.0, 150.0, 0.0]
+
+
+class TestDownsample:
+    daily = pd.Series(
+        1.0,
+        index=pd.Index(
+            [date(2024, 1, 1) + timedelta(days=day) for day in range(0, 400, 2)],
+            dtype="object",
+        ),
+    )
+
+    def test_auto_keeps_days_when_few(self):
+        unit, totals = downsample(self.daily[:30])
+        assert unit == "day"
+        assert totals.equals(self.daily[:30])
+
+    def test_auto_moves_to_weeks_then_months(self):
+        unit, totals = downsample(self.daily)
+        assert unit == "week"
+        assert len(totals) == 57
+        # Weeks are labelled with their Monday
+        assert all(label.weekday() == 0 for label in totals.index)
+        assert totals.sum() == self.daily.sum()
+
+        unit, totals = downsample(self.daily, max_buckets=20)
+        assert unit == "month"
+        assert str(totals.index[0]) == "2024-01"
+        assert totals.sum() == self.daily.sum()
+
+    def test_explicit_granularity(self):
+        unit, totals = downsample(self.daily, "day", max_buckets=10)
+        assert unit == "day"
+        assert len(totals) == len(self.daily)
+        assert downsample(self.daily, "month")[0] == "month"
+
+    def test_series_payload_granularity(self):
+        _, totals = downsample(self.daily[:14], "week")
+        payload = json.loads(series_payload(totals, "USD", granularity="week"))
+        assert payload["granularity"] == "week"
+        assert payload["labels"][:2] == ["2024-01-01", "2024-01-08"]
+
+
+@pytest.mark.anyio
+class TestChartData:
+    async def test_data_endpoints(self, async_client_auth: AsyncClient):
+        for endpoint in [
+            "/analytics/expense/bar/data",
+            "/analytics/expense/line-monthly/data",
+            "/analytics/category/pie/data",
+            "/analytics/category/bar/data",
+        ]:
+            response = await async_client_auth.get(endpoint)
+            assert response.status_code == 200, endpoint
+            data = response.json()
+            assert data["currency"] == "USD"
+            assert len(data["labels"]) == len(data["values"]) > 0
+            assert data["total"] == pytest.approx(sum(data["values"]))
+
+        response = await async_client_auth.get(
+            "/analytics/budget/actual-vs-budget/data"
+        )
+        assert response.status_code == 200
+        data = response.json()
+        assert len(data["labels"]) == len(data["actual"]) == len(data["budget"])
+
+    async def test_data_matches_chart_totals(self, async_client_auth: AsyncClient):
+        user_id = (await async_client_auth.get("/users/")).json()["_id"]
+        totals = (await category_totals(user_id, None, None, "USD")).totals
+        response = await async_client_auth.get("/analytics/category/pie/data")
+        data = response.json()
+        assert dict(zip(data["labels"], data["values"])) == pytest.approx(
+            totals.round(2).to_dict()
+        )
+
+    async def test_no_data(self, async_client_auth: AsyncClient):
+        future_date = (datetime.now() + timedelta(days=365)).date().isoformat()
+        response = await async_client_auth.get(
+            "/analytics/expense/bar/data", params={"from_date": future_date}
+        )
+        assert response.status_code == 404
+        assert response.json()["detail"] == "No expenses found"
+
+    async def test_bar_granularity(self, async_client_auth: AsyncClient):
+        daily = (await async_client_auth.get("/analytics/expense/bar/data")).json()
+        assert daily["granularity"] == "day"
+        response = await async_client_auth.get(
+            "/analytics/expense/bar/data", params={"granularity": "month"}
+        )
+        assert response.status_code == 200
+        monthly = response.json()
+        assert monthly["granularity"] == "month"
+        assert monthly["total"] == pytest.approx(daily["total"])
+
+        response = await async_client_auth.get(
+            "/analytics/expense/bar", params={"granularity": "week"}
+        )
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "image/png"
+
+        response = await async_client_auth.get(
+            "/analytics/expense/bar", params={"granularity": "year"}
+        )
+        assert response.status_code == 422
+
+    async def test_svg_format(self, async_client_auth: AsyncClient):
+        response = await async_client_auth.get(
+            "/analytics/category/bar", params={"format": "svg"}
+        )
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "image/svg+xml"
+        assert response.content.startswith(b"<?xml")
+
+    async def test_unsupported_format(self, async_client_auth: AsyncClient):
+        response = await async_client_auth.get(
+            "/analytics/category/bar", params={"format": "gif"}
+        )
+        assert response.status_code == 422
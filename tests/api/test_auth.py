@@ -0,0 +1,138 @@
+import datetime
+import time
+import uuid
+
+import pytest
+from fastapi import HTTPException
+from jose import jwt
+
+import api.utils.auth
+from api.utils.auth import TokenCache, token_expiry, verify_token
+from api.utils.revocations import BloomFilter, RevocationSet
+from config.config import TOKEN_ALGORITHM, TOKEN_SECRET_KEY
+
+
+class TestTokenCache:
+    def test_put_and_get(self):
+        cache = TokenCache(max_size=10, ttl=60)
+        cache.put("token-a", "user-1")
+        assert cache.get("token-a") == "user-1"
+        assert cache.get("token-b") is None
+
+    def test_keys_are_hashed(self):
+        cache = TokenCache(max_size=10, ttl=60)
+        cache.put("secret-token", "user-1")
+        assert "secret-token" not in cache._entries
+
+    def test_capped_by_expiry(self):
+        cache = TokenCache(max_size=10, ttl=60)
+        cache.put("token-a", "user-1", expires=time.time() - 1)
+        assert cache.get("token-a") is None
+        assert len(cache) == 0
+
+    def test_lru_eviction(self):
+        cache = TokenCache(max_size=2, ttl=60)
+        cache.put("token-a", "user-1")
+        cache.put("token-b", "user-2")
+        cache.get("token-a")
+        cache.put("token-c", "user-3")
+        assert cache.get("token-b") is None
+        assert cache.get("token-a") == "user-1"
+        assert cache.get("token-c") == "user-3"
+
+    def test_evict(self):
+        cache = TokenCache(max_size=10, ttl=60)
+        cache.put("token-a", "user-1")
+        cache.put("token-b", "user-1")
+        cache.put("token-c", "user-2")
+        cache.evict("token-a")
+        assert cache.get("token-a") is None
+        cache.evict_user("user-1")
+        assert cache.get("token-b") is None
+        assert cache.get("token-c") == "user-2"
+
+    def test_disabled(self):
+        cache = TokenCache(max_size=10, ttl=0)
+        cache.put("token-a", "user-1")
+        assert cache.get("token-a") is None
+
+
+def test_token_expiry_uses_earliest_deadline():
+    expires_at = datetime.datetime(2030, 1, 1)
+    payload = {"exp": datetime.datetime(2031, 1, 1).timestamp()}
+    assert token_expiry(payload, {"expires_at": expires_at}) == (
+        expires_at.replace(tzinfo=datetime.timezone.utc).timestamp()
+    )
+    assert token_expiry({}, {}) is None
+
+
+class TestBloomFilter:
+    def test_no_false_negatives(self):
+        bloom = BloomFilter(capacity=1000)
+        items = [uuid.uuid4().hex for _ in range(1000)]
+        for item in items:
+            bloom.add(item)
+        assert all(item in bloom for item in items)
+
+    def test_false_positive_rate(self):
+        bloom = BloomFilter(capacity=1000, error_rate=0.01)
+        for _ in range(1000):
+            bloom.add(uuid.uuid4().hex)
+        false_positives = sum(uuid.uuid4().hex in bloom for _ in range(10000))
+        assert false_positives < 300
+
+
+class TestRevocationSet:
+    def test_revoked_from_effective_time(self):
+        revoked = RevocationSet(capacity=10, refresh_interval=60)
+        now = time.time()
+        revoked.add("jti-1", now - 1, now + 3600)
+        revoked.add("jti-2", now + 60, now + 3600)
+        assert revoked.is_revoked("jti-1")
+        assert not revoked.is_revoked("jti-2")
+        assert revoked.is_revoked("jti-2", now=now + 61)
+        assert not revoked.is_revoked("jti-3")
+
+    def test_grows_past_capacity(self):
+        revoked = RevocationSet(capacity=2, refresh_interval=60)
+        for i in range(10):
+            revoked.add(f"jti-{i}", 0, time.time() + 3600)
+        assert all(revoked.is_revoked(f"jti-{i}") for i in range(10))
+
+    def test_purge(self):
+        revoked = RevocationSet(capacity=10, refresh_interval=60)
+        revoked.add("expired", 0, time.time() - 1)
+        revoked.add("live", 0, time.time() + 3600)
+        revoked.purge()
+        assert len(revoked) == 1
+        assert revoked.is_revoked("live")
+
+
+@pytest.mark.anyio
+class TestStatelessMode:
+    @pytest.fixture
+    def stateless(self, monkeypatch):
+        revoked = RevocationSet(capacity=10, refresh_interval=3600)
+        revoked._refreshed = time.monotonic()
+        monkeypatch.setattr(api.utils.auth, "AUTH_MODE", "stateless")
+        monkeypatch.setattr(api.utils.auth, "revocations", revoked)
+        return revoked
+
+    @staticmethod
+    def make_token(jti: str) -> str:
+        expire = datetime.datetime.now(datetime.UTC) + datetime.timedelta(minutes=5)
+        return jwt.encode(
+            {"sub": "507f1f77bcf86cd799439011", "exp": expire, "jti": jti},
+            TOKEN_SECRET_KEY,
+            algorithm=TOKEN_ALGORITHM,
+        )
+
+    async def test_accepts_signed_token(self, stateless):
+        token = self.make_token("live")
+        assert await verify_token(token) == "507f1f77bcf86cd799439011"
+
+    async def test_rejects_revoked_token(self, stateless):
+        stateless.add("revoked", 0, time.time() + 3600)
+        with pytest.raises(HTTPException) as exc_info:
+            await verify_token(self.make_token("revoked"))
+        assert exc_info.value.detail == "Token has been revoked"
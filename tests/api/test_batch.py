@@ -0,0 +1,101 @@
+import pytest
+from httpx import AsyncClient
+
+from api.routers.batch import is_batch_path
+
+
+@pytest.mark.anyio
+class TestBatch:
+    async def test_reads_and_write(self, async_client_auth: AsyncClient):
+        response = await async_client_auth.post(
+            "/batch/",
+            json={
+                "requests": [
+                    {"method": "GET", "path": "/categories/"},
+                    {"method": "GET", "path": "/accounts/"},
+                    {
+                        "method": "POST",
+                        "path": "/expenses/",
+                        "body": {
+                            "amount": 1.0,
+                            "currency": "USD",
+                            "category": "Food",
+                            "account_name": "Checking",
+                        },
+                    },
+                    {"method": "GET", "path": "/expenses/", "params": {"limit": 1}},
+                ]
+            },
+        )
+        assert response.status_code == 200, response.json()
+        results = response.json()["results"]
+        assert [result["status"] for result in results] == [200, 200, 200, 200]
+        assert "categories" in results[0]["body"]
+        assert "accounts" in results[1]["body"]
+        created = results[2]["body"]["expense"]
+        # The read after the write sees the new expense
+        assert results[3]["body"]["expenses"][0]["_id"] == created["_id"]
+
+    async def test_sub_request_error(self, async_client_auth: AsyncClient):
+        response = await async_client_auth.post(
+            "/batch/",
+            json={
+                "requests": [
+                    {"method": "GET", "path": "/expenses/507f1f77bcf86cd799439011"}
+                ]
+            },
+        )
+        assert response.status_code == 200
+        result = response.json()["results"][0]
+        assert result["status"] == 404
+        assert result["body"]["detail"] == "Expense not found"
+
+    async def test_binary_body(self, async_client_auth: AsyncClient):
+        response = await async_client_auth.post(
+            "/batch/",
+            json={"requests": [{"method": "GET", "path": "/analytics/expense/bar"}]},
+        )
+        result = response.json()["results"][0]
+        assert result["status"] == 200
+        assert result["encoding"] == "base64"
+
+    async def test_nested(self, async_client_auth: AsyncClient):
+        response = await async_client_auth.post(
+            "/batch/", json={"requests": [{"method": "GET", "path": "/batch/"}]}
+        )
+        assert response.status_code == 400
+        assert response.json()["detail"] == "Batches cannot be nested"
+
+    @pytest.mark.parametrize(
+        "path", ["/batch/?x=1", "/batch?x=1", "/batch//", "//batch", "/%62atch/"]
+    )
+    async def test_nested_path_variants(self, async_client_auth: AsyncClient, path):
+        response = await async_client_auth.post(
+            "/batch/", json={"requests": [{"method": "GET", "path": path}]}
+        )
+        assert response.status_code == 400
+
+    async def test_empty(self, async_client_auth: AsyncClient):
+        response = await async_client_auth.post("/batch/", json={"requests": []})
+        assert response.status_code == 422
+
+    async def test_invalid_token(self, async_client: AsyncClient):
+        response = await async_client.post(
+            "/batch/",
+            headers={"token": "invalid_token"},
+            json={"requests": [{"method": "GET", "path": "/categories/"}]},
+        )
+        assert response.status_code == 401
+
+
+class TestBatchPath:
+    @pytest.mark.parametrize(
+        "path",
+        ["/batch", "/batch/", "/batch/?x=1", "/batch?x=1/", "//batch//", "/%62atch"],
+    )
+    def test_batch_paths(self, path):
+        assert is_batch_path(path)
+
+    @pytest.mark.parametrize("path", ["/", "/batches", "/expenses/?next=/batch"])
+    def test_other_paths(self, path):
+        assert not is_batch_path(path)
@@ -14,7 +14,7 @@ def mock_db_user_not_found(monkeypatch):
         async def find_one(self, query):
             return None
 
-    monkeypatch.setattr("api.routers.categories.users_collection", MockCollection())
+    monkeypatch.setattr("api.utils.principal.users_collection", MockCollection())
 
 
 @pytest.fixture
@@ -23,7 +23,7 @@ def mock_db_category_not_found(monkeypatch):
         async def find_one(self, query):
             return {"_id": ObjectId("507f1f77bcf86cd799439011")}
 
-    monkeypatch.setattr("api.routers.categories.users_collection", MockCollection())
+    monkeypatch.setattr("api.utils.principal.users_collection", MockCollection())
 
 
 @pytest.mark.anyio
@@ -51,9 +51,7 @@ class TestCategoryCreation:
         )
         assert response.status_code == 422, response.json()
 
-    @patch(
-        "api.routers.categories.verify_token", return_value="507f1f77bcf86cd799439011"
-    )
+    @patch("api.utils.principal.verify_token", return_value="507f1f77bcf86cd799439011")
     async def test_create_category_user_not_found(
         self, mock_verify_token, async_client_auth: AsyncClient, mock_db_user_not_found
     ):
@@ -172,9 +170,7 @@ class TestCategoryUpdate:
         assert response.status_code == 400, response.json()
         assert response.json()["detail"] == "Monthly budget must be positive"
 
-    @patch(
-        "api.routers.categories.verify_token", return_value="507f1f77bcf86cd799439011"
-    )
+    @patch("api.utils.principal.verify_token", return_value="507f1f77bcf86cd799439011")
     async def test_update_category_not_found(
         self,
         mock_verify_token,
@@ -250,9 +246,7 @@ class TestCategoryDeletion:
         response = await async_client_auth.delete("/categories/ENTERTAINMENT")
         assert response.status_code == 404, response.json()
 
-    @patch(
-        "api.routers.categories.verify_token", return_value="507f1f77bcf86cd799439011"
-    )
+    @patch("api.utils.principal.verify_token", return_value="507f1f77bcf86cd799439011")
     async def test_delete_category_not_found(
         self,
         mock_verify_token,
@@ -0,0 +1,153 @@
+import datetime
+import json
+import os
+
+import pandas as pd
+import pytest
+
+from api.routers.analytics import budget_vs_actual_data, chart_response, prorate_budget
+from api.utils.aggregations import CategoryTotals
+from api.utils.chart_cache import (
+    ChartCache,
+    chart_cache,
+    chart_digest,
+    chart_etag,
+    etag_matches,
+)
+from api.utils.principal import Principal, user_cache
+
+USER_ID = "507f1f77bcf86cd799439011"
+KEY = (USER_ID, "expense-bar", None, None, "USD", 1)
+
+
+class TestChartCache:
+    def test_memory_lru(self):
+        cache = ChartCache(max_size=1)
+        cache.put(KEY, b"first")
+        assert cache.get(KEY) == b"first"
+        cache.put(KEY[:-1] + (2,), b"second")
+        assert cache.get(KEY) is None
+        assert len(cache) == 1
+
+    def test_disk_tier(self, tmp_path):
+        cache = ChartCache(max_size=10, directory=str(tmp_path))
+        cache.put(KEY, b"chart")
+        # Another worker, or this one after a restart, finds it on disk
+        other = ChartCache(max_size=10, directory=str(tmp_path))
+        assert other.get(KEY) == b"chart"
+        assert len(other) == 1
+
+    def test_prune(self, tmp_path):
+        cache = ChartCache(max_size=0, directory=str(tmp_path), max_files=2)
+        keys = [KEY[:-1] + (version,) for version in range(4)]
+        for age, key in enumerate(keys):
+            cache.put(key, b"chart")
+            os.utime(tmp_path / f"{chart_digest(key)}.chart", (age, age))
+        cache.prune()
+        assert cache.get(keys[0]) is None
+        assert cache.get(keys[3]) == b"chart"
+        assert len(list(tmp_path.glob("*.chart"))) == 2
+
+    def test_etag_matches(self):
+        etag = chart_etag(KEY)
+        assert etag_matches(etag, etag)
+        assert etag_matches(f'"other", W/{etag}', etag)
+        assert etag_matches("*", etag)
+        assert not etag_matches(None, etag)
+        assert not etag_matches(chart_etag(KEY[:-1] + (2,)), etag)
+
+
+class MockUsers:
+    """Holds the stored version and budgets of the test user."""
+
+    def __init__(self, version):
+        self.version = version
+        self.categories = {}
+
+    async def find_one(self, query, projection=None):
+        return {"_id": USER_ID, "version": self.version, "categories": self.categories}
+
+
+@pytest.fixture
+def users(monkeypatch):
+    users = MockUsers(1)
+    monkeypatch.setattr("api.utils.principal.users_collection", users)
+    return users
+
+
+def make_principal(version):
+    principal = Principal(USER_ID, "token")
+    principal._user = {"_id": USER_ID, "version": version}
+    principal._loaded = True
+    return principal
+
+
+@pytest.mark.anyio
+class TestChartResponse:
+    chart = ("test-chart", None, None, "USD", "png")
+
+    async def test_cached_and_not_modified(self, users):
+        chart_cache.clear()
+        draws = []
+
+        async def draw():
+            draws.append(1)
+            return b"png"
+
+        response = await chart_response(
+            make_principal(1), self.chart, "image/png", None, draw
+        )
+        assert response.body == b"png"
+        etag = response.headers["ETag"]
+
+        response = await chart_response(
+            make_principal(1), self.chart, "image/png", None, draw
+        )
+        assert response.body == b"png"
+        response = await chart_response(
+            make_principal(1), self.chart, "image/png", etag, draw
+        )
+        assert response.status_code == 304
+        assert len(draws) == 1
+
+        # A write bumps the version, so the old ETag no longer matches, even
+        # while this process still caches the older user document
+        users.version = 2
+        response = await chart_response(
+            make_principal(1), self.chart, "image/png", etag, draw
+        )
+        assert response.status_code == 200
+        assert response.headers["ETag"] != etag
+        assert len(draws) == 2
+        chart_cache.clear()
+
+    async def test_budgets_read_past_the_user_cache(self, users, monkeypatch):
+        chart_cache.clear()
+        # This process still caches the user as it was before a budget change
+        # made through another process
+        user_cache.put(
+            {
+                "_id": USER_ID,
+                "version": 1,
+                "categories": {"Food": {"monthly_budget": 30}},
+            }
+        )
+        users.version = 2
+        users.categories = {"Food": {"monthly_budget": 60}}
+        first, last = datetime.date(2024, 1, 1), datetime.date(2024, 1, 30)
+
+        async def category_totals(*args):
+            return CategoryTotals(pd.Series({"Food": 10.0}), first, last)
+
+        monkeypatch.setattr(
+            "api.routers.analytics.fetch_category_totals", category_totals
+        )
+        response = await budget_vs_actual_data(
+            None, None, Principal(USER_ID, "token"), "USD", None
+        )
+        payload = json.loads(response.body)
+        assert payload["budget"] == [
+            pytest.approx(prorate_budget(60, None, None, first, last), abs=0.01)
+        ]
+        user_cache.clear()
+        chart_cache.clear()
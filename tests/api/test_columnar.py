@@ -0,0 +1,135 @@
+import datetime
+
+import bson
+import numpy as np
+import pytest
+from bson import ObjectId
+
+from api.utils.aggregations import ExpenseFrame
+from api.utils.columnar import (
+    EXPORT_FIELDS,
+    FRAME_FIELDS,
+    ColumnBuilder,
+    documents_to_columns,
+    fetch_expense_columns,
+    iter_expense_columns,
+)
+
+EXPENSES = [
+    {
+        "_id": ObjectId(),
+        "user_id": "user",
+        "date": datetime.datetime(2024, 1, 15, 12, 30),
+        "amount": 10.5,
+        "currency": "USD",
+        "category": "Rent",
+        "description": "January",
+        "account_name": "Checking",
+    },
+    {
+        "_id": ObjectId(),
+        "user_id": "user",
+        "date": datetime.datetime(2024, 2, 1),
+        "amount": 3,
+        "currency": "EUR",
+        "category": "Food",
+        "account_name": "Checking",
+    },
+    {
+        "_id": ObjectId(),
+        "user_id": "user",
+        "amount": 1.25,
+        "currency": "USD",
+        "category": "Food",
+        "account_name": "Cash",
+    },
+]
+
+
+class MockCollection:
+    def __init__(self, documents, batch_size):
+        self.documents = documents
+        self.batch_size = batch_size
+        self.projection = None
+
+    def find_raw_batches(self, query, projection, limit=0, batch_size=0):
+        self.projection = projection
+        return self.batches(projection, batch_size or self.batch_size)
+
+    async def batches(self, projection, batch_size):
+        for start in range(0, len(self.documents), batch_size):
+            yield b"".join(
+                bson.encode({key: doc[key] for key in doc if projection.get(key)})
+                for doc in self.documents[start : start + batch_size]
+            )
+
+
+class TestColumnBuilder:
+    def test_typed_columns(self):
+        builder = ColumnBuilder()
+        builder.add_batch(b"".join(bson.encode(expense) for expense in EXPENSES))
+        columns = builder.finish()
+
+        assert set(columns) == set(FRAME_FIELDS)
+        assert columns["amount"].dtype == np.float64
+        np.testing.assert_array_equal(columns["amount"], [10.5, 3.0, 1.25])
+        assert columns["date"].dtype == np.dtype("datetime64[ms]")
+        assert columns["date"][0] == np.datetime64("2024-01-15T12:30")
+        assert np.isnat(columns["date"][2])
+
+    def test_categorical_codes(self):
+        columns = documents_to_columns(EXPENSES)
+        category = columns["category"]
+        assert list(category.categories) == ["Food", "Rent"]
+        assert category.codes.tolist() == [1, 0, 0]
+        assert list(columns["account_name"]) == ["Checking", "Checking", "Cash"]
+
+    def test_missing_values(self):
+        columns = documents_to_columns([{"amount": 1.0}], EXPORT_FIELDS)
+        assert columns["category"].codes.tolist() == [-1]
+        assert columns["description"].tolist() == [None]
+
+    def test_batches_match_documents(self):
+        builder = ColumnBuilder(EXPORT_FIELDS)
+        for expense in EXPENSES:
+            builder.add_batch(bson.encode(expense))
+        columns = builder.finish()
+        expected = documents_to_columns(EXPENSES, EXPORT_FIELDS)
+        np.testing.assert_array_equal(columns["date"], expected["date"])
+        for field in EXPORT_FIELDS[1:]:
+            assert list(columns[field]) == list(expected[field]), field
+
+
+@pytest.mark.anyio
+class TestFetchExpenseColumns:
+    async def test_projection_and_batches(self):
+        collection = MockCollection(EXPENSES, batch_size=2)
+        columns = await fetch_expense_columns(collection, {"user_id": "user"})
+        assert collection.projection == {
+            **{field: True for field in FRAME_FIELDS},
+            "_id": False,
+        }
+        assert len(columns["amount"]) == 3
+
+        frame = ExpenseFrame(columns)
+        assert frame.totals("category").to_dict() == {"Food": 4.25, "Rent": 10.5}
+        assert frame.totals("month").sum() == 13.5
+
+    async def test_no_documents(self):
+        columns = await fetch_expense_columns(MockCollection([], 2), {})
+        frame = ExpenseFrame(columns, "USD")
+        assert not frame
+        assert frame.totals("day").empty
+
+    async def test_yields_each_batch(self):
+        collection = MockCollection(EXPENSES, batch_size=3)
+        batches = [
+            columns
+            async for columns in iter_expense_columns(
+                collection, {}, EXPORT_FIELDS, batch_size=2
+            )
+        ]
+        assert [len(columns["amount"]) for columns in batches] == [2, 1]
+        assert collection.projection == {field: True for field in EXPORT_FIELDS}
+        # Every batch has its own categories
+        assert list(batches[1]["category"].categories) == ["Food"]
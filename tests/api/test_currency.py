@@ -0,0 +1,141 @@
+import datetime
+import os
+
+import numpy as np
+import pytest
+
+from api.utils.currency import CurrencyService
+
+
+def write_rates(path, usd, inr):
+    path.write_text(f"Date,USD,INR,\n2024-01-03,{usd},{inr},\n2024-01-02,1.0,80.0,\n")
+
+
+@pytest.fixture
+def rates_file(tmp_path):
+    path = tmp_path / "rates.csv"
+    write_rates(path, 1.25, 100.0)
+    return path
+
+
+class TestCurrencyService:
+    def test_loads_lazily(self, rates_file):
+        service = CurrencyService(str(rates_file))
+        assert service._table is None
+        assert set(service.currencies) == {"EUR", "USD", "INR"}
+
+    def test_latest_rates(self, rates_file):
+        service = CurrencyService(str(rates_file))
+        assert service.rate("EUR", "USD") == pytest.approx(1.25)
+        assert service.rate("USD", "INR") == pytest.approx(80.0)
+        assert service.convert_one(10, "INR", "EUR") == pytest.approx(0.1)
+        assert service.convert_one(10, "XYZ", "XYZ") == 10
+
+    def test_vectorised(self, rates_file):
+        service = CurrencyService(str(rates_file))
+        converted = service.convert(
+            np.array([1.25, 100.0, 1.0]), np.array(["USD", "INR", "EUR"]), "EUR"
+        )
+        np.testing.assert_allclose(converted, [1.0, 1.0, 1.0])
+        np.testing.assert_allclose(service.convert([2.0, 4.0], "EUR", "USD"), [2.5, 5])
+        assert service.convert([], [], "USD").shape == (0,)
+
+    def test_unsupported_currency(self, rates_file):
+        service = CurrencyService(str(rates_file))
+        with pytest.raises(ValueError):
+            service.convert([1.0], ["XYZ"], "USD")
+
+    def test_discontinued_currency(self, tmp_path):
+        # Shaped like the ECB history: newest first, a trailing comma and N/A
+        # for a currency that is no longer quoted
+        path = tmp_path / "eurofxref-hist.csv"
+        path.write_text(
+            "Date,USD,BGN,\n"
+            "2026-09-14,1.16,N/A,\n"
+            "2026-01-02,1.10,N/A,\n"
+            "2025-12-31,1.05,1.9558,\n"
+            "2025-12-30,1.04,1.9500,\n"
+        )
+        service = CurrencyService(str(path))
+        assert service.convert_one(116, "USD", "EUR") == pytest.approx(100)
+        assert service.rate("EUR", "BGN") == pytest.approx(1.9558)
+        assert service.convert_one(
+            1.0, "EUR", "BGN", datetime.date(2025, 12, 30)
+        ) == pytest.approx(1.95)
+
+    def test_hot_swap(self, rates_file):
+        service = CurrencyService(str(rates_file), reload_interval=3600)
+        assert service.rate("EUR", "USD") == pytest.approx(1.25)
+        write_rates(rates_file, 2.0, 100.0)
+        stat = os.stat(rates_file)
+        os.utime(rates_file, (stat.st_atime, stat.st_mtime + 10))
+        # Not due for a check yet
+        assert service.rate("EUR", "USD") == pytest.approx(1.25)
+        service.reload()
+        assert service.rate("EUR", "USD") == pytest.approx(2.0)
+
+
+class TestRateMatrix:
+    def test_dated_conversion(self, rates_file):
+        service = CurrencyService(str(rates_file))
+        assert service.convert_one(1.0, "EUR", "USD", datetime.date(2024, 1, 2)) == 1.0
+        assert service.convert_one(
+            1.0, "EUR", "USD", datetime.datetime(2024, 1, 3, 12)
+        ) == pytest.approx(1.25)
+
+    def test_out_of_range_dates_are_clamped(self, rates_file):
+        service = CurrencyService(str(rates_file))
+        converted = service.convert(
+            [1.0, 1.0, 1.0],
+            "EUR",
+            "INR",
+            [datetime.date(2000, 1, 1), datetime.date(2030, 1, 1), None],
+        )
+        np.testing.assert_allclose(converted, [80.0, 100.0, 100.0])
+
+    def test_gaps_are_forward_filled(self, tmp_path):
+        path = tmp_path / "rates.csv"
+        path.write_text("Date,USD,\n2024-01-05,2.0,\n2024-01-01,1.0,\n")
+        service = CurrencyService(str(path))
+        converted = service.convert(
+            [1.0] * 3,
+            ["EUR"] * 3,
+            "USD",
+            [datetime.date(2024, 1, day) for day in (1, 4, 5)],
+        )
+        np.testing.assert_allclose(converted, [1.0, 1.0, 2.0])
+
+    def test_memory_mapped(self, rates_file, tmp_path):
+        cache_dir = tmp_path / "compiled"
+        service = CurrencyService(str(rates_file), cache_dir=str(cache_dir))
+        assert isinstance(service.table.matrix, np.memmap)
+        assert len(list(cache_dir.glob("rates-*.npy"))) == 1
+        # A second worker maps the compiled copy
+        other = CurrencyService(str(rates_file), cache_dir=str(cache_dir))
+        assert other.rate("USD", "INR") == pytest.approx(80.0)
+
+        write_rates(rates_file, 2.0, 100.0)
+        stat = os.stat(rates_file)
+        os.utime(rates_file, (stat.st_atime, stat.st_mtime + 10))
+        service.reload()
+        assert service.rate("EUR", "USD") == pytest.approx(2.0)
+        assert len(list(cache_dir.glob("rates-*.npy"))) == 1
+
+    def test_cleanup_keeps_other_rate_files(self, rates_file, tmp_path):
+        cache_dir = tmp_path / "compiled"
+        other_file = tmp_path / "other.csv"
+        write_rates(other_file, 1.5, 90.0)
+        other = CurrencyService(str(other_file), cache_dir=str(cache_dir))
+        assert other.rate("EUR", "USD") == pytest.approx(1.5)
+
+        service = CurrencyService(str(rates_file), cache_dir=str(cache_dir))
+        _ = service.table
+        write_rates(rates_file, 2.0, 100.0)
+        stat = os.stat(rates_file)
+        os.utime(rates_file, (stat.st_atime, stat.st_mtime + 10))
+        service.reload()
+        # The old version of rates.csv is dropped, other.csv is left alone
+        assert len(list(cache_dir.glob("rates-*.npy"))) == 2
+        assert CurrencyService(str(other_file), cache_dir=str(cache_dir)).rate(
+            "EUR", "USD"
+        ) == pytest.approx(1.5)
@@ -1,4 +1,5 @@
 # test_expenses.py
+import asyncio
 import datetime
 from unittest.mock import patch
 
@@ -30,7 +31,7 @@ class TestConvertCurrency:
         ), "Conversion should return the original amount if currencies are the same"
 
     # Test case for successful conversion
-    @patch("api.routers.expenses.currency_converter.convert")
+    @patch("api.routers.expenses.currency_service.convert_one")
     def test_success(self, mock_convert):
         # Mock the currency converter to return a fixed value
         mock_convert.return_value = 85.0
@@ -40,11 +41,11 @@ class TestConvertCurrency:
         to_cur = "EUR"
         result = api.routers.expenses.convert_currency(amount, from_cur, to_cur)
 
-        mock_convert.assert_called_once_with(amount, from_cur, to_cur)
+        mock_convert.assert_called_once_with(amount, from_cur, to_cur, None)
         assert result == 85.0, "Conversion should match the mocked return value"
 
     # Test case for failed conversion (e.g., unsupported currency)
-    @patch("api.routers.expenses.currency_converter.convert")
+    @patch("api.routers.expenses.currency_service.convert_one")
     def test_failure(self, mock_convert):
         # Simulate an exception being raised during conversion
         mock_convert.side_effect = Exception("Unsupported currency")
@@ -61,6 +62,51 @@ class TestConvertCurrency:
         ), "Exception message should indicate conversion failure"
 
 
+class TestConvertBulkRows:
+    def test_one_call_per_currency_pair(self):
+        expenses = [
+            api.routers.expenses.ExpenseCreate(
+                amount=amount,
+                currency=currency,
+                category="Food",
+                date=datetime.datetime(2024, 1, day),
+            )
+            for amount, currency, day in [
+                (10.0, "EUR", 2),
+                (5.0, "USD", 3),
+                (20.0, "EUR", 4),
+                (7.5, "GBP", 5),
+            ]
+        ]
+        targets = {0: "USD", 1: "USD", 2: "USD", 3: "USD"}
+        convert = api.routers.expenses.convert_column
+        with patch(
+            "api.routers.expenses.convert_column", side_effect=convert
+        ) as mock_convert:
+            converted = api.routers.expenses.convert_bulk_rows(expenses, targets)
+
+        # EUR and GBP are converted once each, USD rows keep their amount
+        assert mock_convert.call_count == 2
+        assert converted[1] == 5.0
+        for index in (0, 2, 3):
+            expense = expenses[index]
+            assert converted[index] == pytest.approx(
+                api.routers.expenses.convert_currency(
+                    expense.amount, expense.currency, "USD", expense.date
+                )
+            )
+
+    def test_unsupported_currency_fails_the_row(self):
+        expense = api.routers.expenses.ExpenseCreate(
+            amount=1.0, currency="xyz", category="Food"
+        )
+        user = {"currencies": ["XYZ"], "categories": {"Food": {}}}
+        accounts = {"Checking": {"currency": "USD"}}
+        with pytest.raises(HTTPException) as exc_info:
+            api.routers.expenses.check_bulk_row(expense, user, accounts)
+        assert exc_info.value.detail.startswith("Currency conversion failed")
+
+
 @pytest.mark.anyio
 class TestExpenseAdd:
     async def test_valid(self, async_client_auth: AsyncClient):
@@ -96,6 +142,27 @@ class TestExpenseAdd:
         assert response.status_code == 400
         assert response.json()["detail"].startswith("Insufficient balance")
 
+    async def test_concurrent_overdraft(self, async_client_auth: AsyncClient):
+        accounts = (await async_client_auth.get("/accounts/")).json()["accounts"]
+        checking = next(a for a in accounts if a["name"] == "Checking")
+        amount = round(checking["balance"] * 0.6, 2)
+        expense = {
+            "amount": amount,
+            "currency": checking["currency"],
+            "category": "Food",
+            "account_name": "Checking",
+        }
+
+        responses = await asyncio.gather(
+            async_client_auth.post("/expenses/", json=expense),
+            async_client_auth.post("/expenses/", json=expense),
+        )
+
+        assert sorted(r.status_code for r in responses) == [200, 400]
+        accounts = (await async_client_auth.get("/accounts/")).json()["accounts"]
+        checking_after = next(a for a in accounts if a["name"] == "Checking")
+        assert checking_after["balance"] == pytest.approx(checking["balance"] - amount)
+
     async def test_invalid_category(self, async_client_auth: AsyncClient):
         response = await async_client_auth.post(
             "/expenses/",
@@ -238,6 +305,50 @@ class TestExpenseAdd:
         assert response.status_code == 422
 
 
+@pytest.mark.anyio
+class TestExpenseBulk:
+    async def test_mixed_rows(self, async_client_auth: AsyncClient):
+        accounts = (await async_client_auth.get("/accounts/")).json()["accounts"]
+        checking = next(a for a in accounts if a["name"] == "Checking")
+        rows = [
+            {"amount": 2.0, "currency": "usd", "category": "Food"},
+            {"amount": 1.0, "currency": "USD", "category": "NotACategory"},
+            {"amount": 1000000.0, "currency": "USD", "category": "Food"},
+            {
+                "amount": 1.0,
+                "currency": "USD",
+                "category": "Food",
+                "account_name": "Nope",
+            },
+            {"amount": 3.0, "currency": "USD", "category": "Transport"},
+        ]
+
+        response = await async_client_auth.post(
+            "/expenses/bulk", json={"expenses": rows}
+        )
+        assert response.status_code == 200, response.json()
+        body = response.json()
+        assert body["message"] == "2 expenses added successfully"
+        assert [r["status"] for r in body["results"]] == [
+            "created",
+            "error",
+            "error",
+            "error",
+            "created",
+        ]
+        assert body["results"][2]["detail"].startswith("Insufficient balance")
+        assert body["results"][3]["detail"] == "Invalid account type"
+        assert body["balances"]["Checking"] == pytest.approx(checking["balance"] - 5.0)
+
+        created = await async_client_auth.get(f"/expenses/{body['results'][0]['_id']}")
+        assert created.status_code == 200
+        assert created.json()["currency"] == "USD"
+
+    async def test_empty(self, async_client_auth: AsyncClient):
+        response = await async_client_auth.post("/expenses/bulk", json={"expenses": []})
+        assert response.status_code == 422
+
+
 @pytest.mark.anyio
 class TestExpenseGet:
     async def test_all(self, async_client_auth: AsyncClient):
@@ -291,6 +402,55 @@ class TestExpenseGet:
         assert "_id" in response.json()
         assert response.json()["_id"] == expense_id
 
+    async def test_pagination(self, async_client_auth: AsyncClient):
+        """
+        Test that pages follow (date, _id) order and do not overlap.
+        """
+        for day in range(1, 4):
+            response = await async_client_auth.post(
+                "/expenses/",
+                json={
+                    "amount": 1.0,
+                    "currency": "USD",
+                    "category": "Food",
+                    "account_name": "Checking",
+                    "date": f"2020-01-0{day}T12:00:00",
+                },
+            )
+            assert response.status_code == 200, response.json()
+
+        seen = []
+        cursor = None
+        while True:
+            params = {"limit": 2}
+            if cursor:
+                params["cursor"] = cursor
+            response = await async_client_auth.get("/expenses/", params=params)
+            assert response.status_code == 200, response.json()
+            page = response.json()
+            assert len(page["expenses"]) <= 2
+            seen.extend(page["expenses"])
+            cursor = page["next_cursor"]
+            if not cursor:
+                break
+
+        ids = [expense["_id"] for expense in seen]
+        assert len(ids) == len(set(ids))
+        dates = [expense["date"] for expense in seen]
+        assert dates == sorted(dates, reverse=True)
+        assert dates[-3:] == [
+            "2020-01-03T12:00:00",
+            "2020-01-02T12:00:00",
+            "2020-01-01T12:00:00",
+        ]
+
+    async def test_invalid_cursor(self, async_client_auth: AsyncClient):
+        response = await async_client_auth.get(
+            "/expenses/", params={"cursor": "not-a-cursor"}
+        )
+        assert response.status_code == 400, response.json()
+        assert response.json()["detail"] == "Invalid cursor"
+
     async def test_not_found(self, async_client_auth: AsyncClient):
         """
         Test to retrieve an expense by a non-existent ID.
@@ -803,6 +963,35 @@ class TestExpenseDeleteAllWithMultipleScenarios:
             updated_balance = response.json()["account"]["balance"]
             assert updated_balance == initial_balance
 
+    async def test_mixed_currency_refund(self, async_client_auth: AsyncClient):
+        initial_balance = 400.0
+        account_response = await async_client_auth.post(
+            "/accounts/",
+            json={"name": "Travel", "balance": initial_balance, "currency": "USD"},
+        )
+        assert account_response.status_code == 200, account_response.json()
+        account_id = account_response.json()["account_id"]
+
+        for amount, currency in [(20.0, "EUR"), (15.0, "GBP"), (25.0, "USD")]:
+            response = await async_client_auth.post(
+                "/expenses/",
+                json={
+                    "amount": amount,
+                    "currency": currency,
+                    "category": "Shopping",
+                    "account_name": "Travel",
+                },
+            )
+            assert response.status_code == 200, response.json()
+
+        delete_response = await async_client_auth.delete("/expenses/all")
+        assert delete_response.status_code == 200, delete_response.json()
+
+        # Refunds are converted back into the account currency
+        response = await async_client_auth.get(f"/accounts/{account_id}")
+        updated_balance = response.json()["account"]["balance"]
+        assert updated_balance == pytest.approx(initial_balance)
+
     async def test_no_expenses(self, async_client_auth: AsyncClient):
         # Ensure no expenses exist
         response = await async_client_auth.get("/expenses/")
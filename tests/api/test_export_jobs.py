@@ -0,0 +1,207 @@
+import asyncio
+import datetime
+import os
+
+import pytest
+from fastapi import HTTPException
+from pymongo.errors import DuplicateKeyError
+
+from api.utils.export_jobs import ExportJobs
+
+
+class MockJobsCollection:
+    """Keeps job documents in a dict, matching filters on equality."""
+
+    def __init__(self):
+        self.jobs = {}
+
+    def _match(self, query):
+        job = self.jobs.get(query["_id"])
+        if job and all(job.get(key) == value for key, value in query.items()):
+            return job
+        return None
+
+    async def insert_one(self, document):
+        if document["_id"] in self.jobs:
+            raise DuplicateKeyError("duplicate")
+        self.jobs[document["_id"]] = dict(document)
+
+    async def find_one(self, query):
+        job = self._match(query)
+        return dict(job) if job else None
+
+    async def find_one_and_update(self, query, update, return_document=None):
+        job = self._match(query)
+        if job is None:
+            return None
+        job.update(update["$set"])
+        return dict(job)
+
+    async def update_one(self, query, update):
+        job = self._match(query)
+        if job:
+            job.update(update["$set"])
+
+
+@pytest.fixture
+def jobs_collection(monkeypatch):
+    collection = MockJobsCollection()
+    monkeypatch.setattr("api.utils.export_jobs.export_jobs_collection", collection)
+    return collection
+
+
+@pytest.fixture
+def jobs(tmp_path):
+    return ExportJobs(str(tmp_path), workers=1, max_pending=4, ttl=60, stale_after=30)
+
+
+async def wait_for(jobs):
+    while jobs._tasks:
+        await asyncio.gather(*jobs._tasks)
+
+
+@pytest.mark.anyio
+class TestExportJobs:
+    async def test_builds_once(self, jobs, jobs_collection):
+        builds = []
+
+        async def build(output, progress):
+            builds.append(1)
+            await progress(0.5)
+            output.write(b"artifact")
+
+        job = {"_id": "a1", "user_id": "u1", "format": "pdf"}
+        assert (await jobs.submit(job, build))["status"] == "queued"
+        # A repeated request while the build is queued joins it
+        assert (await jobs.submit(job, build))["status"] == "queued"
+        await wait_for(jobs)
+
+        stored = jobs_collection.jobs["a1"]
+        assert stored["status"] == "done"
+        assert stored["progress"] == 1.0
+        assert stored["size"] == len(b"artifact")
+        with open(jobs.artifact(stored), "rb") as file:
+            assert file.read() == b"artifact"
+
+        assert (await jobs.submit(job, build))["status"] == "done"
+        await wait_for(jobs)
+        assert builds == [1]
+
+    async def test_failure_is_reported_and_retried(self, jobs, jobs_collection):
+        async def build(output, progress):
+            raise HTTPException(status_code=404, detail="No data found")
+
+        job = {"_id": "b2", "user_id": "u1", "format": "xlsx"}
+        await jobs.submit(job, build)
+        await wait_for(jobs)
+        assert jobs_collection.jobs["b2"]["status"] == "failed"
+        assert jobs_collection.jobs["b2"]["error"] == "No data found"
+        assert not os.listdir(jobs.directory)
+
+        async def fixed(output, progress):
+            output.write(b"ok")
+
+        assert (await jobs.submit(job, fixed))["status"] == "queued"
+        await wait_for(jobs)
+        assert jobs_collection.jobs["b2"]["status"] == "done"
+
+    async def test_stale_and_lost_jobs_restart(self, jobs, jobs_collection):
+        async def build(output, progress):
+            output.write(b"ok")
+
+        job = {"_id": "c3", "user_id": "u1", "format": "pdf"}
+        await jobs.submit(job, build)
+        await wait_for(jobs)
+        # The artifact is gone, e.g. pruned on another host
+        os.remove(jobs.path(job))
+        assert (await jobs.submit(job, build))["status"] == "queued"
+        await wait_for(jobs)
+
+        stored = jobs_collection.jobs["c3"]
+        stored["status"] = "running"
+        stored["updated_at"] -= datetime.timedelta(seconds=60)
+        assert (await jobs.submit(job, build))["status"] == "queued"
+        await wait_for(jobs)
+        assert jobs_collection.jobs["c3"]["status"] == "done"
+
+    async def test_heartbeat_keeps_slow_jobs(self, tmp_path, jobs_collection):
+        jobs = ExportJobs(str(tmp_path), workers=1, ttl=60, stale_after=0.3)
+        release = asyncio.Event()
+        builds = []
+
+        async def build(output, progress):
+            builds.append(1)
+            await release.wait()
+            output.write(b"ok")
+
+        running = {"_id": "h1", "user_id": "u1", "format": "pdf"}
+        queued = {"_id": "h2", "user_id": "u1", "format": "pdf"}
+        await jobs.submit(running, build)
+        await jobs.submit(queued, build)
+        started = {
+            job_id: jobs_collection.jobs[job_id]["updated_at"]
+            for job_id in ("h1", "h2")
+        }
+        await asyncio.sleep(0.5)
+        # Both the running build and the one waiting for a worker are refreshed
+        for job_id, updated_at in started.items():
+            assert jobs_collection.jobs[job_id]["updated_at"] > updated_at
+
+        # Even with an old status, a build this process still runs is not restarted
+        jobs_collection.jobs["h1"]["updated_at"] -= datetime.timedelta(seconds=60)
+        assert (await jobs.submit(running, build))["status"] == "running"
+        release.set()
+        await wait_for(jobs)
+        assert builds == [1, 1]
+        assert jobs_collection.jobs["h1"]["status"] == "done"
+
+    async def test_restarted_builds_use_own_temp_files(self, tmp_path, jobs_collection):
+        # Another process restarts a job it wrongly takes as lost
+        first = ExportJobs(str(tmp_path), workers=1, ttl=60, stale_after=30)
+        second = ExportJobs(str(tmp_path), workers=1, ttl=60, stale_after=30)
+        release = asyncio.Event()
+        outputs = []
+
+        async def build(output, progress):
+            outputs.append(output.name)
+            await release.wait()
+            output.write(b"artifact")
+
+        job = {"_id": "t1", "user_id": "u1", "format": "pdf"}
+        await first.submit(job, build)
+        await asyncio.sleep(0)
+        jobs_collection.jobs["t1"]["updated_at"] -= datetime.timedelta(seconds=60)
+        await second.submit(job, build)
+        await asyncio.sleep(0)
+        assert len(set(outputs)) == 2
+        release.set()
+        await wait_for(first)
+        await wait_for(second)
+        assert os.listdir(str(tmp_path)) == ["t1.pdf"]
+        with open(first.path(job), "rb") as file:
+            assert file.read() == b"artifact"
+
+    async def test_pending_limit(self, jobs, jobs_collection):
+        release = asyncio.Event()
+
+        async def build(output, progress):
+            await release.wait()
+
+        for i in range(4):
+            await jobs.submit({"_id": f"d{i}", "user_id": "u1", "format": "pdf"}, build)
+        with pytest.raises(HTTPException) as exc_info:
+            await jobs.submit({"_id": "d9", "user_id": "u1", "format": "pdf"}, build)
+        assert exc_info.value.status_code == 503
+
+        await jobs.shutdown()
+        assert {job["status"] for job in jobs_collection.jobs.values()} == {"failed"}
+
+    def test_prune(self, jobs):
+        old = os.path.join(jobs.directory, "old.pdf")
+        new = os.path.join(jobs.directory, "new.pdf")
+        for path in (old, new):
+            with open(path, "wb") as file:
+                file.write(b"x")
+        os.utime(old, (0, 0))
+        jobs.prune()
+        assert os.listdir(jobs.directory) == ["new.pdf"]
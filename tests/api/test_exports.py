@@ -1,16 +1,65 @@
+import asyncio
 import datetime
+from io import BytesIO
 
+import bson
 import pytest
 from bson import ObjectId
 from fastapi import HTTPException
 from fastapi.testclient import TestClient
+from openpyxl import load_workbook
+from openpyxl.worksheet._writer import ALL_TEMP_FILES
 
 from api.app import app
-from api.utils.db import fetch_data
+from api.routers.exports import ExportRequest, write_pdf_export, write_xlsx_export
+from api.utils.db import build_expense_query
+from api.utils.pdf import logo_data, long_table
 
 client = TestClient(app)
 
 
+class TestExpenseQuery:
+    def test_date_bounds(self):
+        query = build_expense_query(
+            "user", datetime.date(2023, 1, 1), datetime.date(2023, 1, 31)
+        )
+        assert query == {
+            "user_id": "user",
+            "date": {
+                "$gte": datetime.datetime(2023, 1, 1),
+                "$lte": datetime.datetime(2023, 1, 31, 23, 59, 59, 999999),
+            },
+        }
+        assert build_expense_query("user", None, None) == {"user_id": "user"}
+        only_to = build_expense_query("user", None, datetime.date(2023, 1, 31))
+        assert set(only_to["date"]) == {"$lte"}
+
+    def test_invalid_range(self):
+        with pytest.raises(HTTPException) as exc_info:
+            build_expense_query(
+                "user", datetime.date(2023, 1, 31), datetime.date(2023, 1, 1)
+            )
+        assert exc_info.value.status_code == 422
+
+
+class MockRawBatchCursor:
+    """Yields documents as raw BSON batches, like find_raw_batches."""
+
+    def __init__(self, data, projection, batch_size=0):
+        self.data = [
+            {key: value for key, value in document.items() if projection.get(key)}
+            for document in data
+        ]
+        self.batch_size = batch_size or len(self.data)
+
+    async def __aiter__(self):
+        for start in range(0, len(self.data), self.batch_size):
+            yield b"".join(
+                bson.encode(document)
+                for document in self.data[start : start + self.batch_size]
+            )
+
+
 @pytest.fixture
 def mock_db(monkeypatch):
     class MockCursor:
@@ -27,6 +76,9 @@ def mock_db(monkeypatch):
         def find(self, query):
             return MockCursor(self.data)
 
+        def find_raw_batches(self, query, projection, limit=0, batch_size=0):
+            return MockRawBatchCursor(self.data, projection, batch_size)
+
         async def find_one(self, query):
             return self.data[0] if self.data else None
 
@@ -88,6 +140,9 @@ def mock_db_no_data(monkeypatch):
         def find(self, query):
             return MockCursor(self.data)
 
+        def find_raw_batches(self, query, projection, limit=0, batch_size=0):
+            return MockRawBatchCursor(self.data, projection, batch_size)
+
         async def find_one(self, query):
             return None
 
@@ -112,6 +167,9 @@ def mock_db_no_accounts(monkeypatch):
         def find(self, query):
             return MockCursor(self.data)
 
+        def find_raw_batches(self, query, projection, limit=0, batch_size=0):
+            return MockRawBatchCursor(self.data, projection, batch_size)
+
         async def find_one(self, query):
             return self.data[0] if self.data else None
 
@@ -162,6 +220,9 @@ def mock_db_no_categories(monkeypatch):
         def find(self, query):
             return MockCursor(self.data)
 
+        def find_raw_batches(self, query, projection, limit=0, batch_size=0):
+            return MockRawBatchCursor(self.data, projection, batch_size)
+
         async def find_one(self, query):
             return self.data[0] if self.data else None
 
@@ -269,6 +330,95 @@ class TestXLSXExport:
         assert response.status_code == 422
 
 
+class MockExpensesCollection:
+    """Returns its expenses in raw batches of 1000 documents."""
+
+    def __init__(self, data):
+        self.data = data
+        self.batch_sizes = []
+
+    def find_raw_batches(self, query, projection, limit=0, batch_size=0):
+        self.batch_sizes.append(batch_size)
+        return MockRawBatchCursor(self.data, projection, 1000)
+
+
+@pytest.fixture
+def many_expenses(monkeypatch, mock_db):
+    expenses = MockExpensesCollection(
+        [
+            {
+                "_id": ObjectId(),
+                "date": datetime.datetime(2023, 1, 1) + datetime.timedelta(hours=i),
+                "amount": i,
+                "currency": "USD",
+                "category": "Food",
+                "account_name": "Checking",
+            }
+            for i in range(2500)
+        ]
+    )
+    monkeypatch.setattr("api.routers.exports.expenses_collection", expenses)
+    return expenses
+
+
+@pytest.mark.anyio
+class TestXLSXStreaming:
+    async def test_writes_every_batch(self, many_expenses):
+        expenses = many_expenses
+        output = BytesIO()
+        request = ExportRequest("507f1f77bcf86cd799439011", None, None, "USD")
+        await write_xlsx_export(request, output)
+
+        assert expenses.batch_sizes[0] > 0
+        workbook = load_workbook(output, read_only=True)
+        rows = list(workbook["Expenses"].values)
+        # No cap on the number of rows
+        assert len(rows) == 2501
+        assert rows[-1][1] == 2499
+        assert workbook.sheetnames == ["Expenses", "Accounts", "Categories"]
+
+    async def test_no_data_leaves_no_temporary_files(self, mock_db_no_data):
+        temporary_files = list(ALL_TEMP_FILES)
+        request = ExportRequest("507f1f77bcf86cd799439011", None, None, "USD")
+        with pytest.raises(HTTPException) as exc_info:
+            await write_xlsx_export(request, BytesIO())
+        assert exc_info.value.status_code == 404
+        assert ALL_TEMP_FILES == temporary_files
+
+
+@pytest.mark.anyio
+class TestPDFStreaming:
+    async def test_lays_out_every_row(self, monkeypatch, many_expenses):
+        table_rows = []
+
+        def counting_table(header, rows, col_widths):
+            def counted():
+                for row in rows:
+                    table_rows.append(row)
+                    yield row
+
+            return long_table(header, counted(), col_widths)
+
+        charts = []
+
+        async def fake_render_chart(create, data, *args, currency):
+            charts.append(data)
+            return logo_data()[0]
+
+        monkeypatch.setattr("api.routers.exports.long_table", counting_table)
+        monkeypatch.setattr("api.routers.exports.render_chart", fake_render_chart)
+
+        output = BytesIO()
+        request = ExportRequest("507f1f77bcf86cd799439011", None, None, "USD")
+        await write_pdf_export(request, output)
+
+        assert output.getvalue().startswith(b"%PDF")
+        # No cap on the number of rows, and the charts cover all of them
+        assert len(table_rows) == 2500
+        assert table_rows[-1][1] == 2499
+        assert charts[1].sum() == sum(range(2500))
+
+
 @pytest.mark.anyio
 class TestCSVExport:
     async def test_data_to_csv_expenses(self, mock_db, async_client_auth):
@@ -489,3 +639,67 @@ class TestPDFExport:
         assert (
             response.headers["Content-Disposition"] == "attachment; filename=data.pdf"
         )
+
+
+@pytest.mark.anyio
+class TestExportJobs:
+    async def wait_until_finished(self, async_client_auth, job_id):
+        for _ in range(100):
+            response = await async_client_auth.get(f"/exports/jobs/{job_id}")
+            assert response.status_code == 200
+            job = response.json()
+            if job["status"] in ("done", "failed"):
+                return job
+            await asyncio.sleep(0.1)
+        raise AssertionError("Export job did not finish")
+
+    async def test_job_lifecycle(self, mock_db, async_client_auth):
+        response = await async_client_auth.post(
+            "/exports/jobs", json={"format": "xlsx", "from_date": "2023-01-01"}
+        )
+        assert response.status_code == 202
+        job_id = response.json()["job_id"]
+
+        job = await self.wait_until_finished(async_client_auth, job_id)
+        assert job["status"] == "done"
+        assert job["progress"] == 1.0
+        assert job["download_url"] == f"/exports/jobs/{job_id}/file"
+
+        # The same export is not built twice
+        response = await async_client_auth.post(
+            "/exports/jobs", json={"format": "xlsx", "from_date": "2023-01-01"}
+        )
+        assert response.json()["job_id"] == job_id
+        assert response.json()["status"] == "done"
+
+        response = await async_client_auth.get(job["download_url"])
+        assert response.status_code == 200
+        assert len(response.content) == job["size"]
+        response = await async_client_auth.get(
+            job["download_url"], headers={"Range": "bytes=0-3"}
+        )
+        assert response.status_code == 206
+        assert response.content == b"PK\x03\x04"
+
+    async def test_failed_job(self, mock_db_no_data, async_client_auth):
+        response = await async_client_auth.post(
+            "/exports/jobs", json={"format": "pdf", "to_date": "2023-01-31"}
+        )
+        job = await self.wait_until_finished(
+            async_client_auth, response.json()["job_id"]
+        )
+        assert job["status"] == "failed"
+        assert job["error"] == "No data found"
+        response = await async_client_auth.get(f"/exports/jobs/{job['job_id']}/file")
+        assert response.status_code == 409
+
+    async def test_invalid_requests(self, async_client_auth):
+        response = await async_client_auth.post("/exports/jobs", json={"format": "csv"})
+        assert response.status_code == 422
+        response = await async_client_auth.post(
+            "/exports/jobs",
+            json={"format": "pdf", "from_date": "2023-01-31", "to_date": "2023-01-01"},
+        )
+        assert response.status_code == 422
+        response = await async_client_auth.get("/exports/jobs/unknown")
+        assert response.status_code == 404
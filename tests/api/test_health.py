@@ -0,0 +1,37 @@
+from types import SimpleNamespace
+
+import pytest
+from httpx import AsyncClient
+
+from api.utils.db import PoolStatsListener
+
+
+class TestPoolStatsListener:
+    def test_checkout_counters(self):
+        listener = PoolStatsListener()
+        listener.connection_created(None)
+        listener.connection_checked_out(SimpleNamespace(duration=0.002))
+        listener.connection_checked_out(SimpleNamespace(duration=0.004))
+        listener.connection_checked_in(None)
+
+        stats = listener.snapshot()
+        assert stats["connections_open"] == 1
+        assert stats["connections_in_use"] == 1
+        assert stats["checkouts"] == 2
+        assert stats["checkout_wait_avg_ms"] == 3.0
+        assert stats["checkout_wait_max_ms"] == 4.0
+
+    def test_checkout_failure(self):
+        listener = PoolStatsListener()
+        listener.connection_check_out_failed(None)
+        assert listener.snapshot()["checkout_failures"] == 1
+
+
+@pytest.mark.anyio
+class TestDBHealth:
+    async def test_db_health(self, async_client: AsyncClient):
+        response = await async_client.get("/health/db")
+        assert response.status_code == 200, response.json()
+        assert response.json()["status"] == "ok"
+        assert "checkouts" in response.json()["pool"]
+        assert "max_pool_size" in response.json()["pool"]
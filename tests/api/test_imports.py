@@ -0,0 +1,121 @@
+import datetime
+import json
+from io import BytesIO
+
+import pytest
+from fastapi import HTTPException
+from httpx import AsyncClient
+from openpyxl import Workbook
+from pydantic import ValidationError
+
+from api.routers.exports import write_expenses_to_sheet
+from api.routers.imports import (
+    detect_format,
+    iter_csv_rows,
+    iter_xlsx_rows,
+    parse_row,
+)
+from api.utils.aggregations import ExpenseFrame
+from api.utils.columnar import EXPORT_FIELDS
+
+EXPORTED_CSV = (
+    "date,amount,currency,category,description,account_name,_id\r\n"
+    "2024-01-15,12.5,USD,Food,Lunch,Checking,65a5f0c2e4b0a1b2c3d4e5f6\r\n"
+    "2024-01-16,3.0,USD,Transport,,Checking,65a5f0c2e4b0a1b2c3d4e5f7\r\n"
+)
+
+
+def exported_xlsx() -> BytesIO:
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.title = "Expenses"
+    expenses = [
+        {
+            "_id": "65a5f0c2e4b0a1b2c3d4e5f6",
+            "date": datetime.datetime(2024, 1, 15),
+            "amount": 12.5,
+            "currency": "USD",
+            "category": "Food",
+            "description": "Lunch",
+            "account_name": "Checking",
+        }
+    ]
+    write_expenses_to_sheet(
+        sheet, ExpenseFrame.from_documents(expenses, "USD", EXPORT_FIELDS)
+    )
+    workbook.create_sheet(title="Accounts")
+    output = BytesIO()
+    workbook.save(output)
+    output.seek(0)
+    return output
+
+
+class TestRowParsing:
+    def test_csv_round_trip(self):
+        rows = list(iter_csv_rows(BytesIO(EXPORTED_CSV.encode())))
+        assert [number for number, _ in rows] == [2, 3]
+
+        expense = parse_row(rows[0][1])
+        assert expense.amount == 12.5
+        assert expense.date == datetime.datetime(2024, 1, 15)
+        assert parse_row(rows[1][1]).description is None
+
+    def test_xlsx_round_trip(self):
+        rows = list(iter_xlsx_rows(exported_xlsx()))
+        assert len(rows) == 1
+        number, row = rows[0]
+        assert number == 2
+        expense = parse_row(row)
+        assert (expense.category, expense.account_name) == ("Food", "Checking")
+
+    def test_invalid_xlsx(self):
+        with pytest.raises(HTTPException) as exc_info:
+            iter_xlsx_rows(BytesIO(b"not a workbook"))
+        assert exc_info.value.status_code == 400
+
+    def test_invalid_row(self):
+        with pytest.raises(ValidationError):
+            parse_row({"amount": "abc", "currency": "USD", "category": "Food"})
+
+    @pytest.mark.parametrize(
+        "filename,file_format,expected",
+        [
+            ("data.csv", None, "csv"),
+            ("DATA.XLSX", None, "xlsx"),
+            ("upload", "csv", "csv"),
+        ],
+    )
+    def test_detect_format(self, filename, file_format, expected):
+        assert detect_format(filename, file_format) == expected
+
+    def test_unsupported_format(self):
+        with pytest.raises(HTTPException) as exc_info:
+            detect_format("data.pdf", None)
+        assert exc_info.value.status_code == 400
+
+
+@pytest.mark.anyio
+class TestImportExpenses:
+    async def test_import_csv(self, async_client_auth: AsyncClient):
+        content = EXPORTED_CSV + "2024-01-17,abc,USD,Food,,Checking,\r\n"
+        response = await async_client_auth.post(
+            "/imports/expenses", files={"file": ("expenses.csv", content.encode())}
+        )
+        assert response.status_code == 200
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        assert lines[0]["errors"][0]["row"] == 4
+        assert lines[-1] == {"done": True, "rows": 3, "created": 2, "failed": 1}
+
+    async def test_import_xlsx(self, async_client_auth: AsyncClient):
+        response = await async_client_auth.post(
+            "/imports/expenses", files={"file": ("data.xlsx", exported_xlsx().read())}
+        )
+        assert response.status_code == 200
+        summary = json.loads(response.text.splitlines()[-1])
+        assert summary["created"] == 1
+
+    async def test_unsupported_file(self, async_client_auth: AsyncClient):
+        response = await async_client_auth.post(
+            "/imports/expenses", files={"file": ("data.pdf", b"%PDF")}
+        )
+        assert response.status_code == 400
@@ -0,0 +1,39 @@
+import pytest
+
+from api.utils.indexes import (
+    IndexVerificationError,
+    QueryShape,
+    ensure_indexes,
+    plan_stages,
+    verify_indexes,
+)
+
+
+class TestPlanStages:
+    def test_nested_plan(self):
+        plan = {
+            "stage": "FETCH",
+            "inputStage": {"stage": "IXSCAN", "indexName": "user_date_id"},
+        }
+        assert plan_stages(plan) == ["FETCH", "IXSCAN"]
+
+    def test_collscan_in_list(self):
+        plan = {"shards": [{"winningPlan": {"stage": "COLLSCAN"}}]}
+        assert "COLLSCAN" in plan_stages(plan)
+
+
+@pytest.mark.anyio
+class TestIndexBootstrap:
+    async def test_ensure_and_verify(self):
+        created = await ensure_indexes()
+        assert "user_token" in created["tokens"]
+        assert "expires_at_ttl" in created["tokens"]
+
+        plans = await verify_indexes()
+        assert "IXSCAN" in plans["verify_token"]
+        assert all("COLLSCAN" not in stages for stages in plans.values())
+
+    async def test_unindexed_shape_fails(self):
+        shape = QueryShape("unindexed", "expenses", {"description": "sample"})
+        with pytest.raises(IndexVerificationError):
+            await verify_indexes(shapes=[shape])
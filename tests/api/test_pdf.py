@@ -0,0 +1,75 @@
+from io import BytesIO
+
+from reportlab.lib.pagesizes import letter
+from reportlab.platypus import LongTable, Paragraph, SimpleDocTemplate
+
+from api.utils.pdf import (
+    ChunkedTable,
+    create_table,
+    logo_data,
+    logo_image,
+    long_table,
+    pdf_styles,
+    table_cell,
+)
+
+HEADER = ["Number", "Description"]
+COL_WIDTHS = [60, 120]
+
+
+class CollectingDocTemplate(SimpleDocTemplate):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.tables = []
+
+    def afterFlowable(self, flowable):
+        if isinstance(flowable, LongTable):
+            self.tables.append(flowable._cellvalues)
+
+
+def lay_out(flowable):
+    doc = CollectingDocTemplate(BytesIO(), pagesize=letter)
+    doc.build([flowable])
+    return doc
+
+
+class TestCells:
+    def test_short_text_stays_plain(self):
+        assert table_cell(12.5, 60) == "12.5"
+
+    def test_long_text_wraps_escaped(self):
+        cell = table_cell("Fish & <chips> " * 5, 60)
+        assert isinstance(cell, Paragraph)
+        # Markup characters are shown, not parsed
+        assert cell.getPlainText().startswith("Fish & <chips>")
+
+    def test_cached_styles_and_logo(self):
+        assert pdf_styles() is pdf_styles()
+        assert logo_data() is logo_data()
+        assert logo_image(100).drawWidth == 100
+
+
+class TestChunkedTable:
+    def test_lays_out_every_row_once_in_order(self):
+        rows = ([i, "Lunch " * (i % 4)] for i in range(500))
+        doc = lay_out(long_table(HEADER, rows, COL_WIDTHS))
+        assert len(doc.tables) > 1
+        numbers = []
+        for cells in doc.tables:
+            # Every page starts with the header
+            assert cells[0] == HEADER
+            numbers.extend(int(row[0]) for row in cells[1:])
+        assert numbers == list(range(500))
+
+    def test_pulls_rows_lazily(self):
+        rows = iter([i, "Lunch"] for i in range(1000))
+        table = ChunkedTable(HEADER, rows, COL_WIDTHS)
+        assert len(table.pending) < 100
+        assert next(rows)[0] == len(table.pending)
+
+    def test_short_and_empty_tables(self):
+        doc = lay_out(long_table(HEADER, iter([[1, "Lunch"]]), COL_WIDTHS))
+        assert doc.tables == [[HEADER, ["1", "Lunch"]]]
+        empty = long_table(HEADER, iter([]), COL_WIDTHS)
+        assert lay_out(empty).tables == [[HEADER]]
+        assert isinstance(create_table([HEADER], COL_WIDTHS), LongTable)
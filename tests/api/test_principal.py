@@ -0,0 +1,152 @@
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+from httpx import AsyncClient
+
+from api.utils.principal import (
+    Principal,
+    UserCache,
+    data_version,
+    run_data_write,
+    user_cache,
+)
+
+USER_ID = "507f1f77bcf86cd799439011"
+
+
+class MockUsers:
+    def __init__(self, user):
+        self.user = user
+        self.reads = 0
+
+    async def find_one(self, query, projection=None):
+        self.reads += 1
+        return dict(self.user) if self.user else None
+
+    async def find_one_and_update(self, query, update, **kwargs):
+        self.user["version"] += update["$inc"]["version"]
+        return dict(self.user)
+
+
+class TestUserCache:
+    def test_put_and_get(self):
+        cache = UserCache(max_size=10, ttl=60)
+        cache.put({"_id": ObjectId(USER_ID), "version": 1})
+        assert cache.get(USER_ID)["version"] == 1
+        assert cache.get("507f1f77bcf86cd799439012") is None
+
+    def test_returns_copies(self):
+        cache = UserCache(max_size=10, ttl=60)
+        cache.put({"_id": ObjectId(USER_ID), "categories": {"Food": {}}})
+        cache.get(USER_ID)["categories"]["Rent"] = {}
+        assert "Rent" not in cache.get(USER_ID)["categories"]
+
+    def test_keeps_newer_version(self):
+        cache = UserCache(max_size=10, ttl=60)
+        cache.put({"_id": ObjectId(USER_ID), "version": 3})
+        cache.put({"_id": ObjectId(USER_ID), "version": 2})
+        assert cache.get(USER_ID)["version"] == 3
+        cache.put({"_id": ObjectId(USER_ID), "version": 4})
+        assert cache.get(USER_ID)["version"] == 4
+
+    def test_lru_eviction(self):
+        cache = UserCache(max_size=1, ttl=60)
+        cache.put({"_id": "user-1"})
+        cache.put({"_id": "user-2"})
+        assert cache.get("user-1") is None
+        assert len(cache) == 1
+
+    def test_disabled(self):
+        cache = UserCache(max_size=10, ttl=0)
+        cache.put({"_id": ObjectId(USER_ID)})
+        assert cache.get(USER_ID) is None
+
+
+@pytest.mark.anyio
+class TestPrincipal:
+    async def test_loads_user_once(self, monkeypatch):
+        users = MockUsers({"_id": ObjectId(USER_ID), "version": 0})
+        monkeypatch.setattr("api.utils.principal.users_collection", users)
+        user_cache.evict(USER_ID)
+        principal = Principal(USER_ID, "token")
+        await principal.user()
+        await principal.user()
+        assert users.reads == 1
+        # Later requests are served from the cache until they ask for a fresh copy
+        await Principal(USER_ID, "token").user()
+        assert users.reads == 1
+        await Principal(USER_ID, "token").user(fresh=True)
+        assert users.reads == 2
+        user_cache.evict(USER_ID)
+
+    async def test_require_user_not_found(self, monkeypatch):
+        monkeypatch.setattr("api.utils.principal.users_collection", MockUsers(None))
+        user_cache.evict(USER_ID)
+        with pytest.raises(HTTPException) as e:
+            await Principal(USER_ID, "token").require_user()
+        assert e.value.status_code == 404
+        assert e.value.detail == "User not found"
+
+    async def test_data_version_skips_cache(self, monkeypatch):
+        user_cache.put({"_id": ObjectId(USER_ID), "version": 1})
+        users = MockUsers({"_id": ObjectId(USER_ID), "version": 3})
+        monkeypatch.setattr("api.utils.principal.users_collection", users)
+        assert await data_version(USER_ID) == 3
+        monkeypatch.setattr("api.utils.principal.users_collection", MockUsers(None))
+        assert await data_version(USER_ID) is None
+        user_cache.evict(USER_ID)
+
+    async def test_run_data_write(self, monkeypatch):
+        async def run_in_transaction(callback):
+            return await callback("session")
+
+        monkeypatch.setattr(
+            "api.utils.principal.run_in_transaction", run_in_transaction
+        )
+        users = MockUsers({"_id": ObjectId(USER_ID), "version": 1})
+        monkeypatch.setattr("api.utils.principal.users_collection", users)
+        user_cache.put({"_id": ObjectId(USER_ID), "version": 1})
+
+        async def write(session):
+            assert session == "session"
+            return "written"
+
+        assert await run_data_write(USER_ID, write) == "written"
+        assert users.user["version"] == 2
+        assert user_cache.get(USER_ID)["version"] == 2
+
+        async def fail(session):
+            raise HTTPException(status_code=400, detail="Insufficient balance")
+
+        # A failed write leaves the version and the cache alone
+        with pytest.raises(HTTPException):
+            await run_data_write(USER_ID, fail)
+        assert users.user["version"] == 2
+        assert user_cache.get(USER_ID)["version"] == 2
+        user_cache.evict(USER_ID)
+
+
+@pytest.mark.anyio
+class TestUserVersion:
+    async def test_update_bumps_version(self, async_client_auth: AsyncClient):
+        before = (await async_client_auth.get("/users/")).json()
+        response = await async_client_auth.put("/users/", json={"currencies": ["JPY"]})
+        assert response.status_code == 200, response.json()
+        after = response.json()["updated_user"]
+        assert after["version"] == before.get("version", 0) + 1
+        response = await async_client_auth.get("/users/")
+        assert response.json()["version"] == after["version"]
+        assert "JPY" in response.json()["currencies"]
+
+    async def test_account_writes_bump_version(self, async_client_auth: AsyncClient):
+        before = (await async_client_auth.get("/users/")).json().get("version", 0)
+        response = await async_client_auth.post(
+            "/accounts/",
+            json={"name": "Versioned", "balance": 10.0, "currency": "USD"},
+        )
+        assert response.status_code == 200, response.json()
+        account_id = response.json()["account_id"]
+        await async_client_auth.put(f"/accounts/{account_id}", json={"balance": 20.0})
+        await async_client_auth.delete(f"/accounts/{account_id}")
+        after = (await async_client_auth.get("/users/")).json()["version"]
+        assert after == before + 3
@@ -0,0 +1,93 @@
+import subprocess
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+from matplotlib.figure import Figure
+
+from api.utils.plots import (
+    MAX_BAR_LABELS,
+    MAX_BAR_PATCHES,
+    MAX_TICK_LABELS,
+    create_category_pie,
+    create_expense_bar,
+    draw_bars,
+)
+from api.utils.render import RenderPool
+
+PNG_SIGNATURE = b"\x89PNG"
+
+
+@pytest.mark.anyio
+class TestRenderPool:
+    async def test_thread_rendering(self):
+        pool = RenderPool(workers=0, max_pending=2)
+        png = await pool.render(create_category_pie, pd.Series([3.0], index=["Food"]))
+        assert png.startswith(PNG_SIGNATURE)
+        assert pool.start() is None
+
+    async def test_process_rendering(self):
+        pool = RenderPool(workers=1, max_pending=2)
+        try:
+            await pool.warm()
+            totals = pd.Series([1.0, 2.0], index=["2024-01-01", "2024-01-02"])
+            png = await pool.render(
+                create_expense_bar, totals, None, None, currency="USD"
+            )
+            assert png.startswith(PNG_SIGNATURE)
+        finally:
+            pool.shutdown()
+
+    def test_plots_do_not_use_pyplot(self):
+        check = (
+            "import sys, api.utils.plots; assert 'matplotlib.pyplot' not in sys.modules"
+        )
+        subprocess.run([sys.executable, "-c", check], check=True)
+
+
+class TestImageFormats:
+    totals = pd.Series([3.0, 1.5], index=["Food", "Rent"])
+
+    def test_svg(self):
+        svg = create_category_pie(self.totals, image_format="svg").getvalue()
+        assert svg.startswith(b"<?xml")
+        # Text stays text, and the same data gives the same bytes
+        assert b"Food" in svg
+        assert svg == create_category_pie(self.totals, image_format="svg").getvalue()
+
+    def test_png_is_default(self):
+        assert create_category_pie(self.totals).getvalue().startswith(PNG_SIGNATURE)
+
+
+class TestBarLimits:
+    @staticmethod
+    def draw(count):
+        ax = Figure().add_subplot()
+        totals = pd.Series(np.arange(count, dtype=float), index=range(count))
+        draw_bars(ax, totals)
+        return ax
+
+    def test_few_bars_are_all_labelled(self):
+        ax = self.draw(5)
+        assert len(ax.patches) == 5
+        assert len(ax.texts) == 5
+        assert len(ax.get_xticks()) == 5
+
+    def test_labels_are_capped(self):
+        ax = self.draw(MAX_BAR_PATCHES)
+        assert len(ax.patches) == MAX_BAR_PATCHES
+        assert len(ax.get_xticks()) <= MAX_TICK_LABELS
+        # The largest bars keep their amounts
+        assert len(ax.texts) == MAX_BAR_LABELS
+        assert ax.texts[-1].get_text() == f"{MAX_BAR_PATCHES - 1:.2f}"
+
+    def test_many_bars_are_one_artist(self):
+        ax = self.draw(MAX_BAR_PATCHES * 5)
+        assert len(ax.patches) == 1
+        assert len(ax.texts) == MAX_BAR_LABELS
+
+    def test_granularity_title(self):
+        totals = pd.Series([1.0, 2.0], index=["2024-01", "2024-02"])
+        svg = create_expense_bar(totals, image_format="svg", granularity="month")
+        assert b"Total Expenses per Month" in svg.getvalue()
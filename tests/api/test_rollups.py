@@ -0,0 +1,66 @@
+import datetime
+
+import pytest
+from httpx import AsyncClient
+
+from api.utils.aggregations import day_bucket, local_midnight
+from api.utils.rollups import check, rebuild, rollup_key
+
+
+class TestRollupKey:
+    def test_day_bucket_is_local_midnight(self):
+        late_utc = datetime.datetime(2024, 1, 15, 3, 0)  # still Jan 14 in New York
+        assert day_bucket(late_utc) == local_midnight(datetime.date(2024, 1, 14))
+
+    def test_key_fields(self):
+        expense = {
+            "date": datetime.datetime(2024, 1, 15, 12),
+            "amount": 10.0,
+            "category": "Food",
+            "currency": "USD",
+        }
+        key = rollup_key("user", expense)
+        assert key["user_id"] == "user"
+        assert key["category"] == "Food"
+        assert key["currency"] == "USD"
+        assert key["day"] == day_bucket(expense["date"])
+
+
+@pytest.mark.anyio
+class TestRollupConsistency:
+    async def test_writes_keep_rollups_consistent(self, async_client_auth: AsyncClient):
+        user_id = (await async_client_auth.get("/users/")).json()["_id"]
+
+        response = await async_client_auth.post(
+            "/expenses/",
+            json={
+                "amount": 12.5,
+                "currency": "USD",
+                "category": "Food",
+                "account_name": "Checking",
+                "date": "2023-03-10T12:00:00",
+            },
+        )
+        assert response.status_code == 200, response.json()
+        expense_id = response.json()["expense"]["_id"]
+        assert await check(user_id) == []
+
+        response = await async_client_auth.put(
+            f"/expenses/{expense_id}",
+            json={
+                "amount": 20.0,
+                "category": "Shopping",
+                "date": "2023-03-11T12:00:00",
+            },
+        )
+        assert response.status_code == 200, response.json()
+        assert await check(user_id) == []
+
+        response = await async_client_auth.delete(f"/expenses/{expense_id}")
+        assert response.status_code == 200, response.json()
+        assert await check(user_id) == []
+
+    async def test_rebuild(self, async_client_auth: AsyncClient):
+        user_id = (await async_client_auth.get("/users/")).json()["_id"]
+        await rebuild(user_id)
+        assert await check(user_id) == []
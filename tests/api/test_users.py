@@ -7,6 +7,7 @@ import pytest
 from httpx import ASGITransport, AsyncClient
 
 from api.app import app
+from api.utils.db import revocations_collection
 from config.config import TOKEN_ALGORITHM, TOKEN_SECRET_KEY
 
 
@@ -171,6 +172,26 @@ class TestTokenDelete:
         assert response.status_code == 404
         assert response.json()["detail"] == "Token not found"
 
+    async def test_logout(self, async_client: AsyncClient):
+        response = await async_client.post(
+            "/users/token/",
+            data={"username": "usertestuser", "password": "usertestpassword"},
+        )
+        assert response.status_code == 200
+        token = response.json()["result"]["token"]
+        headers = {"token": token}
+        # Verify once so the token is cached
+        response = await async_client.get("/users/", headers=headers)
+        assert response.status_code == 200
+
+        response = await async_client.delete("/users/token/", headers=headers)
+        assert response.status_code == 200, response.json()
+        assert response.json()["message"] == "Logged out successfully"
+
+        response = await async_client.get("/users/", headers=headers)
+        assert response.status_code == 401
+        assert response.json()["detail"] == "Token does not exist"
+
 
 @pytest.mark.anyio
 class TestUserGetter:
@@ -271,8 +292,18 @@ class TestUserUnauthenticated:
 @pytest.mark.anyio
 class TestUserDelete:
     async def test_delete_user(self, async_client: AsyncClient):
+        user_id = (await async_client.get("/users/")).json()["_id"]
+        jti = jwt.decode(
+            async_client.headers["token"],
+            TOKEN_SECRET_KEY,
+            algorithms=[TOKEN_ALGORITHM],
+        )["jti"]
         response = await async_client.delete("/users/")
         assert response.status_code == 200, response.json()
         assert (
             response.json()["message"] == "User deleted successfully"
         ), response.json()
+
+        # The revocation records whose tokens were revoked
+        revocation = await revocations_collection.find_one({"jti": jti})
+        assert revocation["user_id"] == user_id